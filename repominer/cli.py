@@ -1,16 +1,25 @@
 import copy
+import csv
 import io
 import json
+import multiprocessing
 import os
+import re
 
 from argparse import ArgumentParser, ArgumentTypeError, Namespace
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
 from datetime import datetime
+from typing import Dict, List, Set, Union
 
+from pydriller.git_repository import GitRepository
+
+from repominer import utils
 from repominer.files import FixedFileEncoder, FixedFileDecoder, FailureProneFileEncoder, FailureProneFileDecoder
 from repominer.metrics.ansible import AnsibleMetricsExtractor
 from repominer.metrics.tosca import ToscaMetricsExtractor
-from repominer.mining.base import BaseMiner
-from repominer.mining.ansible import AnsibleMiner
+from repominer.mining.base import BaseMiner, DEFECT_CATEGORIES
+from repominer.mining.ansible import AnsibleFixingCommitClassifier, AnsibleMiner
 from repominer.mining.tosca import ToscaMiner
 
 VERSION = '0.8.12'
@@ -52,6 +61,40 @@ def valid_file(x: str) -> str:
     return x
 
 
+def positive_int(x: str) -> int:
+    """
+    Check if x is a positive integer
+    :param x: a number
+    :return: the integer if positive; raise an ArgumentTypeError otherwise
+    """
+    try:
+        value = int(x)
+    except ValueError:
+        value = 0
+
+    if value < 1:
+        raise ArgumentTypeError('Insert a positive integer')
+
+    return value
+
+
+def valid_date_or_commit(x: str) -> Union[datetime, str]:
+    """
+    Check if x is a date (YYYY-MM-DD) or a commit hash
+    :param x: a date or commit hash
+    :return: the datetime if x is a date, the hash if x is a commit hash; raise an ArgumentTypeError otherwise
+    """
+    try:
+        return datetime.strptime(x, '%Y-%m-%d')
+    except ValueError:
+        pass
+
+    if not re.match(r'^[0-9a-f]{4,40}$', x):
+        raise ArgumentTypeError('Insert a valid date (YYYY-MM-DD) or commit hash')
+
+    return x
+
+
 def set_mine_parser(subparsers):
     parser = subparsers.add_parser('mine', help='Mine fixing- and clean- files')
 
@@ -89,6 +132,18 @@ def set_mine_parser(subparsers):
                         default='master',
                         help='the repository branch to mine (default: %(default)s)')
 
+    parser.add_argument('--since',
+                        action='store',
+                        dest='since',
+                        type=valid_date_or_commit,
+                        help='mine only commits from this date (YYYY-MM-DD) or commit hash on')
+
+    parser.add_argument('--until',
+                        action='store',
+                        dest='until',
+                        type=valid_date_or_commit,
+                        help='mine only commits up to this date (YYYY-MM-DD) or commit hash')
+
     parser.add_argument('--exclude-commits',
                         action='store',
                         dest='exclude_commits',
@@ -107,6 +162,34 @@ def set_mine_parser(subparsers):
                         type=valid_file,
                         help='the path to a JSON file containing the list of FixedFiles to exclude')
 
+    parser.add_argument('--backend',
+                        action='store',
+                        dest='backend',
+                        choices=['rest', 'graphql', 'dump'],
+                        default='rest',
+                        help='the host API to mine issues with (graphql is github only), or dump to mine issues '
+                             'exported to --dump-dir (default: %(default)s)')
+
+    parser.add_argument('--dump-dir',
+                        action='store',
+                        dest='dump_dir',
+                        type=valid_dir,
+                        help='the path to the directory of the exported issue tracker data (with --backend dump)')
+
+    parser.add_argument('--events-stream',
+                        action='store_true',
+                        dest='events_stream',
+                        default=False,
+                        help='(github with --backend rest only) resolve the commits closing issues from the '
+                             'repository-wide stream of issue events, rather than from the events of each issue')
+
+    parser.add_argument('--pipelined',
+                        action='store_true',
+                        dest='pipelined',
+                        default=False,
+                        help='check the commits closing issues against the local repository while the others are '
+                             'still being requested')
+
     parser.add_argument('--verbose',
                         action='store_true',
                         dest='verbose',
@@ -157,6 +240,66 @@ def set_extract_metrics_parser(subparsers):
                         help='show log')
 
 
+def set_classify_parser(subparsers):
+    parser = subparsers.add_parser('classify', help='Classify the mined fixing-commits by defect category')
+
+    parser.add_argument(action='store',
+                        dest='path_to_repo',
+                        type=valid_dir,
+                        help='the absolute path to a cloned repository')
+
+    parser.add_argument(action='store',
+                        dest='src',
+                        type=valid_file,
+                        help='the path to fixing-commits.json generated by a previous run of \'repo-miner mine\'')
+
+    parser.add_argument(action='store',
+                        dest='language',
+                        type=str,
+                        choices=['ansible'],
+                        help='classify commits fixing Ansible files')
+
+    parser.add_argument(action='store',
+                        dest='dest',
+                        type=valid_dir,
+                        help='destination folder to save the resulting categories')
+
+    parser.add_argument('--format',
+                        action='store',
+                        dest='format',
+                        choices=['jsonl', 'csv'],
+                        default='jsonl',
+                        help='the format of the resulting file (default: %(default)s)')
+
+    parser.add_argument('--workers',
+                        action='store',
+                        dest='workers',
+                        type=positive_int,
+                        default=os.cpu_count() or 1,
+                        help='the number of processes classifying commits (default: %(default)s)')
+
+    parser.add_argument('--batch-size',
+                        action='store',
+                        dest='batch_size',
+                        type=positive_int,
+                        default=64,
+                        help='the number of commits classified together by a process (default: %(default)s)')
+
+    parser.add_argument('--nlp-backend',
+                        action='store',
+                        dest='nlp_backend',
+                        choices=list(utils.NLP_BACKENDS),
+                        default=os.getenv('NLP_BACKEND') or utils.DEFAULT_NLP_BACKEND,
+                        help='the backend parsing commit messages: spaCy\'s dependency parser, or approximate but much '
+                             'faster rules (default: %(default)s)')
+
+    parser.add_argument('--verbose',
+                        action='store_true',
+                        dest='verbose',
+                        default=False,
+                        help='show log')
+
+
 def get_parser():
     description = 'A Python library and command-line tool to mine Infrastructure-as-Code based software repositories.'
 
@@ -166,11 +309,13 @@ def get_parser():
 
     set_mine_parser(subparsers)
     set_extract_metrics_parser(subparsers)
+    set_classify_parser(subparsers)
 
     return parser
 
 
-def mine_fixing_commits(miner: BaseMiner, verbose: bool, dest: str, exclude_commits: str = None, include_commits: str = None):
+def mine_fixing_commits(miner: BaseMiner, verbose: bool, dest: str, exclude_commits: str = None, include_commits: str = None,
+                        pipelined: bool = False):
 
     if exclude_commits:
         with open(exclude_commits, 'r') as f:
@@ -185,7 +330,11 @@ def mine_fixing_commits(miner: BaseMiner, verbose: bool, dest: str, exclude_comm
     if verbose:
         print('Identifying fixing-commits from closed issues related to bugs')
 
-    from_issues = miner.get_fixing_commits_from_closed_issues(labels=None)
+    from_issues = miner.get_fixing_commits_from_closed_issues(labels=None, pipelined=pipelined)
+
+    if verbose and any(miner.dropped_closing_commits.values()):
+        print(f'Dropped {miner.dropped_closing_commits["off_branch"]} commits closing issues not on the branch, and '
+              f'{miner.dropped_closing_commits["out_of_window"]} outside the mining window')
 
     if verbose:
         print('Identifying fixing-commits from commit messages')
@@ -254,7 +403,17 @@ def mine_failure_prone_files(miner: BaseMiner, verbose: bool, dest: str):
         print(f'JSON created at {filename_json}')
 
 
-def mine(args: Namespace):
+def mine(args: Namespace, parser: ArgumentParser = None):
+    parser = parser or get_parser()
+    if args.backend == 'graphql' and args.host != 'github':
+        parser.error(f'argument --backend: graphql is not available for {args.host}')
+    if args.backend == 'dump' and not args.dump_dir:
+        parser.error('argument --dump-dir: required with --backend dump')
+    if args.dump_dir and args.backend != 'dump':
+        parser.error('argument --dump-dir: only allowed with --backend dump')
+    if args.events_stream and (args.host != 'github' or args.backend != 'rest'):
+        parser.error('argument --events-stream: only available for github with --backend rest')
+
     url_to_repo = None
 
     if args.host == 'github':
@@ -266,11 +425,17 @@ def mine(args: Namespace):
         print(f'Mining {args.repository} [started at: {datetime.now().hour}:{datetime.now().minute}]')
 
     if args.language == 'ansible':
-        miner = AnsibleMiner(url_to_repo=url_to_repo, branch=args.branch)
+        miner = AnsibleMiner(url_to_repo=url_to_repo, branch=args.branch, since=args.since, until=args.until)
     else:
-        miner = ToscaMiner(url_to_repo=url_to_repo, branch=args.branch)
+        miner = ToscaMiner(url_to_repo=url_to_repo, branch=args.branch, since=args.since, until=args.until)
+
+    miner.host_options['backend'] = args.backend
+    if args.dump_dir:
+        miner.host_options['path_to_dump'] = args.dump_dir
+    if args.events_stream:
+        miner.host_options['events_stream'] = True
 
-    mine_fixing_commits(miner, args.verbose, args.dest, args.exclude_commits, args.include_commits)
+    mine_fixing_commits(miner, args.verbose, args.dest, args.exclude_commits, args.include_commits, args.pipelined)
 
     if args.info_to_mine in ('fixed-files', 'failure-prone-files'):
         mine_fixed_files(miner, args.verbose, args.dest, args.exclude_files)
@@ -314,9 +479,116 @@ def extract_metrics(args: Namespace):
         print(f'Metrics saved at {args.dest}/metrics.csv [completed at: {datetime.now().hour}:{datetime.now().minute}]')
 
 
+# The repository opened, and the NLP backend loaded, by each classifying process (see classify)
+_classify_repo = None
+_classify_nlp_backend = None
+
+
+def init_classify_worker(path_to_repo: str, lock=None, nlp_backend: str = None):
+    """
+    Open the repository, and load the NLP backend, once per classifying process.
+    The backends inherited from a forked parent are discarded, so that each process opens its own dependents cache
+    :param path_to_repo: the path to the repository
+    :param lock: a lock shared by the processes, as pydriller writes the repository config when opening it
+    :param nlp_backend: the name of the NLP backend (see utils.get_nlp_backend)
+    """
+    global _classify_repo, _classify_nlp_backend
+    _classify_repo = GitRepository(path_to_repo)
+
+    utils.reset_nlp_backends()
+    _classify_nlp_backend = utils.get_nlp_backend(nlp_backend).name
+
+    # GitRepository opens the repository on first access, writing its config: load it now, one process at a time
+    # (an empty ExitStack stands for no lock, as contextlib.nullcontext requires Python 3.7)
+    with lock or ExitStack():
+        _classify_repo.repo.git_dir
+
+
+def classify_commits(hashes: List[str]) -> List[Dict[str, Union[str, bool]]]:
+    """
+    Classify a batch of commits of the repository opened by init_classify_worker
+    :param hashes: the commit hashes
+    :return: a row for each commit, with its hash and whether it fixes each defect category
+    """
+    commits = [_classify_repo.get_commit(sha) for sha in hashes]
+    results = AnsibleFixingCommitClassifier.classify_commits(commits, nlp_backend=_classify_nlp_backend)
+    return [{'commit': sha, **result} for sha, result in zip(hashes, results)]
+
+
+def read_classified_commits(path: str, format: str) -> Set[str]:
+    """
+    Read the commits already classified by a previous, possibly interrupted, run.
+    A last row cut short by the interruption is removed from the file
+    :param path: the path to the resulting file
+    :param format: the format of the file ('jsonl' or 'csv')
+    :return: the hashes of the classified commits
+    """
+    if not os.path.isfile(path):
+        return set()
+
+    with open(path, 'rb+') as f:
+        content = f.read()
+        complete = content[:content.rfind(b'\n') + 1]
+        if complete != content:
+            f.truncate(len(complete))
+
+    complete = complete.decode('utf-8')
+
+    if format == 'csv':
+        return {row['commit'] for row in csv.DictReader(io.StringIO(complete))}
+
+    return {json.loads(line)['commit'] for line in complete.splitlines() if line.strip()}
+
+
+def classify(args: Namespace):
+    with open(args.src, 'r') as f:
+        fixing_commits = list(dict.fromkeys(json.load(f)))
+
+    path = os.path.join(args.dest, f'fixing-commits-categories.{args.format}')
+    classified = read_classified_commits(path, args.format)
+    hashes = [sha for sha in fixing_commits if sha not in classified]
+
+    if args.verbose:
+        print(f'Classifying {len(hashes)} fixing-commits ({len(classified)} already classified) '
+              f'[started at: {datetime.now().hour}:{datetime.now().minute}]')
+
+    batches = [hashes[i:i + args.batch_size] for i in range(0, len(hashes), args.batch_size)]
+
+    with open(path, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['commit', *DEFECT_CATEGORIES]) if args.format == 'csv' else None
+        if writer and f.tell() == 0:
+            writer.writeheader()
+
+        def write(rows):
+            for row in rows:
+                if writer:
+                    writer.writerow(row)
+                else:
+                    f.write(json.dumps(row) + '\n')
+
+            # Rows are flushed as soon as a batch is classified, so that an interrupted run can be resumed
+            f.flush()
+
+        if args.workers <= 1:
+            init_classify_worker(args.path_to_repo, nlp_backend=args.nlp_backend)
+            for batch in batches:
+                write(classify_commits(batch))
+        else:
+            with ProcessPoolExecutor(max_workers=args.workers, initializer=init_classify_worker,
+                                     initargs=(args.path_to_repo, multiprocessing.Lock(), args.nlp_backend)) as executor:
+                for future in as_completed([executor.submit(classify_commits, batch) for batch in batches]):
+                    write(future.result())
+
+    if args.verbose:
+        print(f'Categories saved at {path} [completed at: {datetime.now().hour}:{datetime.now().minute}]')
+
+
 def main():
-    args = get_parser().parse_args()
+    parser = get_parser()
+    args = parser.parse_args()
     if args.command == 'mine':
-        mine(args)
+        mine(args, parser)
     elif args.command == 'extract-metrics':
         extract_metrics(args)
+    elif args.command == 'classify':
+        classify(args)
@@ -1,10 +1,121 @@
+import os
+import re
+import threading
+
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, Generator, List, Union
+
+ANSIBLE_DIRECTORIES = ['playbooks/', 'meta/', 'tasks/', 'handlers/', 'roles/']
+ANSIBLE_EXTENSIONS = ['.yml']
+TOSCA_EXTENSIONS = ['.tosca', '.tosca.yaml', '.tosca.yml']
+YAML_EXTENSIONS = ['.yaml', '.yml']
+EXCLUDED_KEYWORDS = ['test']
+
+# Number of bytes read from the head of a YAML file to look for the TOSCA version
+TOSCA_SNIFF_SIZE = 4096
+
+# Number of verdicts of sniffed YAML files kept in memory, for the most recently sniffed blobs
+TOSCA_BLOBS_CACHE_SIZE = 65536
+
+# Verdicts of sniffed YAML files, by blob id, in least recently used order
+_tosca_blobs = OrderedDict()  # type: Dict[str, bool]
+_tosca_blobs_lock = threading.Lock()
+
+
+class PathClassifier:
+    """
+    This class classifies paths against lists of patterns.
+
+    A path is accepted if it contains at least one of the given keywords (if any), ends with one of the given
+    extensions (if any), and does not contain any of the excluded keywords.
+    The pattern lists are compiled once into a single regular expression, and the verdicts are memoized in a bounded
+    cache, as the same paths are classified over and over while traversing the history of a repository.
+    """
+
+    def __init__(self, keywords: List[str] = None, extensions: List[str] = None, excluded: List[str] = None,
+                 cache_size: int = 65536):
+        """
+        The class constructor.
+
+        :param keywords: substrings the path must contain at least one of (e.g., 'tasks/')
+        :param extensions: extensions the path must end with at least one of (e.g., '.yml')
+        :param excluded: substrings the path must not contain (e.g., 'test')
+        :param cache_size: the maximum number of verdicts to memoize
+        """
+        self.keywords = list(keywords or [])
+        self.extensions = list(extensions or [])
+        self.excluded = list(excluded or [])
+
+        pattern = '^'
+        if self.excluded:
+            pattern += '(?!.*(?:{}))'.format('|'.join(re.escape(w) for w in self.excluded))
+        if self.keywords:
+            pattern += '(?=.*(?:{}))'.format('|'.join(re.escape(w) for w in self.keywords))
+        pattern += '.*'
+        if self.extensions:
+            pattern += r'(?:{})\Z'.format('|'.join(re.escape(ext) for ext in self.extensions))
+
+        self.regex = re.compile(pattern, re.DOTALL)
+        self._excluded_regex = re.compile('|'.join(re.escape(w) for w in self.excluded)) if self.excluded else None
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+
+    def __call__(self, path: str) -> bool:
+        return bool(path) and self.match(path)
+
+    def _match(self, path: str) -> bool:
+        return self.regex.match(path) is not None
+
+    def prune(self, directory: str) -> bool:
+        """
+        Check whether no file under a directory can be accepted, so that the directory can be skipped altogether
+        :param directory: a directory path (e.g., roles/motd/tests)
+        :return: True if the directory can be pruned. False, otherwise
+        """
+        return self._excluded_regex is not None and self._excluded_regex.search(directory + '/') is not None
+
+    def walk(self, root: str) -> Generator[str, None, None]:
+        """
+        Walk a directory tree, pruning the .git folder and the directories that cannot contain accepted files
+        :param root: the root of the tree (e.g., the path to a repository)
+        :return: a generator of paths relative to root (not necessarily accepted: apply the classifier to filter them)
+        """
+        for dirpath, dirnames, filenames in os.walk(root):
+            relative_dir = os.path.relpath(dirpath, root)
+            relative_dir = '' if relative_dir == '.' else relative_dir
+
+            dirnames[:] = [name for name in dirnames
+                           if '.git' not in name and not self.prune(os.path.join(relative_dir, name))]
+
+            for filename in filenames:
+                yield os.path.join(relative_dir, filename)
+
+    def pathspecs(self) -> List[str]:
+        """
+        Return the git pathspecs matching (at least) the accepted paths
+        :return: a list of pathspecs
+        """
+        keywords = [f'*{keyword}' for keyword in self.keywords] or ['']
+        pathspecs = [f'{keyword}*{ext}' for keyword in keywords for ext in self.extensions or ['']]
+        return pathspecs + [f':(exclude)*{w}*' for w in self.excluded]
+
+
+ANSIBLE_CLASSIFIER = PathClassifier(keywords=ANSIBLE_DIRECTORIES, extensions=ANSIBLE_EXTENSIONS,
+                                    excluded=EXCLUDED_KEYWORDS)
+TOSCA_CLASSIFIER = PathClassifier(extensions=TOSCA_EXTENSIONS, excluded=EXCLUDED_KEYWORDS)
+
+# TOSCA files are also recognized by content, regardless of their path
+TOSCA_EXTENSION_CLASSIFIER = PathClassifier(extensions=TOSCA_EXTENSIONS)
+YAML_CLASSIFIER = PathClassifier(extensions=YAML_EXTENSIONS)
+
+
 def is_ansible_file(path: str) -> bool:
     """
     Check whether the path is an Ansible file
     :param path: a path
     :return: True if the path links to an Ansible file. False, otherwise
     """
-    return path and ('test' not in path) and any(w in path for w in ['playbooks/', 'meta/', 'tasks/', 'handlers/', 'roles/']) and path.endswith('.yml')
+    return ANSIBLE_CLASSIFIER(path)
 
 
 def is_tosca_file(path: str, content: str = None) -> bool:
@@ -17,4 +128,66 @@ def is_tosca_file(path: str, content: str = None) -> bool:
     if content:
         return 'tosca_definitions_version' in content
 
-    return path and ('test' not in path) and any(path.endswith(ext) for ext in ['.tosca', '.tosca.yaml', '.tosca.yml'])
+    return TOSCA_CLASSIFIER(path)
+
+
+def sniff_tosca_file(path: str, blob_id: str = None, read: Callable[[int], Union[str, None]] = None,
+                     size: int = TOSCA_SNIFF_SIZE) -> bool:
+    """
+    Check whether the path is a TOSCA file, without reading the whole file.
+
+    The check is performed in two stages. First, files with a TOSCA extension are accepted, and files that are
+    neither TOSCA nor YAML are rejected, based on their path. Then, only for the remaining (ambiguous) YAML files,
+    the first bytes are read to look for ``tosca_definitions_version``. The verdict is memoized by blob id, for the
+    last TOSCA_BLOBS_CACHE_SIZE blobs, so that the same content is not sniffed twice across commits. The memo is
+    shared by the threads, but files are read outside of its lock.
+
+    :param path: a path
+    :param blob_id: eventually the id of the git blob (e.g., the file at a given commit)
+    :param read: a function that takes a number of bytes and returns the head of the file (None if not readable)
+    :param size: the number of bytes to read
+    :return: True if the path links to a TOSCA file. False, otherwise
+    """
+    if not path:
+        return False
+
+    if TOSCA_EXTENSION_CLASSIFIER(path):
+        return True
+
+    if read is None or not YAML_CLASSIFIER(path):
+        return False
+
+    if blob_id:
+        with _tosca_blobs_lock:
+            if blob_id in _tosca_blobs:
+                _tosca_blobs.move_to_end(blob_id)
+                return _tosca_blobs[blob_id]
+
+    head = read(size)
+    is_tosca = bool(head) and 'tosca_definitions_version' in head
+
+    if blob_id:
+        with _tosca_blobs_lock:
+            _tosca_blobs[blob_id] = is_tosca
+            _tosca_blobs.move_to_end(blob_id)
+            while len(_tosca_blobs) > TOSCA_BLOBS_CACHE_SIZE:
+                _tosca_blobs.popitem(last=False)
+
+    return is_tosca
+
+
+def ansible_pathspecs() -> List[str]:
+    """
+    Return the git pathspecs matching the files accepted by is_ansible_file
+    :return: a list of pathspecs
+    """
+    return ANSIBLE_CLASSIFIER.pathspecs()
+
+
+def tosca_pathspecs() -> List[str]:
+    """
+    Return the git pathspecs matching the files accepted by is_tosca_file.
+    Since TOSCA files are also recognized by content, any YAML file is matched
+    :return: a list of pathspecs
+    """
+    return TOSCA_EXTENSION_CLASSIFIER.pathspecs() + YAML_CLASSIFIER.pathspecs()
@@ -1,23 +1,169 @@
+import json
 import os
+import tempfile
+import threading
 
 from abc import ABC, abstractmethod
-from typing import NewType, List, Set, Union
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Generator, Iterable, NamedTuple, NewType, List, Set, Tuple, Union
 
 import github
-from gitlab import Gitlab
+import requests
+
+from git import Git
 from gitlab.v4.objects import ProjectIssue
+from requests.adapters import BaseAdapter
 
 import re
 
+from repominer import transport
+
+# Number of issues resolved concurrently by default
+RESOLUTION_WORKERS = 8
+
+# Number of times the commit closing a stored issue is looked for, before the issue is deemed closed without commit
+RESOLUTION_ATTEMPTS = 3
 
 GithubIssue = NewType('GithubIssue', github.Issue.Issue)
 
+# From https://docs.gitlab.com/ee/administration/issue_closing_pattern.html
+ISSUE_CLOSING_PATTERN = re.compile(
+    r'\b((?:[Cc]los(?:e[sd]?|ing)|\b[Ff]ix(?:e[sd]|ing)?|\b[Rr]esolv(?:e[sd]?|ing)|\b[Ii]mplement(?:s|ed|ing)?)(:?) +(?:(?:issues? +)?#(\d+)(?:(?: *,? +and +| *,? *)?)|([A-Z][A-Z0-9_]+-\d+))+)')
+
+CLOSED_VIA_COMMIT_PATTERN = re.compile('closed via commit ([0-9a-f]{5,40})')
+CLOSED_VIA_MR_PATTERN = re.compile('closed via merge request !([0-9]+)')
+
+
+def get_local_commit_messages(path_to_repo: str, rev: str = 'HEAD') -> Generator[Tuple[str, str], None, None]:
+    """
+    Stream the commit messages of a local repository, in a single ``git log`` pass
+    :param path_to_repo: the path to the repository
+    :param rev: the revision to walk back from (e.g., a branch)
+    :return: a generator of tuples (sha, message), from the newest commit to the oldest one
+    """
+    process = Git(path_to_repo).log(rev, '--format=%x00%H%n%B', as_process=True)
+
+    sha, lines = None, []
+    for line in process.stdout:
+        line = line.decode('utf-8', 'replace')
+        if line.startswith('\x00'):
+            if sha:
+                yield sha, ''.join(lines)
+            sha, lines = line[1:].strip(), []
+        else:
+            lines.append(line)
+
+    if sha:
+        yield sha, ''.join(lines)
+
+    process.wait()
+
+
+def index_closing_commits(commits: Iterable[Tuple[str, str]]) -> Dict[int, str]:
+    """
+    Map issues to the commits that close them, according to the issue closing pattern
+    :param commits: tuples (sha, message), from the newest commit to the oldest one
+    :return: a dictionary issue id -> sha. If more commits close an issue, the oldest one is kept
+    """
+    commit_closing_issues = dict()
+
+    for sha, message in commits:
+        for match in ISSUE_CLOSING_PATTERN.findall(message):
+            iid = match[2].strip()
+            if iid:
+                commit_closing_issues[int(iid)] = sha
+
+    return commit_closing_issues
+
+
+def index_closing_events(events: Iterable[Tuple[int, str, str, datetime]]) -> Dict[int, str]:
+    """
+    Map issues to the commits that closed them, according to their events
+    :param events: tuples (issue number, event, commit id, creation date), in any order
+    :return: a dictionary issue number -> sha of the earliest 'closed' or 'merged' event referencing a commit
+    """
+    closing_events = dict()
+
+    for number, event, commit_id, created_at in events:
+        if event.lower() not in ('closed', 'merged') or not commit_id:
+            continue
+
+        if number not in closing_events or created_at < closing_events[number][0]:
+            closing_events[number] = (created_at, commit_id)
+
+    return {number: commit_id for number, (_, commit_id) in closing_events.items()}
+
+
+def parse_closing_notes(bodies: Iterable[str]) -> Tuple[Union[str, None], Union[str, None]]:
+    """
+    Look for the commit or merge request that closed an issue in its notes (e.g., "closed via commit 6aa96ed6")
+    :param bodies: the bodies of the issue notes, from the newest to the oldest one
+    :return: the sha of the closing commit, if any, and the iid of the oldest closing merge request, if any
+    """
+    mr_iid = None
+
+    for body in bodies:
+        match = re.search(CLOSED_VIA_MR_PATTERN, body)
+        if match:
+            mr_iid = match.groups()[0]
+
+        # look also for commit sha
+        match = re.search(CLOSED_VIA_COMMIT_PATTERN, body)
+        if match:
+            return match.groups()[0], mr_iid
+
+    return None, mr_iid
+
 
 class SVCHost(ABC):
 
-    # From https://docs.gitlab.com/ee/administration/issue_closing_pattern.html
-    issue_closing_pattern = re.compile(
-        r'\b((?:[Cc]los(?:e[sd]?|ing)|\b[Ff]ix(?:e[sd]|ing)?|\b[Rr]esolv(?:e[sd]?|ing)|\b[Ii]mplement(?:s|ed|ing)?)(:?) +(?:(?:issues? +)?#(\d+)(?:(?: *,? +and +| *,? *)?)|([A-Z][A-Z0-9_]+-\d+))+)')
+    issue_closing_pattern = ISSUE_CLOSING_PATTERN
+
+    # Whether only the first line of commit messages may reference the issues they close
+    closing_references_in_title = False
+
+    def __init__(self, path_to_repo: str = None, branch: str = None):
+        """
+        The class constructor.
+
+        :param path_to_repo: the path to a local clone of the repository. If given, the commits closing issues are
+        found in the clone rather than by enumerating the commits through the API
+        :param branch: the branch of the local clone to look for commits closing issues. Default HEAD
+        """
+        self.path_to_repo = path_to_repo
+        self.branch = branch
+        self._commit_closing_issues = None
+        self._lock = threading.Lock()
+
+    @property
+    def commit_closing_issues(self) -> Dict[int, str]:
+        """
+        The map issue id -> sha of the commit closing it, built on first use
+        :return: a dictionary
+        """
+        with self._lock:
+            if self._commit_closing_issues is None:
+                if self.path_to_repo:
+                    commits = get_local_commit_messages(self.path_to_repo, self.branch or 'HEAD')
+                else:
+                    commits = self.get_remote_commit_messages()
+
+                if self.closing_references_in_title:
+                    commits = ((sha, message.split('\n', 1)[0]) for sha, message in commits)
+
+                self._commit_closing_issues = index_closing_commits(commits)
+
+        return self._commit_closing_issues
+
+    @abstractmethod
+    def get_remote_commit_messages(self) -> Iterable[Tuple[str, str]]:
+        """
+        Enumerate the commits of the repository through the API
+        :return: an iterable of tuples (sha, message), from the newest commit to the oldest one
+        """
+        pass
 
     @abstractmethod
     def get_labels(self) -> Set[str]:
@@ -57,19 +203,142 @@ class SVCHost(ABC):
         """
         pass
 
+    def get_closed_labeled_issues(self, labels: Union[List[str], Set[str]]) -> List:
+        """
+        Get all the closed issues with one or more of the given labels, each one once.
+        By default, the closed issues of each label are fetched and deduplicated by number
+
+        :param labels: the issue labels
+        :return: the closed issues with those labels
+        """
+        issues = dict()
+        for label in sorted(labels):
+            for issue in self.get_closed_issues(label):
+                issues.setdefault(self.get_issue_number(issue), issue)
+
+        return list(issues.values())
+
+    @staticmethod
+    def get_issue_number(issue) -> int:
+        """
+        Return the number of an issue, i.e., its id within the repository
+        :param issue: the issue
+        :return: the number (on GitHub) or iid (on GitLab) of the issue
+        """
+        return issue.number if hasattr(issue, 'number') else issue.iid
+
+    @abstractmethod
+    def get_issue(self, number: int):
+        """
+        Get an issue by number
+
+        :param number: the issue number
+        :return: the issue, or None if not found
+        """
+        pass
+
+    @abstractmethod
+    def get_updated_issues(self, since: str) -> Iterable:
+        """
+        Get the issues, in any state and with any label, updated since a given time
+
+        :param since: the time, as returned by get_issue_summary
+        :return: the issues updated since then
+        """
+        pass
+
+    @abstractmethod
+    def get_issue_summary(self, issue) -> Tuple[int, str, List[str], str]:
+        """
+        Summarize an issue
+
+        :param issue: the issue
+        :return: the issue number, state ('closed' or 'open'), labels, and last update time (in ISO 8601 format)
+        """
+        pass
+
+    def get_commits_closing_issues(self, issues: Iterable, workers: int = RESOLUTION_WORKERS) -> List[str]:
+        """
+        Get the commits that closed many issues, resolving them concurrently.
+
+        The issues are resolved by a pool of threads sharing the client, whose requests are paced according to the
+        rate limit (see transport.ThrottlingAdapter): the throughput is then limited by the quota rather than by the
+        latency of the requests.
+
+        :param issues: the issues
+        :param workers: the number of issues to resolve concurrently (1 to resolve them sequentially)
+        :return: the sha of the commit closing each issue (None if not found), in the same order as the issues
+        """
+        if workers <= 1:
+            return [self.get_commit_closing_issue(issue) for issue in issues]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self.get_commit_closing_issue, issues))
+
+    def iter_commits_closing_issues(self, issues: Iterable, workers: int = RESOLUTION_WORKERS) \
+            -> Generator[Tuple[object, Union[str, None]], None, None]:
+        """
+        Get the commits that closed many issues, as soon as each one is resolved.
+
+        Unlike get_commits_closing_issues, results are yielded in order of completion, so that the caller can process
+        the first commits while the others are still being requested.
+
+        :param issues: the issues
+        :param workers: the number of issues to resolve concurrently (1 to resolve them sequentially)
+        :return: a generator of tuples (issue, sha of the commit closing it or None if not found)
+        """
+        if workers <= 1:
+            for issue in issues:
+                yield issue, self.get_commit_closing_issue(issue)
+            return
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.get_commit_closing_issue, issue): issue for issue in issues}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
 
 class GithubHost(SVCHost):
 
-    def __init__(self, full_name: Union[str, int]):
-        self.__repository = github.Github(os.getenv('GITHUB_ACCESS_TOKEN')).get_repo(full_name)
-        self.__commit_closing_issues = dict()
+    def __init__(self, full_name: Union[str, int], adapter: BaseAdapter = None, path_to_repo: str = None,
+                 branch: str = None, events_stream: bool = False):
+        """
+        The class constructor.
+
+        :param full_name: the repository full name (e.g., radon-h2020/radon-repository-miner) or id
+        :param adapter: the adapter to send requests through (e.g., a transport.CachingAdapter). Default the one
+        configured by the environment (see transport.get_adapter and transport.get_tokens)
+        :param path_to_repo: the path to a local clone of the repository (see SVCHost)
+        :param branch: the branch of the local clone (see SVCHost)
+        :param events_stream: whether to resolve the commits closing issues from the repository-wide stream of issue
+        events, paged through once, rather than from the events of each issue. The former is cheaper when many issues
+        are resolved
+        """
+        super().__init__(path_to_repo, branch)
+        tokens = transport.get_tokens('GITHUB_ACCESS_TOKEN')
+        client = transport.get_github_client(next(iter(tokens), None), adapter or transport.get_adapter(tokens),
+                                             per_page=100)
+        self.__repository = client.get_repo(full_name)
+        self.events_stream = events_stream
+        self._issue_closing_events = None
 
+    @property
+    def issue_closing_events(self) -> Dict[int, str]:
+        """
+        The map issue number -> sha of the commit closing it, built on first use from the repository-wide stream of
+        issue events
+        :return: a dictionary
+        """
+        with self._lock:
+            if self._issue_closing_events is None:
+                self._issue_closing_events = index_closing_events(
+                    (e.issue.number, e.event, e.commit_id, e.created_at) for e in self.__repository.get_issues_events())
+
+        return self._issue_closing_events
+
+    def get_remote_commit_messages(self) -> Generator[Tuple[str, str], None, None]:
         for commit in self.__repository.get_commits():
-            matches = self.issue_closing_pattern.findall(commit.commit.message)
-            for match in matches:
-                iid = match[2].strip()
-                if iid:
-                    self.__commit_closing_issues[int(iid)] = commit.sha
+            yield commit.sha, commit.commit.message
 
     def get_labels(self) -> Set[str]:
         labels = set()
@@ -83,7 +352,21 @@ class GithubHost(SVCHost):
         label = self.__repository.get_label(label)
         return [issue for issue in self.__repository.get_issues(state='closed', labels=[label], sort='created', direction='desc')]
 
+    def get_issue(self, number: int) -> GithubIssue:
+        return self.__repository.get_issue(number)
+
+    def get_updated_issues(self, since: str) -> List[GithubIssue]:
+        since = datetime.strptime(since, '%Y-%m-%dT%H:%M:%SZ')
+        return list(self.__repository.get_issues(state='all', since=since))
+
+    def get_issue_summary(self, issue: GithubIssue) -> Tuple[int, str, List[str], str]:
+        return issue.number, issue.state, [label.name for label in issue.labels], \
+               issue.updated_at.strftime('%Y-%m-%dT%H:%M:%SZ')
+
     def get_commit_closing_issue(self, issue: GithubIssue) -> str:
+        if self.events_stream:
+            return self.issue_closing_events.get(issue.number)
+
         for e in issue.get_events():
             is_merged = e.event.lower() == 'merged'
             is_closed = e.event.lower() == 'closed'
@@ -93,7 +376,7 @@ class GithubHost(SVCHost):
 
     def get_commits_closing_labeled_issues(self, labels: Union[List[str], Set[str]]) -> List[str]:
         commits = list()
-        for iid, commit_sha in self.__commit_closing_issues.items():
+        for iid, commit_sha in self.commit_closing_issues.items():
             issue = self.__repository.get_issue(iid)
             issue_labels = [label.name for label in issue.labels]
             if issue.state == 'closed' and any(label in issue_labels for label in labels):
@@ -102,17 +385,345 @@ class GithubHost(SVCHost):
         return commits
 
 
+class ClosedIssue(NamedTuple):
+    """ A closed issue, along with the commit that closed it (if any) """
+    number: int
+    labels: List[str]
+    commit: Union[str, None]
+    state: str = 'closed'
+    updated_at: Union[str, None] = None
+
+
+class GithubGraphQLHost(SVCHost):
+    """
+    This class implements a GitHub host on the GraphQL API.
+
+    Closed issues are fetched along with their labels and the commit that closed them (either the closing commit, or
+    the merge commit of the closing pull request) in batches of 100 per request, so that resolving the commit closing
+    an issue does not cost any further request.
+    """
+
+    # Maximum number of nodes per page allowed by GitHub
+    page_size = 100
+
+    issues_query = '''
+    query($owner: String!, $name: String!, $labels: [String!], $states: [%(state_type)s!], $cursor: String) {
+      repository(owner: $owner, name: $name) {
+        %(connection)s(states: $states, labels: $labels, first: %(page_size)d, after: $cursor,
+                       orderBy: {field: %(order)s, direction: DESC}) {
+          pageInfo { hasNextPage endCursor }
+          nodes {
+            number
+            state
+            updatedAt
+            labels(first: 100) { nodes { name } }
+            %(closing)s
+          }
+        }
+      }
+    }
+    '''
+
+    issue_closing_fields = '''
+            timelineItems(itemTypes: [CLOSED_EVENT], first: 10) {
+              nodes { ... on ClosedEvent { closer { ... on Commit { oid } ... on PullRequest { mergeCommit { oid } } } } }
+            }
+    '''
+
+    issue_query = '''
+    query($owner: String!, $name: String!, $number: Int!) {
+      repository(owner: $owner, name: $name) {
+        issueOrPullRequest(number: $number) {
+          ... on Issue { number state updatedAt labels(first: 100) { nodes { name } } %(closing)s }
+          ... on PullRequest { number state updatedAt labels(first: 100) { nodes { name } } mergeCommit { oid } }
+        }
+      }
+    }
+    '''
+
+    # GraphQL type of the states, and fields of the closing commit, by connection
+    connections = {
+        'issues': ('IssueState', issue_closing_fields),
+        'pullRequests': ('PullRequestState', 'mergeCommit { oid }')
+    }
+
+    labels_query = '''
+    query($owner: String!, $name: String!, $cursor: String) {
+      repository(owner: $owner, name: $name) {
+        labels(first: %(page_size)d, after: $cursor) {
+          pageInfo { hasNextPage endCursor }
+          nodes { name }
+        }
+      }
+    }
+    '''
+
+    # The history of the branch, if any, or of the default branch
+    history_query = '''
+    query($owner: String!, $name: String!, $cursor: String%(branch_variable)s) {
+      repository(owner: $owner, name: $name) {
+        %(ref)s {
+          target {
+            ... on Commit {
+              history(first: %(page_size)d, after: $cursor) {
+                pageInfo { hasNextPage endCursor }
+                nodes { oid message }
+              }
+            }
+          }
+        }
+      }
+    }
+    '''
+
+    def __init__(self, full_name: str, adapter: BaseAdapter = None, path_to_repo: str = None, branch: str = None,
+                 base_url: str = 'https://api.github.com'):
+        """
+        The class constructor.
+
+        :param full_name: the repository full name (e.g., radon-h2020/radon-repository-miner)
+        :param adapter: the adapter to send requests through (e.g., a transport.CachingAdapter). Default the one
+        configured by the environment (see transport.get_adapter and transport.get_tokens)
+        :param path_to_repo: the path to a local clone of the repository (see SVCHost)
+        :param branch: the branch of the local clone (see SVCHost), or, without a clone, the remote branch whose history
+        is walked for commits closing issues. Default the default branch
+        :param base_url: the url of the GitHub API. The GraphQL endpoint is base_url/graphql
+        """
+        super().__init__(path_to_repo, branch)
+        self.owner, self.name = full_name.split('/', 1)
+        self.url = f'{base_url.rstrip("/")}/graphql'
+
+        tokens = transport.get_tokens('GITHUB_ACCESS_TOKEN')
+        self.session = transport.mount(requests.Session(), adapter or transport.get_adapter(tokens))
+        if tokens:
+            self.session.headers['Authorization'] = f'bearer {tokens[0]}'
+
+        # Number of GraphQL requests sent
+        self.requests = 0
+
+    def query(self, query: str, **variables) -> dict:
+        """
+        Send a GraphQL query
+        :param query: the query
+        :param variables: the query variables (the repository owner and name are always set)
+        :return: the data returned by the query
+        :raise github.GithubException: if the request fails, or the query returns errors
+        """
+        response = self.session.post(self.url, json={'query': query,
+                                                     'variables': {'owner': self.owner, 'name': self.name,
+                                                                   **variables}})
+        self.requests += 1
+
+        payload = response.json() if response.content else None
+        if response.status_code != 200 or not payload or payload.get('errors'):
+            raise github.GithubException(response.status_code, payload, dict(response.headers))
+
+        return payload['data']
+
+    def paginate(self, query: str, path: List[str], **variables) -> Generator[dict, None, None]:
+        """
+        Page through a connection
+        :param query: the query, with a $cursor variable
+        :param path: the keys leading from the data to the connection (e.g., ['repository', 'labels'])
+        :param variables: the other query variables
+        :return: a generator of the nodes of the connection
+        """
+        cursor = None
+        while True:
+            connection = self.query(query, cursor=cursor, **variables)
+            for key in path:
+                connection = connection[key] if connection else None
+
+            if not connection:
+                return
+
+            yield from connection['nodes']
+
+            if not connection['pageInfo']['hasNextPage']:
+                return
+
+            cursor = connection['pageInfo']['endCursor']
+
+    def get_remote_commit_messages(self) -> Generator[Tuple[str, str], None, None]:
+        if self.branch:
+            query = self.history_query % {'page_size': self.page_size, 'branch_variable': ', $branch: String!',
+                                          'ref': 'ref(qualifiedName: $branch)'}
+            nodes = self.paginate(query, ['repository', 'ref', 'target', 'history'], branch=self.branch)
+        else:
+            query = self.history_query % {'page_size': self.page_size, 'branch_variable': '', 'ref': 'defaultBranchRef'}
+            nodes = self.paginate(query, ['repository', 'defaultBranchRef', 'target', 'history'])
+
+        for node in nodes:
+            yield node['oid'], node['message']
+
+    def get_labels(self) -> Set[str]:
+        query = self.labels_query % {'page_size': self.page_size}
+        return {node['name'] for node in self.paginate(query, ['repository', 'labels'])}
+
+    def iter_issues(self, connection: str, states: List[str], labels: Union[List[str], Set[str]] = None,
+                    order: str = 'CREATED_AT') -> Generator[ClosedIssue, None, None]:
+        """
+        Page through the issues or pull requests, along with the commits that closed them
+        :param connection: 'issues' or 'pullRequests'
+        :param states: the states of the issues (e.g., ['CLOSED']) or pull requests (e.g., ['MERGED'])
+        :param labels: the labels, any of which the issues must have. Default None (i.e., any label)
+        :param order: the field the issues are sorted by, newest first (CREATED_AT or UPDATED_AT)
+        :return: a generator of issues. Pages are requested as the generator is consumed
+        """
+        state_type, closing = self.connections[connection]
+        query = self.issues_query % {'connection': connection, 'state_type': state_type, 'closing': closing,
+                                     'order': order, 'page_size': self.page_size}
+
+        for node in self.paginate(query, ['repository', connection], labels=sorted(labels) if labels else None,
+                                  states=states):
+            yield self.get_closed_issue(node)
+
+    def get_closed_issue(self, node: dict) -> ClosedIssue:
+        """
+        Return the issue of a node, along with the commit that closed it
+        :param node: an issue or pull request node
+        :return: the issue. Pull requests are closed only if merged
+        """
+        closed_state = 'MERGED' if 'mergeCommit' in node else 'CLOSED'
+        return ClosedIssue(number=node['number'],
+                           labels=[label['name'] for label in node['labels']['nodes']],
+                           commit=self.get_closing_commit(node),
+                           state='closed' if node.get('state', closed_state) == closed_state else 'open',
+                           updated_at=node.get('updatedAt'))
+
+    def get_closed_labeled_issues(self, labels: Union[List[str], Set[str]]) -> List[ClosedIssue]:
+        """
+        Get all the closed issues, and merged pull requests, with one or more of the given labels.
+        Labels are matched in a single query, as GraphQL filters issues having any of them
+
+        :param labels: the issue labels
+        :return: the closed issues, along with the commits that closed them
+        """
+        return list(self.iter_issues('issues', ['CLOSED'], labels)) + \
+            list(self.iter_issues('pullRequests', ['MERGED'], labels))
+
+    def get_issue(self, number: int) -> Union[ClosedIssue, None]:
+        node = self.query(self.issue_query % {'closing': self.issue_closing_fields}, number=number)
+        node = node['repository']['issueOrPullRequest']
+        return self.get_closed_issue(node) if node else None
+
+    def get_updated_issues(self, since: str) -> List[ClosedIssue]:
+        issues = list()
+
+        for connection, states in (('issues', ['OPEN', 'CLOSED']), ('pullRequests', ['OPEN', 'CLOSED', 'MERGED'])):
+            # Issues are sorted by update time, newest first: the pages older than since are never requested
+            for issue in self.iter_issues(connection, states, order='UPDATED_AT'):
+                if issue.updated_at < since:
+                    break
+                issues.append(issue)
+
+        return issues
+
+    def get_issue_summary(self, issue: ClosedIssue) -> Tuple[int, str, List[str], str]:
+        return issue.number, issue.state, list(issue.labels), issue.updated_at
+
+    @staticmethod
+    def get_closing_commit(node: dict) -> Union[str, None]:
+        """
+        Return the commit that closed an issue or pull request
+        :param node: an issue or pull request node
+        :return: the sha of the first closing commit or pull request merge commit. None, if not found
+        """
+        if 'mergeCommit' in node:
+            return (node['mergeCommit'] or {}).get('oid')
+
+        for event in node['timelineItems']['nodes']:
+            closer = event.get('closer') or {}
+            sha = closer.get('oid') or (closer.get('mergeCommit') or {}).get('oid')
+            if sha:
+                return sha
+
+    def get_closed_issues(self, label: str) -> List[ClosedIssue]:
+        return self.get_closed_labeled_issues([label])
+
+    def get_commit_closing_issue(self, issue: ClosedIssue) -> str:
+        return issue.commit
+
+    def get_commits_closing_issues(self, issues: Iterable[ClosedIssue], workers: int = RESOLUTION_WORKERS) -> List[str]:
+        # Commits were fetched along with the issues: there is nothing to resolve concurrently
+        return [issue.commit for issue in issues]
+
+    def get_commits_closing_labeled_issues(self, labels: Union[List[str], Set[str]]) -> List[str]:
+        closed = {issue.number for issue in self.get_closed_labeled_issues(labels)}
+        return [commit_sha for iid, commit_sha in self.commit_closing_issues.items() if iid in closed]
+
+
 class GitlabHost(SVCHost):
 
-    def __init__(self, full_name: Union[str, int]):
-        self.__project = Gitlab('http://gitlab.com', os.getenv('GITLAB_ACCESS_TOKEN')).projects.get(full_name)
-        self.__commit_closing_issues = dict()
+    closing_references_in_title = True
+
+    def __init__(self, full_name: Union[str, int], adapter: BaseAdapter = None, path_to_repo: str = None,
+                 branch: str = None, url: str = 'http://gitlab.com'):
+        """
+        The class constructor.
+
+        :param full_name: the project full name (e.g., radon-h2020/radon-repository-miner) or id
+        :param adapter: the adapter to send requests through (e.g., a transport.CachingAdapter). Default the one
+        configured by the environment (see transport.get_adapter and transport.get_tokens)
+        :param path_to_repo: the path to a local clone of the repository (see SVCHost)
+        :param branch: the branch of the local clone (see SVCHost)
+        :param url: the url of the GitLab instance. Default http://gitlab.com
+        """
+        super().__init__(path_to_repo, branch)
+        tokens = transport.get_tokens('GITLAB_ACCESS_TOKEN')
+        client = transport.get_gitlab_client(url, next(iter(tokens), None), adapter or transport.get_adapter(tokens))
+        self.__project = client.projects.get(full_name)
+        self._merge_request_shas = dict()  # type: Dict[str, str]
+        self._merge_request_shas_lock = threading.Lock()
+        self._merge_requests_closing_issues = None
+
+    @property
+    def merge_requests_closing_issues(self) -> Dict[int, str]:
+        """
+        The map issue iid -> sha of the merge request closing it, built on first use.
+
+        Merged merge requests are listed once, in pages of 100, and their title and description are matched against
+        the issue closing pattern, as GitLab does to close issues on merge. Their sha are cached along the way
+        :return: a dictionary. If more merge requests close an issue, the oldest one is kept
+        """
+        with self._lock:
+            if self._merge_requests_closing_issues is None:
+                merge_requests_closing_issues = dict()
+                merge_request_shas = dict()
+
+                for mr in self.__project.mergerequests.list(state='merged', order_by='created_at', sort='asc',
+                                                            per_page=100, all=True, as_list=False):
+                    merge_request_shas[str(mr.iid)] = mr.sha
+
+                    for match in self.issue_closing_pattern.findall(f'{mr.title}\n{mr.description or ""}'):
+                        iid = match[2].strip()
+                        if iid:
+                            merge_requests_closing_issues.setdefault(int(iid), mr.sha)
+
+                with self._merge_request_shas_lock:
+                    self._merge_request_shas.update(merge_request_shas)
+
+                self._merge_requests_closing_issues = merge_requests_closing_issues
+
+        return self._merge_requests_closing_issues
+
+    def get_merge_request_sha(self, iid: str) -> str:
+        """
+        Return the sha of a merge request, fetching it only if not cached.
+        Safe to call from concurrent threads: each merge request is fetched at most once
+
+        :param iid: the iid of the merge request
+        :return: the sha of the merge request
+        """
+        with self._merge_request_shas_lock:
+            if iid not in self._merge_request_shas:
+                self._merge_request_shas[iid] = self.__project.mergerequests.get(iid).sha
+
+            return self._merge_request_shas[iid]
 
+    def get_remote_commit_messages(self) -> Generator[Tuple[str, str], None, None]:
         for commit in self.__project.commits.list(all=True, as_list=False):
-            matches = self.issue_closing_pattern.findall(commit.title)
-            for match in matches:
-                iid = match[2]
-                self.__commit_closing_issues[int(iid)] = commit.id
+            yield commit.id, commit.title
 
     def get_labels(self) -> Set[str]:
         return set([label.name for label in self.__project.labels.list(all=True)])
@@ -120,42 +731,374 @@ class GitlabHost(SVCHost):
     def get_closed_issues(self, label: str) -> List[ProjectIssue]:
         return self.__project.issues.list(state='closed', labels=[label], all=True)
 
-    def get_commit_closing_issue(self, issue: ProjectIssue) -> str:
-        sha = self.__commit_closing_issues.get(issue.iid)
-        if sha:
-            return sha
+    def get_issue(self, number: int) -> ProjectIssue:
+        return self.__project.issues.get(number)
 
-        closed_via_commit = re.compile('closed via commit ([0-9a-f]{5,40})')
-        closed_via_mr = re.compile('closed via merge request !([0-9]+)')
+    def get_updated_issues(self, since: str) -> List[ProjectIssue]:
+        return self.__project.issues.list(updated_after=since, all=True)
 
-        mr_iid = None
+    def get_issue_summary(self, issue: ProjectIssue) -> Tuple[int, str, List[str], str]:
+        return issue.iid, issue.state, list(issue.labels), issue.updated_at
 
-        for note in issue.notes.list(all=True, as_list=False, sort='desc'):
-            match = re.search(closed_via_mr, note.body)
-            if match:
-                mr_iid = match.groups()[0]
+    def get_commit_closing_issue(self, issue: ProjectIssue) -> str:
+        sha = self.commit_closing_issues.get(issue.iid)
+        if sha:
+            return sha
 
-            # look also for commit sha
-            match = re.search(closed_via_commit, note.body)
-            if match:
-                sha = match.groups()[0]
-                break
+        sha, mr_iid = parse_closing_notes(note.body for note in issue.notes.list(all=True, as_list=False, sort='desc'))
 
         if sha:
             return sha
         elif mr_iid:
-            mr = self.__project.mergerequests.get(mr_iid)
-            return mr.sha
+            return self.get_merge_request_sha(mr_iid)
+
+        # Merge requests merely mentioning the issue in their description may not have closed it: last resort only
+        return self.merge_requests_closing_issues.get(issue.iid)
+
+    def get_commits_closing_issues(self, issues: Iterable[ProjectIssue], workers: int = RESOLUTION_WORKERS) -> List[str]:
+        """
+        Get the commits that closed many issues, in batch.
+
+        Issues are first resolved in memory, by the commits referencing them (see commit_closing_issues). Only the
+        remaining ones are resolved one by one, concurrently, from their notes and, failing that, from the merge
+        requests referencing them (see get_commit_closing_issue).
+
+        :param issues: the issues
+        :param workers: the number of remaining issues to resolve concurrently
+        :return: the sha of the commit closing each issue (None if not found), in the same order as the issues
+        """
+        issues = list(issues)
+        commits = [self.commit_closing_issues.get(issue.iid) for issue in issues]
+
+        unresolved = [i for i, sha in enumerate(commits) if not sha]
+        for i, sha in zip(unresolved, super().get_commits_closing_issues([issues[i] for i in unresolved], workers)):
+            commits[i] = sha
+
+        return commits
+
+    def iter_commits_closing_issues(self, issues: Iterable[ProjectIssue], workers: int = RESOLUTION_WORKERS) \
+            -> Generator[Tuple[ProjectIssue, Union[str, None]], None, None]:
+        """
+        Get the commits that closed many issues, as soon as each one is resolved.
+        Issues resolved in memory by the commits referencing them come first, then the others (see
+        get_commits_closing_issues).
+
+        :param issues: the issues
+        :param workers: the number of remaining issues to resolve concurrently
+        :return: a generator of tuples (issue, sha of the commit closing it or None if not found)
+        """
+        unresolved = list()
+        for issue in issues:
+            sha = self.commit_closing_issues.get(issue.iid)
+            if sha:
+                yield issue, sha
+            else:
+                unresolved.append(issue)
+
+        yield from super().iter_commits_closing_issues(unresolved, workers)
 
     def get_commits_closing_labeled_issues(self, labels: Union[List[str], Set[str]]) -> List[str]:
         """
         Return the commits that close an issue with one or more of the given labels
         """
         commits = list()
-        for iid, commit_sha in self.__commit_closing_issues.items():
+        for iid, commit_sha in self.commit_closing_issues.items():
             issue = self.__project.issues.get(iid)
 
             if issue.state == 'closed' and any(label in issue.labels for label in labels):
                 commits.append(commit_sha)
 
         return commits
+
+
+class DumpHost(SVCHost):
+    """
+    This class implements a host on the issue tracker data exported to a local directory, for offline mining.
+
+    The directory contains one file per kind of record, either as a JSON list (e.g., ``issues.json``) or as JSON lines
+    (e.g., ``issues.jsonl``), with the same fields as the GitHub or GitLab API:
+
+    * ``labels``: the repository labels (``name``);
+    * ``issues``: the issues (``number`` or ``iid``, ``state``, ``labels`` as names or objects, ``created_at``,
+      ``updated_at``);
+    * ``events`` (optional): the issue events (``issue`` as number or object, or ``issue_number``; ``event``;
+      ``commit_id``; ``created_at``);
+    * ``notes`` (optional): the issue notes (``issue`` or ``noteable_iid``, ``body``, ``created_at``);
+    * ``merge_requests`` (optional): the merge requests (``iid``, ``merge_commit_sha`` or ``sha``);
+    * ``commits`` (optional): the commits (``sha`` or ``id``, ``message`` or ``title``), newest first.
+
+    The records are loaded once and indexed, so that every method is an in-memory lookup.
+    The commit closing an issue is the one of its earliest closing event, as on GitHub, or, failing that, the one
+    referenced by its notes, as on GitLab.
+    """
+
+    def __init__(self, full_name: Union[str, int] = None, path_to_dump: str = None, path_to_repo: str = None,
+                 branch: str = None):
+        """
+        The class constructor.
+
+        :param full_name: the repository full name (unused, for compatibility with the other hosts)
+        :param path_to_dump: the path to the export directory. Default the environment variable HOST_DUMP_DIR
+        :param path_to_repo: the path to a local clone of the repository (see SVCHost)
+        :param branch: the branch of the local clone (see SVCHost)
+        """
+        super().__init__(path_to_repo, branch)
+        self.path_to_dump = path_to_dump or os.getenv('HOST_DUMP_DIR')
+        if not self.path_to_dump or not os.path.isdir(self.path_to_dump):
+            raise ValueError(f'{self.path_to_dump} is not a valid export directory')
+
+        self.labels = {self.get_name(label) for label in self.load('labels')}
+
+        events = defaultdict(list)
+        for event in self.load('events'):
+            issue = event.get('issue', event.get('issue_number'))
+            number = issue.get('number', issue.get('iid')) if isinstance(issue, dict) else issue
+            events[number].append((number, event.get('event') or '', event.get('commit_id'),
+                                   event.get('created_at') or ''))
+
+        notes = defaultdict(list)
+        for note in self.load('notes'):
+            notes[note.get('issue', note.get('noteable_iid'))].append((note.get('created_at') or '', note.get('body') or ''))
+
+        merge_requests = {str(mr['iid']): mr.get('merge_commit_sha') or mr.get('sha')
+                          for mr in self.load('merge_requests')}
+
+        self.issues = dict()  # type: Dict[int, ClosedIssue]
+        self.issues_by_label = defaultdict(list)  # type: Dict[str, List[ClosedIssue]]
+
+        issues = list(self.load('issues'))
+        issues.sort(key=lambda issue: issue.get('created_at') or '', reverse=True)
+
+        for issue in issues:
+            number = issue.get('number', issue.get('iid'))
+
+            commit = index_closing_events(events.get(number, [])).get(number)
+            if not commit:
+                newest_first = sorted(notes.get(number, []), key=lambda note: note[0], reverse=True)
+                sha, mr_iid = parse_closing_notes(body for _, body in newest_first)
+                commit = sha or merge_requests.get(mr_iid)
+
+            closed_issue = ClosedIssue(number=number, labels=[self.get_name(label) for label in issue.get('labels', [])],
+                                       commit=commit,
+                                       state='closed' if issue.get('state') == 'closed' else 'open',
+                                       updated_at=issue.get('updated_at') or issue.get('created_at') or '')
+            self.issues[number] = closed_issue
+
+            if closed_issue.state == 'closed':
+                for label in closed_issue.labels:
+                    self.issues_by_label[label].append(closed_issue)
+
+    @staticmethod
+    def get_name(label: Union[str, dict]) -> str:
+        return label['name'] if isinstance(label, dict) else label
+
+    def load(self, kind: str) -> Generator[dict, None, None]:
+        """
+        Load the records of a kind
+        :param kind: the kind of records (e.g., 'issues'), i.e., the name of the file without extension
+        :return: a generator of records (empty if the file does not exist)
+        """
+        path = os.path.join(self.path_to_dump, kind)
+
+        if os.path.isfile(f'{path}.jsonl'):
+            with open(f'{path}.jsonl', 'r') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+        elif os.path.isfile(f'{path}.json'):
+            with open(f'{path}.json', 'r') as f:
+                yield from json.load(f)
+
+    def get_remote_commit_messages(self) -> Generator[Tuple[str, str], None, None]:
+        for commit in self.load('commits'):
+            yield commit.get('sha', commit.get('id')), commit.get('message', commit.get('title')) or ''
+
+    def get_labels(self) -> Set[str]:
+        return set(self.labels)
+
+    def get_closed_issues(self, label: str) -> List[ClosedIssue]:
+        return list(self.issues_by_label.get(label, []))
+
+    def get_issue(self, number: int) -> Union[ClosedIssue, None]:
+        return self.issues.get(number)
+
+    def get_updated_issues(self, since: str) -> List[ClosedIssue]:
+        return [issue for issue in self.issues.values() if issue.updated_at >= since]
+
+    def get_issue_summary(self, issue: ClosedIssue) -> Tuple[int, str, List[str], str]:
+        return issue.number, issue.state, list(issue.labels), issue.updated_at
+
+    def get_commit_closing_issue(self, issue: ClosedIssue) -> str:
+        return issue.commit
+
+    def get_commits_closing_issues(self, issues: Iterable[ClosedIssue], workers: int = RESOLUTION_WORKERS) -> List[str]:
+        return [issue.commit for issue in issues]
+
+    def get_commits_closing_labeled_issues(self, labels: Union[List[str], Set[str]]) -> List[str]:
+        closed = {issue.number for label in labels for issue in self.issues_by_label.get(label, [])}
+        return [commit_sha for iid, commit_sha in self.commit_closing_issues.items() if iid in closed]
+
+
+class IncrementalHost(SVCHost):
+    """
+    This class wraps a host to sync its closed issues incrementally into a local issue store.
+
+    The first time a label is synced, all its closed issues are fetched and resolved to the commits that closed them.
+    Afterwards, only the issues updated since the last sync (i.e., the watermark of the label) are requested: new
+    closures are resolved and added to the store, reopened issues are removed from it, and the labels of the others
+    are updated (e.g., if they lost the label). Stored issues whose closing commit was not found are looked up again
+    at the following syncs, up to RESOLUTION_ATTEMPTS times. The store and the watermarks are persisted to a JSON file,
+    so that each run only pays for what changed since the previous one.
+    """
+
+    def __init__(self, host: SVCHost, path_to_store: str, workers: int = RESOLUTION_WORKERS):
+        """
+        The class constructor.
+
+        :param host: the host to sync from
+        :param path_to_store: the path to the JSON file of the store. It is created if it does not exist
+        :param workers: the number of new issues to resolve concurrently
+        """
+        super().__init__(host.path_to_repo, host.branch)
+        self.host = host
+        self.path_to_store = path_to_store
+        self.workers = workers
+
+        self.issues = dict()  # type: Dict[int, dict]
+        self.watermarks = dict()  # type: Dict[str, str]
+
+        if os.path.isfile(path_to_store):
+            with open(path_to_store, 'r') as f:
+                store = json.load(f)
+                self.issues = {int(number): issue for number, issue in store['issues'].items()}
+                self.watermarks = store['watermarks']
+
+    @property
+    def commit_closing_issues(self) -> Dict[int, str]:
+        return self.host.commit_closing_issues
+
+    def save(self) -> None:
+        """ Persist the store, atomically """
+        directory = os.path.dirname(os.path.abspath(self.path_to_store))
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'watermarks': self.watermarks, 'issues': self.issues}, f)
+
+        os.replace(tmp, self.path_to_store)
+
+    def sync(self, label: str) -> None:
+        """
+        Sync the closed issues with a label since its watermark, and persist the store
+        :param label: the issue label
+        """
+        watermark = self.watermarks.get(label)
+        if watermark:
+            # Updated issues are requested regardless of their labels, to also update those that lost the label
+            issues = self.host.get_updated_issues(since=watermark)
+        else:
+            issues = self.host.get_closed_issues(label)
+
+        updated = set()
+        unresolved = dict()  # Issues to resolve, by number
+        for issue in issues:
+            number, state, labels, updated_at = self.host.get_issue_summary(issue)
+            watermark = max(watermark or updated_at, updated_at)
+            updated.add(number)
+
+            if state != 'closed':
+                self.issues.pop(number, None)
+            elif number in self.issues:
+                stored = self.issues[number]
+                if stored['commit'] is None and (stored.get('updated_at') != updated_at
+                                                 or stored.get('attempts', 1) < RESOLUTION_ATTEMPTS):
+                    unresolved[number] = issue
+
+                stored.update(labels=labels, updated_at=updated_at)
+            elif label in labels:
+                self.issues[number] = {'labels': labels, 'commit': None, 'updated_at': updated_at, 'attempts': 0}
+                unresolved[number] = issue
+
+        # Issues not updated since the previous sync, whose closing commit was not found (e.g., not pushed yet)
+        for number, stored in self.issues.items():
+            if stored['commit'] is None and label in stored['labels'] and number not in updated \
+                    and stored.get('attempts', 1) < RESOLUTION_ATTEMPTS:
+                issue = self.host.get_issue(number)
+                if issue is not None:
+                    unresolved[number] = issue
+
+        commits = self.host.get_commits_closing_issues(list(unresolved.values()), workers=self.workers)
+        for number, commit in zip(unresolved, commits):
+            self.issues[number]['commit'] = commit
+            self.issues[number]['attempts'] = self.issues[number].get('attempts', 1) + 1
+
+        if watermark:
+            self.watermarks[label] = watermark
+
+        self.save()
+
+    def get_remote_commit_messages(self) -> Iterable[Tuple[str, str]]:
+        return self.host.get_remote_commit_messages()
+
+    def get_labels(self) -> Set[str]:
+        return self.host.get_labels()
+
+    def get_closed_issues(self, label: str) -> List[ClosedIssue]:
+        self.sync(label)
+        return [ClosedIssue(number=number, labels=issue['labels'], commit=issue['commit'])
+                for number, issue in sorted(self.issues.items(), reverse=True) if label in issue['labels']]
+
+    def get_issue(self, number: int):
+        return self.host.get_issue(number)
+
+    def get_updated_issues(self, since: str) -> Iterable:
+        return self.host.get_updated_issues(since)
+
+    def get_issue_summary(self, issue) -> Tuple[int, str, List[str], str]:
+        return self.host.get_issue_summary(issue)
+
+    def get_commit_closing_issue(self, issue: ClosedIssue) -> str:
+        return issue.commit
+
+    def get_commits_closing_issues(self, issues: Iterable[ClosedIssue], workers: int = RESOLUTION_WORKERS) -> List[str]:
+        return [issue.commit for issue in issues]
+
+    def get_commits_closing_labeled_issues(self, labels: Union[List[str], Set[str]]) -> List[str]:
+        return self.host.get_commits_closing_labeled_issues(labels)
+
+
+# Host implementations, by host and API
+BACKENDS = {
+    ('github', 'rest'): GithubHost,
+    ('github', 'graphql'): GithubGraphQLHost,
+    ('gitlab', 'rest'): GitlabHost,
+    ('github', 'dump'): DumpHost,
+    ('gitlab', 'dump'): DumpHost
+}
+
+
+def get_host(host: str, full_name: Union[str, int], backend: str = 'rest', **kwargs) -> SVCHost:
+    """
+    Return the host of a repository
+    :param host: the source code versioning host ('github' or 'gitlab')
+    :param full_name: the repository full name (e.g., radon-h2020/radon-repository-miner)
+    :param backend: the API to use ('rest', 'dump' for exported data, or, for github only, 'graphql'). Default 'rest'
+    :param kwargs: any other option of the host (e.g., path_to_repo). If store_dir is given (or ISSUE_STORE_DIR is
+    set), the issues of REST hosts are synced incrementally into a store in that directory (see IncrementalHost)
+    :return: the host
+    """
+    if (host, backend) not in BACKENDS:
+        if host not in {name for name, _ in BACKENDS}:
+            raise ValueError("Parameter host must be one among ('github', 'gitlab')")
+        raise ValueError(f"Backend {backend} is not available for {host}")
+
+    store_dir = kwargs.pop('store_dir', None) or os.getenv('ISSUE_STORE_DIR')
+    svc_host = BACKENDS[(host, backend)](full_name, **kwargs)
+
+    if store_dir and backend == 'rest':
+        path_to_store = os.path.join(store_dir, f'{host}_{full_name}.json'.replace('/', '_'))
+        svc_host = IncrementalHost(svc_host, path_to_store)
+
+    return svc_host
@@ -1,10 +1,12 @@
 from ansiblemetrics import metrics_extractor
 from .base import BaseMetricsExtractor
-from repominer.filters import is_ansible_file
+from repominer.filters import ANSIBLE_CLASSIFIER
 
 
 class AnsibleMetricsExtractor(BaseMetricsExtractor):
 
+    classifier = ANSIBLE_CLASSIFIER
+
     def __init__(self, path_to_repo: str, at: str):
         super().__init__(path_to_repo, at)
 
@@ -20,4 +22,4 @@ class AnsibleMetricsExtractor(BaseMetricsExtractor):
             return dict()
 
     def ignore_file(self, path_to_file: str, content: str = None):
-        return not is_ansible_file(path_to_file)
+        return not self.classifier(path_to_file)
@@ -14,19 +14,22 @@ from pydriller.metrics.process.hunks_count import HunksCount
 from pydriller.metrics.process.lines_count import LinesCount
 
 from repominer.files import FailureProneFile
+from repominer.filters import PathClassifier
 
 from typing import Any, Dict, Set, Union
 
 full_name_pattern = re.compile(r'git(hub|lab)\.com/([\w\W]+)$')
 
 
-def get_content(path: str) -> Union[str, None]:
+def get_content(path: str, size: int = -1) -> Union[str, None]:
     """ Get the content of a file as plain text.
 
     Parameters
     ----------
     path : str
         The path to the file.
+    size : int
+        The number of characters to read. Default -1 (i.e., the whole file).
 
     Return
     ------
@@ -39,7 +42,7 @@ def get_content(path: str) -> Union[str, None]:
 
     try:
         with open(path, 'r') as f:
-            return f.read()
+            return f.read(size)
     except UnicodeDecodeError:
         return None
 
@@ -65,8 +68,19 @@ class BaseMetricsExtractor:
     """ This is the base class to extract metrics from IaC scripts.
     It is extended by concrete classes to extract metrics for specific languages (e.g., Ansible and Tosca).
 
+    Attributes
+    ----------
+    classifier: PathClassifier
+        The classifier used to prune directories when walking the repository. By default, it accepts every file.
+    needs_blobs: bool
+        Whether ``blobs`` is populated at each release, for extractors that memoize information by blob id.
+        Default False, as listing the whole tree at each release is not free.
+
     """
 
+    classifier = PathClassifier()
+    needs_blobs = False
+
     def __init__(self, path_to_repo: str, at: str = 'release'):
         """ The clss constructor.
 
@@ -81,6 +95,9 @@ class BaseMetricsExtractor:
         ----------
         dataset: pandas.DataFrame
             The metrics dataset, populated after ``extract()``.
+        blobs: Dict[str, str]
+            The blob id of each file at the release being analyzed, populated during ``extract()`` if ``needs_blobs``.
+            It allows to memoize information about files whose content does not change across releases.
 
         Raises
         ------
@@ -119,31 +136,47 @@ class BaseMetricsExtractor:
 
         self.releases = [commit.hash for commit in self.repo_miner.traverse_commits()]
         self.dataset = pd.DataFrame()
+        self.blobs = dict()
 
-    def get_files(self) -> Set[str]:
-        """ Return all the files in the repository
+    def get_blobs(self, git_repo: GitRepository, commit: str) -> Dict[str, str]:
+        """ Return the blob id of every file at a given commit
+
+        Parameters
+        ----------
+        git_repo : GitRepository
+            The repository.
+        commit : str
+            The commit hash.
 
         Return
         ------
-        Set[str]
-            The set of filepath relative to the root of repository
+        Dict[str, str]
+            A dictionary of <filepath relative to the root of repository, blob id>
 
         """
+        blobs = dict()
 
-        files = set()
-
-        for root, _, filenames in os.walk(self.path_to_repo):
-            if '.git' in root:
+        for entry in git_repo.repo.git.ls_tree('-r', '-z', commit).split('\0'):
+            if not entry:
                 continue
-            for filename in filenames:
-                path = os.path.join(root, filename)
-                path = path.replace(self.path_to_repo, '')
-                if path.startswith('/'):
-                    path = path[1:]
 
-                files.add(path)
+            info, path = entry.split('\t', 1)
+            _, object_type, object_id = info.split()
+            if object_type == 'blob':
+                blobs[path] = object_id
 
-        return files
+        return blobs
+
+    def get_files(self) -> Set[str]:
+        """ Return all the files in the repository, apart from those in directories pruned by ``classifier``
+
+        Return
+        ------
+        Set[str]
+            The set of filepath relative to the root of repository
+
+        """
+        return set(self.classifier.walk(self.path_to_repo))
 
     def get_product_metrics(self, script: str) -> Dict[str, Any]:
         """ Extract source code metrics from a script.
@@ -247,8 +280,14 @@ class BaseMetricsExtractor:
                 to_current_commit = commit.hash  # = self.releases[i]
                 process_metrics = self.get_process_metrics(from_previous_commit, to_current_commit)
 
+            self.blobs = self.get_blobs(git_repo, commit.hash) if self.needs_blobs else dict()
+
             for filepath in self.get_files():
 
+                # Ignore files based on their path before reading them
+                if self.ignore_file(filepath):
+                    continue
+
                 file_content = get_content(os.path.join(self.path_to_repo, filepath))
 
                 if not file_content or self.ignore_file(filepath, file_content):
@@ -309,6 +348,24 @@ class BaseMetricsExtractor:
             git_repo.reset()
 
     def ignore_file(self, path_to_file: str, content: str = None):
+        """ Ignore a file.
+
+        It is called twice for each file: first with its path only, to skip files without reading them, then with
+        its content.
+
+        Parameters
+        ----------
+        path_to_file : str
+            The filepath relative to the root of repository.
+        content : str
+            The file content, if already read.
+
+        Returns
+        -------
+        bool
+            True if the file must be ignored. False, otherwise.
+
+        """
         return False
 
     def to_csv(self, filepath):
@@ -1,11 +1,16 @@
+import os
+
 from io import StringIO
 from toscametrics import metrics_extractor
-from .base import BaseMetricsExtractor
-from repominer.filters import is_tosca_file
+from .base import BaseMetricsExtractor, get_content
+from repominer.filters import TOSCA_CLASSIFIER, is_tosca_file, sniff_tosca_file
 
 
 class ToscaMetricsExtractor(BaseMetricsExtractor):
 
+    classifier = TOSCA_CLASSIFIER
+    needs_blobs = True
+
     def __init__(self, path_to_repo: str, at: str):
         super().__init__(path_to_repo, at)
 
@@ -19,4 +24,10 @@ class ToscaMetricsExtractor(BaseMetricsExtractor):
             return {}
 
     def ignore_file(self, path_to_file: str, content: str = None):
-        return not is_tosca_file(path_to_file, content)
+        if content:
+            return not is_tosca_file(path_to_file, content)
+
+        # Read only the head of the YAML files, and only once for each blob
+        return not sniff_tosca_file(path_to_file,
+                                    blob_id=self.blobs.get(path_to_file),
+                                    read=lambda size: get_content(os.path.join(self.path_to_repo, path_to_file), size))
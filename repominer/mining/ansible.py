@@ -1,15 +1,22 @@
 import yaml
 
-from typing import List
+from typing import Generator, List, Tuple
 
-from pydriller.repository_mining import RepositoryMining
-from pydriller.domain.commit import ModificationType
+from pydriller.domain.commit import Commit, ModificationType
 
 from repominer import filters, utils
 from repominer.mining.ansible_modules import DATABASE_MODULES, FILE_MODULES, IDENTITY_MODULES, NETWORK_MODULES, STORAGE_MODULES
 from repominer.mining.base import BaseMiner, FixingCommitClassifier
+from repominer.mining.traversal import PathFilteredRepositoryMining
 
-CONFIG_DATA_MODULES = DATABASE_MODULES + FILE_MODULES + IDENTITY_MODULES + NETWORK_MODULES + STORAGE_MODULES
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+CONFIG_DATA_MODULES = frozenset(DATABASE_MODULES + FILE_MODULES + IDENTITY_MODULES + NETWORK_MODULES + STORAGE_MODULES)
+INCLUDE_MODULES = frozenset(('include', 'include_role', 'include_tasks', 'include_vars', 'import_playbook',
+                             'import_tasks', 'import_role'))
 
 
 class AnsibleMiner(BaseMiner):
@@ -31,16 +38,43 @@ class AnsibleMiner(BaseMiner):
         # get a sorted list of commits in ascending order of date
         self.sort_commits(commits)
 
-        for commit in RepositoryMining(self.path_to_repo,
-                                       from_commit=commits[0],  # first commit in commits
-                                       to_commit=commits[-1],  # last commit in commits
-                                       only_in_branch=self.branch).traverse_commits():
+        # sorting drops commits outside the mining window
+        if not commits:
+            return
+
+        # commits that do not touch any file matching the pathspecs are not traversed, so keep only the commits
+        # where an Ansible file has been modified
+        desired = set()
+
+        # from the first to the last commit in commits (pydriller does not accept a range of a single commit)
+        if len(commits) == 1:
+            bounds = dict(single=commits[0])
+        else:
+            bounds = dict(from_commit=commits[0], to_commit=commits[-1])
 
-            # if none of the modified files is a Ansible file, then discard the commit
-            if not any(modified_file.change_type == ModificationType.MODIFY and filters.is_ansible_file(
+        for commit in PathFilteredRepositoryMining(self.path_to_repo,
+                                                   pathspecs=self.get_pathspecs(),
+                                                   only_in_branch=self.branch,
+                                                   **bounds).traverse_commits():
+
+            # if at least one of the modified files is an Ansible file, then keep the commit
+            if any(modified_file.change_type == ModificationType.MODIFY and filters.is_ansible_file(
                     modified_file.new_path) for modified_file in commit.modifications):
-                if commit.hash in commits:
-                    commits.remove(commit.hash)
+                desired.add(commit.hash)
+
+        commits[:] = [commit for commit in commits if commit in desired]
+
+    def get_pathspecs(self) -> List[str]:
+        """
+        Return the git pathspecs of Ansible files.
+
+        Returns
+        -------
+        List[str]
+            The list of pathspecs.
+
+        """
+        return filters.ansible_pathspecs()
 
     def ignore_file(self, path_to_file: str, content: str = None):
         """
@@ -67,66 +101,82 @@ class AnsibleFixingCommitClassifier(FixingCommitClassifier):
     """ This class extends a FixingCommitClassifier to classify bug-fixing commits of Ansible files.
     """
 
-    def data_changed(self) -> bool:
-        for modification in self.commit.modifications:
-            if modification.change_type != ModificationType.MODIFY or not filters.is_ansible_file(modification.new_path):
-                continue
+    def __init__(self, commit: Commit, nlp_backend: str = None):
+        """
+        The class constructor.
 
-            try:
-                source_code_before = yaml.safe_load(modification.source_code_before)
-                source_code_current = yaml.safe_load(modification.source_code)
+        Parameters
+        ----------
+        commit: Commit
+            The commit to analyze.
 
-                data_before = [value for key, value in utils.key_value_list(source_code_before) if key in CONFIG_DATA_MODULES]
-                data_current = [value for key, value in utils.key_value_list(source_code_current) if key in CONFIG_DATA_MODULES]
+        nlp_backend: str
+            The NLP backend (see ``FixingCommitClassifier``). Default None.
 
-                return data_before != data_current
+        """
+        super().__init__(commit, nlp_backend)
+        self._key_values = []  # type: List[Tuple[list, list]]
+        self._unparsed = None
 
-            except yaml.YAMLError:
-                pass
+    def key_values(self) -> Generator[Tuple[list, list], None, None]:
+        """
+        Return, for each modified Ansible file whose versions are both valid YAML, the key-value pairs (see
+        ``utils.key_value_list``) before and after the commit.
 
-        return False
+        Files are parsed lazily, in order, and at most once per classifier, so that the checks on the diff share the
+        parsed files. The C LibYAML loader is used, if available.
 
-    def include_changed(self) -> bool:
-        for modification in self.commit.modifications:
-            if modification.change_type != ModificationType.MODIFY or not filters.is_ansible_file(
-                    modification.new_path):
-                continue
+        Returns
+        -------
+        Generator[Tuple[list, list], None, None]
+            The key-value pairs before and after the commit.
 
-            try:
-                source_code_before = yaml.safe_load(modification.source_code_before)
-                source_code_current = yaml.safe_load(modification.source_code)
+        """
+        if self._unparsed is None:
+            self._unparsed = iter(self.commit.modifications)
 
-                includes_before = [value for key, value in utils.key_value_list(source_code_before) if key in (
-                    'include', 'include_role', 'include_tasks', 'include_vars', 'import_playbook', 'import_tasks',
-                    'import_role')]
-                includes_current = [value for key, value in utils.key_value_list(source_code_current) if key in (
-                    'include', 'include_role', 'include_tasks', 'include_vars', 'import_playbook', 'import_tasks',
-                    'import_role')]
+        i = 0
+        while True:
+            while i < len(self._key_values):
+                yield self._key_values[i]
+                i += 1
 
-                return includes_before != includes_current
+            modification = next(self._unparsed, None)
+            if modification is None:
+                return
 
+            if modification.change_type != ModificationType.MODIFY or not filters.is_ansible_file(modification.new_path):
+                continue
+
+            try:
+                source_code_before = yaml.load(modification.source_code_before, Loader=SafeLoader)
+                source_code_current = yaml.load(modification.source_code, Loader=SafeLoader)
             except yaml.YAMLError:
-                pass
+                continue
 
-        return False
+            self._key_values.append((utils.key_value_list(source_code_before),
+                                     utils.key_value_list(source_code_current)))
 
-    def service_changed(self) -> bool:
-        for modification in self.commit.modifications:
-            if modification.change_type != ModificationType.MODIFY or not filters.is_ansible_file(
-                    modification.new_path):
-                continue
+    def data_changed(self) -> bool:
+        for key_values_before, key_values_current in self.key_values():
+            data_before = [value for key, value in key_values_before if key in CONFIG_DATA_MODULES]
+            data_current = [value for key, value in key_values_current if key in CONFIG_DATA_MODULES]
+            return data_before != data_current
 
-            try:
-                source_code_before = yaml.safe_load(modification.source_code_before)
-                source_code_current = yaml.safe_load(modification.source_code)
+        return False
 
-                services_before = [value for key, value in utils.key_value_list(source_code_before) if key == 'service']
-                services_current = [value for key, value in utils.key_value_list(source_code_current) if
-                                    key == 'service']
+    def include_changed(self) -> bool:
+        for key_values_before, key_values_current in self.key_values():
+            includes_before = [value for key, value in key_values_before if key in INCLUDE_MODULES]
+            includes_current = [value for key, value in key_values_current if key in INCLUDE_MODULES]
+            return includes_before != includes_current
 
-                return services_before != services_current
+        return False
 
-            except yaml.YAMLError:
-                pass
+    def service_changed(self) -> bool:
+        for key_values_before, key_values_current in self.key_values():
+            services_before = [value for key, value in key_values_before if key == 'service']
+            services_current = [value for key, value in key_values_current if key == 'service']
+            return services_before != services_current
 
         return False
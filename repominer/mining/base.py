@@ -1,29 +1,20 @@
 import os
-import nltk
+import queue
 import re
+import threading
 
 from abc import ABCMeta, abstractmethod
-from typing import Generator, List, Set
+from datetime import datetime
+from typing import Dict, Generator, Iterable, List, Set, Union
 
-from pydriller.domain.commit import Commit, ModificationType
-from pydriller.repository_mining import GitRepository, RepositoryMining
+from git import Git
+from pydriller.domain.commit import Commit, Modification, ModificationType
 
 from repominer import utils
 from repominer.files import FixedFile, FailureProneFile
-from repominer.hosts import GithubHost, GitlabHost
+from repominer.hosts import SVCHost, get_host, RESOLUTION_WORKERS
 from repominer.mining import rules
-
-# Important: downloading resources for NLTK
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
-
+from repominer.mining.traversal import BoundedGitRepository, PathFilteredRepositoryMining
 
 # Constants
 BUG_RELATED_LABELS = {'bug', 'Bug', 'bug :bug:', 'Bug - Medium', 'Bug - Low', 'Bug - Critical', 'ansible_bug',
@@ -33,6 +24,13 @@ BUG_RELATED_LABELS = {'bug', 'Bug', 'bug :bug:', 'Bug - Medium', 'Bug - Low', 'B
 
 FIXING_COMMITS_REGEX = r'(bug|fix|error|crash|problem|fail|defect|patch)'
 
+# Categories of IaC defects fixed by a commit, as classified by FixingCommitClassifier.fixes_<category>
+DEFECT_CATEGORIES = ('conditional', 'configuration_data', 'dependency', 'documentation', 'idempotency', 'security',
+                     'service', 'syntax')
+
+# Closing commits buffered between the host and the local checks, when pipelined
+PIPELINE_QUEUE_SIZE = 64
+
 full_name_pattern = re.compile(r'(github|gitlab){1}\.com/([\w\W]+)$')
 
 
@@ -46,7 +44,9 @@ class BaseMiner:
 
     def __init__(self,
                  url_to_repo: str,
-                 branch: str = 'master'):
+                 branch: str = 'master',
+                 since: Union[datetime, str] = None,
+                 until: Union[datetime, str] = None):
         """
         The class constructor.
         Initialize a new BaseMiner.
@@ -59,6 +59,12 @@ class BaseMiner:
         branch : str
             the branch to analyze. Default 'master'
 
+        since : Union[datetime, str]
+            mine only commits from this date or commit hash on. Default None (i.e., from the first commit)
+
+        until : Union[datetime, str]
+            mine only commits up to this date or commit hash. Default None (i.e., up to the last commit)
+
 
         Attributes
         ----------
@@ -73,8 +79,27 @@ class BaseMiner:
         branch : str
             Repository's branch to analyze.
 
+        since : Union[datetime, str]
+            Lower bound (date or commit hash) of the mining window.
+
+        until : Union[datetime, str]
+            Upper bound (date or commit hash) of the mining window.
+
+            Bounds are pushed into every traversal and blame, so that mining a window of an old repository costs
+            only as much as the window.
+
+            Example
+            -------
+            .. highlight:: python
+            .. code-block:: python
+
+                from datetime import datetime
+                from repominer.mining.base import BaseMiner
+
+                miner = BaseMiner('https://github.com/radon-h2020/radon-repository-miner', since=datetime(2019, 1, 1))
+
         commit_hashes : List[str]
-            List of commit hash on the repository's branch, ordered by creation date.
+            List of commit hash on the repository's branch within the mining window, ordered by creation date.
 
         exclude_commits : Set[str]
             Set of commit hash to exclude from mining.
@@ -121,6 +146,31 @@ class BaseMiner:
                               bic=None)
                 ]
 
+        host_options : dict
+            Keyword arguments passed to the host (``GithubHost`` or ``GitlabHost``) when mining closed issues.
+
+            The ``backend`` option selects the API (``'rest'`` or, for GitHub only, ``'graphql'``).
+            For example, to resolve the commits closing GitHub issues from the repository-wide stream of issue events:
+
+            Example
+            -------
+            .. highlight:: python
+            .. code-block:: python
+
+                from repominer.mining.base import BaseMiner
+
+                miner = BaseMiner('https://github.com/radon-h2020/radon-repository-miner')
+                miner.host_options = {'events_stream': True}
+
+        closing_commits : Dict[int, str]
+            Commit closing each issue, by issue number, as resolved by ``get_fixing_commits_from_closed_issues``.
+            Issues are resolved once for the lifetime of the miner, even if they have several of the given labels.
+
+        dropped_closing_commits : Dict[str, int]
+            Number of distinct commits closing issues that were dropped because they are not in ``commit_hashes``,
+            either because they are not on the branch (``'off_branch'``, e.g., commits on forks or on the branches of
+            pull requests) or because they are outside the mining window (``'out_of_window'``).
+
         fixing_commits : List[str]
             List of bug-fixing commit hashes.
 
@@ -158,9 +208,16 @@ class BaseMiner:
         self.host = match.groups()[0]
         self.repository = match.groups()[1]
         self.branch = branch
+        self.since = since
+        self.until = until
 
         self.exclude_commits = set()  # This is to set up commits known to be non-fixing in advance
         self.exclude_fixed_files = list()  # This is to set up files in fixing-commits known to be false-positive
+        self.host_options = dict()
+        self.closing_commits = dict()  # Memoizes the commit closing each issue, by issue number
+        self.dropped_closing_commits = {'off_branch': 0, 'out_of_window': 0}
+        self._svc_host = None  # Reused across calls, until host_options change
+        self._svc_host_options = None
         self.fixing_commits = list()
         self.fixed_files = list()
 
@@ -168,10 +225,116 @@ class BaseMiner:
 
         # Get all the repository commits sorted by commit date
         self.commit_hashes = [c.hash for c in
-                              RepositoryMining(path_to_repo=self.path_to_repo if os.path.isdir(self.path_to_repo) else url_to_repo,
-                                               clone_repo_to=os.getenv('TMP_REPOSITORIES_DIR'),
-                                               only_in_branch=self.branch,
-                                               order='date-order').traverse_commits()]
+                              PathFilteredRepositoryMining(self.path_to_repo if os.path.isdir(self.path_to_repo) else url_to_repo,
+                                                           clone_repo_to=os.getenv('TMP_REPOSITORIES_DIR'),
+                                                           only_in_branch=self.branch,
+                                                           order='date-order',
+                                                           **self.window()).traverse_commits()]
+
+        # For constant-time membership tests. The whole branch is only listed if needed (see on_branch)
+        self._commit_set = set(self.commit_hashes)
+        self._branch_set = None
+        self._dropped_commits = set()
+
+    def window(self) -> dict:
+        """
+        Return the filters that restrict a traversal of the branch to the mining window.
+
+        The filters can be passed as keyword arguments to ``PathFilteredRepositoryMining``. Dates are mapped to
+        ``since`` and ``to``, commit hashes to ``from_commit`` and ``to_commit``. A starting commit always comes with an
+        ending commit (the branch, if not given), as pydriller would otherwise traverse up to HEAD.
+
+        Returns
+        -------
+        dict
+            The traversal filters. An empty dictionary if the miner is not bounded.
+
+        """
+        filters = dict()
+
+        if isinstance(self.since, datetime):
+            filters['since'] = self.since
+        elif self.since:
+            filters['from_commit'] = self.since
+
+        if isinstance(self.until, datetime):
+            filters['to'] = self.until
+        elif self.until:
+            filters['to_commit'] = self.until
+
+        if 'from_commit' in filters:
+            # Without an upper commit, pydriller traverses from the starting commit to HEAD rather than to the branch
+            filters.setdefault('to_commit', self.branch)
+
+        return filters
+
+    def on_branch(self, commit: str) -> bool:
+        """
+        Check whether a commit is reachable from the branch, regardless of the mining window.
+
+        Parameters
+        ----------
+        commit : str
+            A commit hash.
+
+        Returns
+        -------
+        bool
+            True if the commit is on the branch. False, otherwise.
+
+        """
+        if commit in self._commit_set or not self.window():
+            return commit in self._commit_set
+
+        if self._branch_set is None:
+            self._branch_set = set(Git(self.path_to_repo).rev_list(self.branch or 'HEAD').split())
+
+        return commit in self._branch_set
+
+    def filter_closing_commits(self, commits: List[str]) -> List[str]:
+        """
+        Drop the commits that are not in ``commit_hashes``, and count them in ``dropped_closing_commits``.
+
+        Commits closing issues may belong to forks or to the branches of pull requests. Dropping them as soon as they
+        are resolved saves the traversal of the history ranges that include them, as they could never be labeled.
+
+        Parameters
+        ----------
+        commits : List[str]
+            List of commit hash (None are ignored).
+
+        Returns
+        -------
+        List[str]
+            The commits in ``commit_hashes``, in the same order.
+
+        """
+        for commit in set(commits).difference(self._commit_set, self._dropped_commits, (None,)):
+            self._dropped_commits.add(commit)
+            self.dropped_closing_commits['off_branch' if not self.on_branch(commit) else 'out_of_window'] += 1
+
+        return [commit for commit in commits if commit in self._commit_set]
+
+    def get_svc_host(self) -> SVCHost:
+        """
+        Return the host of the repository, configured by ``host_options``.
+
+        The host is built once and reused across calls, along with its client, its indexes of closing commits, and
+        the pooled connections of its transport. It is built again only if ``host_options`` change.
+
+        Returns
+        -------
+        SVCHost
+            The host.
+
+        """
+        if self._svc_host is None or self._svc_host_options != self.host_options:
+            # Commits closing issues are looked up in the local clone rather than enumerated through the API
+            self._svc_host = get_host(self.host, self.repository, path_to_repo=self.path_to_repo, branch=self.branch,
+                                      **self.host_options)
+            self._svc_host_options = dict(self.host_options)
+
+        return self._svc_host
 
     def discard_undesired_fixing_commits(self, commits: List[str]) -> None:
         """
@@ -191,7 +354,10 @@ class BaseMiner:
         """
         pass
 
-    def get_fixing_commits_from_closed_issues(self, labels: Set[str] = None) -> List[str]:
+    def get_fixing_commits_from_closed_issues(self, labels: Set[str] = None,
+                                              workers: int = RESOLUTION_WORKERS,
+                                              pipelined: bool = False,
+                                              queue_size: int = PIPELINE_QUEUE_SIZE) -> List[str]:
         """
         Return a list of bug-fixing commit hash.
 
@@ -212,6 +378,17 @@ class BaseMiner:
         labels : Set[str]
             Set of bug-related labels (e.g., bug, bugfix, type: bug). If none is passed, the default labels are used.
 
+        workers : int
+            Number of issues whose closing commit is resolved concurrently. Default 8. The order of the
+            resulting commits does not depend on it.
+
+        pipelined : bool
+            Whether to check the closing commits against the local clone while the others are still being resolved
+            (see ``pipeline_closing_commits``), rather than once all of them are. The result is the same. Default False.
+
+        queue_size : int
+            When pipelined, the maximum number of closing commits resolved ahead of the local checks. Default 64.
+
         Returns
         -------
         List[str]
@@ -219,12 +396,7 @@ class BaseMiner:
 
         """
 
-        if self.host == 'github':
-            host = GithubHost(self.repository)
-        elif self.host == 'gitlab':
-            host = GitlabHost(self.repository)
-        else:
-            raise ValueError("Parameter host must be one among ('github', 'gitlab')")
+        host = self.get_svc_host()
 
         if not labels:
             labels = BUG_RELATED_LABELS
@@ -232,19 +404,36 @@ class BaseMiner:
         # Get the repository labels (self.get_labels()) and keep only those matching the input labels, if any
         labels = labels.intersection(host.get_labels())
 
-        # Get fixing commits
+        # Get the issues with any of the labels, each one once, and resolve those not resolved yet by this miner
+        issues = host.get_closed_labeled_issues(labels)
+
+        desired = None
+        if pipelined:
+            desired = self.pipeline_closing_commits(host, issues, workers, queue_size)
+        else:
+            unresolved = [issue for issue in issues if host.get_issue_number(issue) not in self.closing_commits]
+            for issue, commit in zip(unresolved, host.get_commits_closing_issues(unresolved, workers=workers)):
+                self.closing_commits[host.get_issue_number(issue)] = commit
+
+        # Get fixing commits, dropping those that can never be labeled
         commits = []
-        for label in labels:
-            for issue in host.get_closed_issues(label):
-                commit = host.get_commit_closing_issue(issue)
-                if (commit in self.exclude_commits) or (commit in self.fixing_commits):
-                    continue
-                elif commit:
-                    commits.append(commit)
+        for issue in issues:
+            commit = self.closing_commits[host.get_issue_number(issue)]
+            if (commit in self.exclude_commits) or (commit in self.fixing_commits):
+                continue
+            elif commit:
+                commits.append(commit)
+
+        if desired is None:
+            commits = self.filter_closing_commits(commits)
 
         if commits:
             # Discard commits that do not touch IaC files
-            self.discard_undesired_fixing_commits(commits)
+            if desired is None:
+                self.discard_undesired_fixing_commits(commits)
+            else:
+                commits[:] = [commit for commit in commits if commit in desired]
+                self.sort_commits(commits)
 
             # Update the list of fixing commits
             self.fixing_commits.extend(commits)
@@ -254,6 +443,108 @@ class BaseMiner:
 
         return commits
 
+    def pipeline_closing_commits(self, host: SVCHost, issues: List, workers: int = RESOLUTION_WORKERS,
+                                 queue_size: int = PIPELINE_QUEUE_SIZE) -> Set[str]:
+        """
+        Resolve the commits closing the issues, and check them against the local clone as they arrive.
+
+        A producer thread resolves the issues not resolved yet by this miner (see ``SVCHost.iter_commits_closing_issues``)
+        and puts their closing commits in a bounded queue. Meanwhile, the calling thread takes the commits in batches,
+        i.e., as many as available, and drops those not on the branch or outside the mining window (see
+        ``filter_closing_commits``). The latency of the API thus overlaps with the local checks, and the producer never
+        runs more than ``queue_size`` commits ahead of them.
+
+        The remaining commits are discarded if undesired (see ``discard_undesired_fixing_commits``) once the producer
+        finishes, in a single traversal of the local history: the ranges of successive batches would overlap.
+
+        Parameters
+        ----------
+        host : SVCHost
+            The host of the issues.
+
+        issues : List
+            The issues.
+
+        workers : int
+            Number of issues whose closing commit is resolved concurrently.
+
+        queue_size : int
+            Maximum number of closing commits waiting to be checked.
+
+        Returns
+        -------
+        Set[str]
+            The closing commits that are not undesired, among those not excluded nor already fixing.
+
+        """
+        resolved = queue.Queue(maxsize=queue_size)
+        stop = threading.Event()
+        failures = list()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    resolved.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                unresolved = [issue for issue in issues if host.get_issue_number(issue) not in self.closing_commits]
+                for issue, commit in host.iter_commits_closing_issues(unresolved, workers=workers):
+                    if not put((host.get_issue_number(issue), commit)):
+                        return
+            except Exception as e:
+                failures.append(e)
+            finally:
+                put(None)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+
+        # Issues resolved by previous calls are checked in the first batch
+        pending = [self.closing_commits.get(host.get_issue_number(issue)) for issue in issues]
+        seen = self.exclude_commits.union(self.fixing_commits)
+        desired = list()
+
+        try:
+            done = False
+            while not done:
+                batch = [resolved.get()]
+                while len(batch) < queue_size:
+                    try:
+                        batch.append(resolved.get_nowait())
+                    except queue.Empty:
+                        break
+
+                for item in batch:
+                    if item is None:
+                        done = True
+                    else:
+                        self.closing_commits[item[0]] = item[1]
+                        pending.append(item[1])
+
+                candidates = [commit for commit in dict.fromkeys(pending) if commit and commit not in seen]
+                seen.update(candidates)
+                pending = list()
+
+                desired.extend(self.filter_closing_commits(candidates))
+
+            producer.join()
+        finally:
+            # Unblock the producer if the local checks failed
+            stop.set()
+
+        if failures:
+            raise failures[0]
+
+        if desired:
+            self.discard_undesired_fixing_commits(desired)
+
+        return set(desired)
+
     def get_fixing_commits_from_commit_messages(self, regex: str = None) -> List[str]:
         """
         Return a list of bug-fixing commit hash.
@@ -286,7 +577,10 @@ class BaseMiner:
 
         commits = list()
 
-        for commit in RepositoryMining(self.path_to_repo, only_in_branch=self.branch).traverse_commits():
+        for commit in PathFilteredRepositoryMining(self.path_to_repo,
+                                                   pathspecs=self.get_pathspecs(),
+                                                   only_in_branch=self.branch,
+                                                   **self.window()).traverse_commits():
 
             if (commit.hash in self.exclude_commits) or (commit.hash in self.fixing_commits):
                 continue
@@ -335,21 +629,26 @@ class BaseMiner:
 
         """
 
-        if not self.fixing_commits:
-            return list()
+        self.fixed_files = list()
 
+        # sorting drops the fixing-commits outside the mining window
         self.sort_commits(self.fixing_commits)
 
-        self.fixed_files = list()
+        if not self.fixing_commits:
+            return list()
+
         renamed_files = dict()
-        git_repo = GitRepository(self.path_to_repo)
+        # Do not blame beyond the mining window, if any
+        git_repo = BoundedGitRepository(self.path_to_repo,
+                                        lower_bound=self.commit_hashes[0] if self.since and self.commit_hashes else None)
 
         # Traverse commits from the latest to the first fixing-commit
-        for commit in RepositoryMining(self.path_to_repo,
-                                       from_commit=self.fixing_commits[-1],  # Last fixing-commit by date
-                                       to_commit=self.fixing_commits[0],  # First fixing-commit by date
-                                       order='reverse',
-                                       only_in_branch=self.branch).traverse_commits():
+        for commit in PathFilteredRepositoryMining(self.path_to_repo,
+                                                   pathspecs=self.get_pathspecs(),
+                                                   from_commit=self.fixing_commits[-1],  # Last fixing-commit by date
+                                                   to_commit=self.fixing_commits[0],  # First fixing-commit by date
+                                                   order='reverse',
+                                                   only_in_branch=self.branch).traverse_commits():
 
             for modified_file in commit.modifications:
 
@@ -372,7 +671,7 @@ class BaseMiner:
                     continue
 
                 # Not interested in type of files
-                if self.ignore_file(modified_file.new_path, modified_file.source_code):
+                if self.ignore_modified_file(modified_file):
                     continue
 
                 if any(file.filepath == modified_file.new_path and file.fic == commit.hash for file in
@@ -387,7 +686,10 @@ class BaseMiner:
                 else:
                     bug_inducing_commits = list(bug_inducing_commits[modified_file.new_path])
                     self.sort_commits(bug_inducing_commits)
-                    bic = bug_inducing_commits[0]  # bic is the oldest bug-inducing-commit
+
+                    # bic is the oldest bug-inducing-commit. Bugs older than the mining window are assigned to its
+                    # first commit
+                    bic = bug_inducing_commits[0] if bug_inducing_commits else self.commit_hashes[0]
 
                 current_fix = FixedFile(filepath=renamed_files.get(modified_file.new_path, modified_file.new_path),
                                         bic=bic,
@@ -409,6 +711,22 @@ class BaseMiner:
 
         return self.fixed_files.copy()
 
+    def get_pathspecs(self) -> List[str]:
+        """
+        Return the git pathspecs of the files of interest.
+
+        Pathspecs are pushed down to git in every traversal of the miner, so that commits and files that cannot
+        match are never diffed. Therefore, they must match (at least) every file that ``ignore_file`` keeps.
+        For example, ``AnsibleMiner`` returns ``*tasks/*.yml``, ``*roles/*.yml``, etc.
+
+        Returns
+        -------
+        List[str]
+            The list of pathspecs. An empty list (default) means no restriction.
+
+        """
+        return list()
+
     def ignore_file(self, path_to_file: str, content: str = None) -> bool:
         """
         Ignore a file.
@@ -435,6 +753,27 @@ class BaseMiner:
         """
         return False
 
+    def ignore_modified_file(self, modified_file: Modification) -> bool:
+        """
+        Ignore a file modified in a commit.
+
+        By default, it calls ``ignore_file`` with the path and content of the file after the commit.
+        Subclasses can override it to decide without loading the whole content. For example, ``ToscaMiner`` reads
+        only the head of the YAML files.
+
+        Parameters
+        ----------
+        modified_file: Modification
+            The modified file.
+
+        Returns
+        -------
+        bool
+            True if the file must be ignore. False, otherwise.
+
+        """
+        return self.ignore_file(modified_file.new_path, modified_file.source_code)
+
     def label(self) -> Generator[FailureProneFile, None, None]:
         """
         For each FixedFile object, yield a FailureProneFile object for each commit between the FixedFile's
@@ -456,10 +795,14 @@ class BaseMiner:
         for file in self.fixed_files:
             labeling.setdefault(file.filepath, list()).append(file)
 
-        for commit in RepositoryMining(self.path_to_repo,
-                                       from_commit=self.fixing_commits[-1],
-                                       to_commit=self.commit_hashes[0],
-                                       order='reverse').traverse_commits():
+        # Traverse commits from the last fixing-commit back to the first commit of the mining window.
+        # Every commit is labeled, but only files matching the pathspecs are diffed to handle renaming
+        for commit in PathFilteredRepositoryMining(self.path_to_repo,
+                                                   pathspecs=self.get_pathspecs(),
+                                                   only_matching_commits=False,
+                                                   from_commit=self.fixing_commits[-1],
+                                                   to_commit=self.commit_hashes[0],
+                                                   order='reverse').traverse_commits():
 
             for files in labeling.values():
                 for file in files:
@@ -502,7 +845,8 @@ class BaseMiner:
             List of commits hash to sort.
 
         """
-        sorted_commits = [sha for sha in self.commit_hashes if sha in commits]
+        commits_set = set(commits)
+        sorted_commits = [sha for sha in self.commit_hashes if sha in commits_set]
         commits.clear()
         commits.extend(sorted_commits)
 
@@ -513,7 +857,7 @@ class FixingCommitClassifier(metaclass=ABCMeta):
     http://chrisparnin.me/pdf/GangOfEight.pdf.
     """
 
-    def __init__(self, commit: Commit):
+    def __init__(self, commit: Commit, nlp_backend: str = None):
         """
         The class constructor.
 
@@ -522,27 +866,164 @@ class FixingCommitClassifier(metaclass=ABCMeta):
         commit: Commit
             The commit to analyze.
 
+        nlp_backend: str
+            The NLP backend splitting and parsing the commit message: ``'spacy'`` (i.e., spaCy's dependency parser),
+            or ``'heuristic'`` (i.e., approximate rules, much faster). Default None (i.e., the ``NLP_BACKEND``
+            environment variable, or ``'spacy'``). See ``utils.get_nlp_backend``.
+
         Raises
         ------
         TypeError
             If commit is None
 
+        ValueError
+            If the NLP backend is not available
+
         """
 
         if commit is None:
             raise TypeError('Expected a pydriller.domain.commit.Commit object, not None.')
 
         self.commit = commit
-        self.sentences = []  # will be list of tokens list
+        self.nlp_backend = utils.get_nlp_backend(nlp_backend)
+        self.dependents = dict()  # head dependents of the sentences, by sentence (see get_head_dependents)
+
+        # list of tokens list. Only alphabetic tokens are kept
+        self.sentences = self.nlp_backend.split_sentences(commit.msg)
+
+    @classmethod
+    def classify_commits(cls, commits: Iterable[Commit], batch_size: int = utils.NLP_BATCH_SIZE,
+                         n_process: int = 1, nlp_backend: str = None) -> List[Dict[str, bool]]:
+        """
+        Classify many commits in batch.
+
+        The sentences of all the commits are parsed at once (e.g., with spaCy's ``nlp.pipe``), each distinct sentence
+        once, rather than one parse per sentence and category.
+
+        Parameters
+        ----------
+        commits : Iterable[Commit]
+            The commits to classify.
+
+        batch_size : int
+            Number of sentences parsed together. Default 256.
+
+        n_process : int
+            Number of processes parsing batches in parallel. Default 1.
+
+        nlp_backend : str
+            The NLP backend (see ``__init__``). Default None.
+
+        Returns
+        -------
+        List[Dict[str, bool]]
+            For each commit, in the same order, whether it fixes each of the ``DEFECT_CATEGORIES``.
+
+        """
+        classifiers = [cls(commit, nlp_backend) for commit in commits]
+
+        # Only sentences matching a defect pattern are ever parsed (see classify)
+        sentences = list(dict.fromkeys(sentence for classifier in classifiers for sentence in classifier.defect_sentences()))
+        dependents = dict(zip(sentences, utils.pipe_head_dependents(sentences, batch_size=batch_size,
+                                                                    n_process=n_process, backend=nlp_backend)))
+
+        results = []
+        for classifier in classifiers:
+            classifier.dependents = dependents
+            results.append(classifier.classify())
+
+        return results
+
+    def defect_sentences(self) -> List[str]:
+        """
+        Return the sentences of the commit message that match a defect pattern (see ``rules.has_defect_pattern``).
+
+        Returns
+        -------
+        List[str]
+            The sentences, i.e., their tokens joined by spaces.
+
+        """
+        sentences = (' '.join(tokens) for tokens in self.sentences)
+        return [sentence for sentence in sentences if rules.has_defect_pattern(sentence)]
+
+    def classify(self) -> Dict[str, bool]:
+        """
+        Classify the commit in all the defect categories at once.
 
-        for sentence in nltk.sent_tokenize(commit.msg):
-            # split into words
-            tokens = nltk.tokenize.word_tokenize(sentence)
+        This is equivalent to calling every ``fixes_<category>`` method, but the sentences are filtered by the defect
+        pattern before any parse, each sentence is parsed at most once, and only as long as some category is
+        undecided. The checks on the diff (e.g., ``data_changed``) are evaluated at most once, and only if the
+        message alone does not decide their category.
+
+        Returns
+        -------
+        Dict[str, bool]
+            Whether the commit fixes each of the ``DEFECT_CATEGORIES``.
 
-            # remove all tokens that are not alphabetic
-            tokens = [word.strip() for word in tokens if word.isalpha()]
+        """
+        result = dict.fromkeys(DEFECT_CATEGORIES, False)
+
+        sentences = self.defect_sentences()
+        if not sentences:
+            return result
+
+        # Patterns of the parsed sentence deciding each category (see rules.PATTERNS)
+        category_patterns = {
+            'conditional': {'conditional'},
+            'configuration_data': {'storage_configuration', 'file_configuration', 'network_configuration',
+                                   'user_configuration', 'cache_configuration'},
+            'dependency': {'dependency'},
+            'documentation': {'documentation'},
+            'idempotency': {'idempotency'},
+            'security': {'security'},
+            'service': {'service'},
+            'syntax': {'syntax'}
+        }
+
+        for sentence in sentences:
+            undecided = [category for category in DEFECT_CATEGORIES if not result[category]]
+            if not undecided:
+                return result
+
+            patterns = rules.match_patterns(' '.join(self.get_head_dependents(sentence)))
+            for category in undecided:
+                result[category] = not patterns.isdisjoint(category_patterns[category])
+
+        # Any sentence matching a defect pattern is enough when the diff decides
+        diff_checks = {
+            'configuration_data': self.data_changed,
+            'dependency': self.include_changed,
+            'documentation': self.comment_changed,
+            'service': self.service_changed
+        }
+
+        for category, check in diff_checks.items():
+            if not result[category]:
+                result[category] = check()
+
+        return result
+
+    def get_head_dependents(self, sentence: str) -> List[str]:
+        """
+        Return the head dependents of a sentence of the commit message, as computed by the NLP backend.
+        Sentences are parsed at most once per classifier, or not at all if already parsed in batch.
+
+        Parameters
+        ----------
+        sentence : str
+            A sentence of the commit message, i.e., its tokens joined by spaces.
+
+        Returns
+        -------
+        List[str]
+            The head dependents.
+
+        """
+        if sentence not in self.dependents:
+            self.dependents[sentence] = self.nlp_backend.get_head_dependents(sentence)
 
-            self.sentences.append(tokens)
+        return self.dependents[sentence]
 
     def comment_changed(self) -> bool:
         """
@@ -589,7 +1070,7 @@ class FixingCommitClassifier(metaclass=ABCMeta):
         """
         for sentence in self.sentences:
             sentence = ' '.join(sentence)
-            sentence_dep = ' '.join(utils.get_head_dependents(sentence))
+            sentence_dep = ' '.join(self.get_head_dependents(sentence))
             if rules.has_defect_pattern(sentence) and rules.has_conditional_pattern(sentence_dep):
                 return True
 
@@ -610,7 +1091,7 @@ class FixingCommitClassifier(metaclass=ABCMeta):
 
         for sentence in self.sentences:
             sentence = ' '.join(sentence)
-            sentence_dep = ' '.join(utils.get_head_dependents(sentence))
+            sentence_dep = ' '.join(self.get_head_dependents(sentence))
 
             if rules.has_defect_pattern(sentence) and \
                     (rules.has_storage_configuration_pattern(sentence_dep)
@@ -638,7 +1119,7 @@ class FixingCommitClassifier(metaclass=ABCMeta):
 
         for sentence in self.sentences:
             sentence = ' '.join(sentence)
-            sentence_dep = ' '.join(utils.get_head_dependents(sentence))
+            sentence_dep = ' '.join(self.get_head_dependents(sentence))
             if rules.has_defect_pattern(sentence) and (rules.has_dependency_pattern(sentence_dep) or is_include_changed):
                 return True
 
@@ -659,7 +1140,7 @@ class FixingCommitClassifier(metaclass=ABCMeta):
 
         for sentence in self.sentences:
             sentence = ' '.join(sentence)
-            sentence_dep = ' '.join(utils.get_head_dependents(sentence))
+            sentence_dep = ' '.join(self.get_head_dependents(sentence))
             if rules.has_defect_pattern(sentence) and (rules.has_documentation_pattern(sentence_dep) or is_comment_changed):
                 return True
 
@@ -678,7 +1159,7 @@ class FixingCommitClassifier(metaclass=ABCMeta):
 
         for sentence in self.sentences:
             sentence = ' '.join(sentence)
-            sentence_dep = ' '.join(utils.get_head_dependents(sentence))
+            sentence_dep = ' '.join(self.get_head_dependents(sentence))
             if rules.has_defect_pattern(sentence) and rules.has_idempotency_pattern(sentence_dep):
                 return True
 
@@ -697,7 +1178,7 @@ class FixingCommitClassifier(metaclass=ABCMeta):
 
         for sentence in self.sentences:
             sentence = ' '.join(sentence)
-            sentence_dep = ' '.join(utils.get_head_dependents(sentence))
+            sentence_dep = ' '.join(self.get_head_dependents(sentence))
             if rules.has_defect_pattern(sentence) and rules.has_security_pattern(sentence_dep):
                 return True
 
@@ -718,7 +1199,7 @@ class FixingCommitClassifier(metaclass=ABCMeta):
 
         for sentence in self.sentences:
             sentence = ' '.join(sentence)
-            sentence_dep = ' '.join(utils.get_head_dependents(sentence))
+            sentence_dep = ' '.join(self.get_head_dependents(sentence))
             if rules.has_defect_pattern(sentence) and (rules.has_service_pattern(sentence_dep) or is_service_changed):
                 return True
 
@@ -737,7 +1218,7 @@ class FixingCommitClassifier(metaclass=ABCMeta):
 
         for sentence in self.sentences:
             sentence = ' '.join(sentence)
-            sentence_dep = ' '.join(utils.get_head_dependents(sentence))
+            sentence_dep = ' '.join(self.get_head_dependents(sentence))
             if rules.has_defect_pattern(sentence) and rules.has_syntax_pattern(sentence_dep):
                 return True
 
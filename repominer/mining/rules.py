@@ -1,63 +1,109 @@
+import re
+
+from functools import lru_cache
+from typing import Dict, FrozenSet, Pattern, Tuple
+
+# Keywords of each pattern. A text has a pattern if, once lowercased, it contains at least one of its keywords
+PATTERNS = {
+    'defect': ('error', 'bug', 'fix', 'issu', 'mistake', 'incorrect', 'fault', 'defect', 'flaw'),
+    'conditional': ('logic', 'condit', 'boolean'),
+    'storage_configuration': ('sql', 'db', 'databas'),
+    'file_configuration': ('file', 'permiss'),
+    'network_configuration': ('network', 'ip', 'address', 'port', 'tcp', 'dhcp'),
+    'user_configuration': ('user', 'usernam', 'password'),
+    'cache_configuration': ('cach',),
+    'dependency': ('requir', 'depend', 'relat', 'order', 'sync', 'compat', 'ensur', 'inherit'),
+    'documentation': ('doc', 'comment', 'spec', 'licens', 'copyright', 'notic', 'header', 'readm'),
+    'idempotency': ('idempot',),
+    'security': ('vul', 'ssl', 'secr', 'authent', 'password', 'secur', 'cve'),
+    'service': ('servic', 'server'),
+    'syntax': ('compil', 'lint', 'warn', 'typo', 'spell', 'indent', 'regex', 'variabl', 'whitespac')
+}  # type: Dict[str, Tuple[str, ...]]
+
+
+def _compile(patterns: Dict[str, Tuple[str, ...]]) -> Tuple[Pattern, Dict[str, FrozenSet[str]]]:
+    """
+    Compile the keywords of all the patterns into a single regular expression.
+
+    The expression looks ahead at every position of the text for the longest keyword starting there, so that
+    keywords overlapping each other are all found. Each keyword is then mapped to the patterns of all the keywords
+    it starts with, which match at the same position.
+    """
+    keywords = sorted({keyword for words in patterns.values() for keyword in words}, key=lambda k: (-len(k), k))
+
+    matches = dict()
+    for keyword in keywords:
+        matches[keyword] = frozenset(name for name, words in patterns.items()
+                                     if any(keyword.startswith(word) for word in words))
+
+    regex = re.compile('(?=({}))'.format('|'.join(re.escape(keyword) for keyword in keywords)))
+    return regex, matches
+
+
+_PATTERNS_REGEX, _KEYWORD_PATTERNS = _compile(PATTERNS)
+
+
+@lru_cache(maxsize=65536)
+def match_patterns(text: str) -> FrozenSet[str]:
+    """
+    Return the names of all the patterns a text has (see PATTERNS), scanning the text once
+    :param text: a text (e.g., a sentence of a commit message)
+    :return: the names of the patterns (e.g., {'defect', 'syntax'})
+    """
+    found = frozenset()
+    for match in _PATTERNS_REGEX.finditer(text.lower()):
+        found = found.union(_KEYWORD_PATTERNS[match.group(1)])
+
+    return found
+
+
 def has_defect_pattern(text: str) -> bool:
-    string_pattern = ['error', 'bug', 'fix', 'issu', 'mistake', 'incorrect', 'fault', 'defect', 'flaw']
-    return any(word in text.lower() for word in string_pattern)
+    return 'defect' in match_patterns(text)
 
 
 def has_conditional_pattern(text: str) -> bool:
-    string_pattern = ['logic', 'condit', 'boolean']
-    return any(word in text.lower() for word in string_pattern)
+    return 'conditional' in match_patterns(text)
 
 
 def has_storage_configuration_pattern(text: str) -> bool:
-    string_pattern = ['sql', 'db', 'databas']
-    return any(word in text.lower() for word in string_pattern)
+    return 'storage_configuration' in match_patterns(text)
 
 
 def has_file_configuration_pattern(text: str) -> bool:
-    string_pattern = ['file', 'permiss']
-    return any(word in text.lower() for word in string_pattern)
+    return 'file_configuration' in match_patterns(text)
 
 
 def has_network_configuration_pattern(text: str) -> bool:
-    string_pattern = ['network', 'ip', 'address', 'port', 'tcp', 'dhcp']
-    return any(word in text.lower() for word in string_pattern)
+    return 'network_configuration' in match_patterns(text)
 
 
 def has_user_configuration_pattern(text: str) -> bool:
-    string_pattern = ['user', 'usernam', 'password']
-    return any(word in text.lower() for word in string_pattern)
+    return 'user_configuration' in match_patterns(text)
 
 
 def has_cache_configuration_pattern(text: str) -> bool:
-    return 'cach' in text.lower()
+    return 'cache_configuration' in match_patterns(text)
 
 
 def has_dependency_pattern(text: str) -> bool:
-    string_pattern = ['requir', 'depend', 'relat', 'order', 'sync', 'compat', 'ensur', 'inherit']
-    return any(word in text.lower() for word in string_pattern)
+    return 'dependency' in match_patterns(text)
 
 
 def has_documentation_pattern(text: str) -> bool:
-    string_pattern = ['doc', 'comment', 'spec', 'licens', 'copyright', 'notic', 'header', 'readm']
-    return any(word in text.lower() for word in string_pattern)
+    return 'documentation' in match_patterns(text)
 
 
 def has_idempotency_pattern(text: str) -> bool:
-    return 'idempot' in text.lower()
+    return 'idempotency' in match_patterns(text)
 
 
 def has_security_pattern(text: str) -> bool:
-    string_pattern = ['vul', 'ssl', 'secr', 'authent', 'password', 'secur', 'cve']
-    return any(word in text.lower() for word in string_pattern)
+    return 'security' in match_patterns(text)
 
 
 def has_service_pattern(text: str) -> bool:
-    string_pattern = ['servic', 'server']
-    return any(word in text.lower() for word in string_pattern)
+    return 'service' in match_patterns(text)
 
 
 def has_syntax_pattern(text: str) -> bool:
-    string_pattern = ['compil', 'lint', 'warn', 'typo', 'spell', 'indent', 'regex', 'variabl', 'whitespac']
-    return any(word in text.lower() for word in string_pattern)
-
-
+    return 'syntax' in match_patterns(text)
@@ -1,10 +1,10 @@
-from pydriller.repository_mining import RepositoryMining
-from pydriller.domain.commit import ModificationType
+from pydriller.domain.commit import Modification, ModificationType
 
 from typing import List
 
 from repominer import filters
 from repominer.mining.base import BaseMiner
+from repominer.mining.traversal import LazyModification, PathFilteredRepositoryMining
 
 
 class ToscaMiner(BaseMiner):
@@ -26,15 +26,62 @@ class ToscaMiner(BaseMiner):
         # get a sorted list of commits in ascending order of date
         self.sort_commits(commits)
 
-        for commit in RepositoryMining(self.path_to_repo,
-                                       from_commit=commits[0],  # first commit in commits
-                                       to_commit=commits[-1],  # last commit in commits
-                                       only_in_branch=self.branch).traverse_commits():
+        # sorting drops commits outside the mining window
+        if not commits:
+            return
 
-            # if none of the modified files is a TOSCA file, then discard the commit
-            if not any(modified_file.change_type == ModificationType.MODIFY and filters.is_tosca_file(modified_file.new_path, modified_file.source_code) for modified_file in commit.modifications):
-                if commit.hash in commits:
-                    commits.remove(commit.hash)
+        # commits that do not touch any file matching the pathspecs are not traversed, so keep only the commits
+        # where a TOSCA file has been modified
+        desired = set()
+
+        # from the first to the last commit in commits (pydriller does not accept a range of a single commit)
+        if len(commits) == 1:
+            bounds = dict(single=commits[0])
+        else:
+            bounds = dict(from_commit=commits[0], to_commit=commits[-1])
+
+        for commit in PathFilteredRepositoryMining(self.path_to_repo,
+                                                   pathspecs=self.get_pathspecs(),
+                                                   only_in_branch=self.branch,
+                                                   **bounds).traverse_commits():
+
+            # if at least one of the modified files is a TOSCA file, then keep the commit
+            if any(modified_file.change_type == ModificationType.MODIFY and not self.ignore_modified_file(modified_file) for modified_file in commit.modifications):
+                desired.add(commit.hash)
+
+        commits[:] = [commit for commit in commits if commit in desired]
+
+    def get_pathspecs(self) -> List[str]:
+        """
+        Return the git pathspecs of TOSCA files.
+
+        Returns
+        -------
+        List[str]
+            The list of pathspecs.
+
+        """
+        return filters.tosca_pathspecs()
+
+    def ignore_modified_file(self, modified_file: Modification):
+        """
+        Ignore non-TOSCA files, reading only the head of the YAML files.
+
+        Parameters
+        ----------
+        modified_file: Modification
+            The modified file.
+
+        Returns
+        -------
+        bool
+            True if the file is not a TOSCA file, and must be ignored. False, otherwise.
+
+        """
+        if not isinstance(modified_file, LazyModification):
+            return super().ignore_modified_file(modified_file)
+
+        return not filters.sniff_tosca_file(modified_file.new_path, modified_file.blob_id, modified_file.read)
 
     def ignore_file(self, path_to_file: str, content: str = None):
         """
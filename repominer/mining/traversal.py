@@ -0,0 +1,236 @@
+from typing import Generator, List, Union
+
+from git import Blob, Diff, NULL_TREE
+from pydriller.domain.commit import Commit, Modification
+from pydriller.git_repository import GitRepository
+from pydriller.repository_mining import RepositoryMining
+from pydriller.utils.conf import Conf
+
+# Marks source code that has not been read yet
+_UNREAD = object()
+
+
+class BoundedGitRepository(GitRepository):
+    """
+    This class extends pydriller's GitRepository to stop ``git blame`` at a lower-bound commit.
+
+    Lines older than the lower bound are blamed to the lower bound itself, so that blaming a file does not walk
+    the history that precedes the mining window. When the blamed commit is the lower bound, no line can be blamed
+    inside the window: every line is blamed to its parent, i.e., before the window.
+    """
+
+    def __init__(self, path: str, lower_bound: str = None):
+        """
+        The class constructor.
+
+        Parameters
+        ----------
+        path : str
+            The path to the repository.
+
+        lower_bound : str
+            Hash of the oldest commit blame is allowed to reach. If None, blame walks the whole history.
+
+        """
+        super().__init__(path)
+        self.lower_bound = lower_bound
+
+    def _get_blame(self, commit_hash: str, path: str, hashes_to_ignore_path: str = None):
+        if not self.lower_bound:
+            return super()._get_blame(commit_hash, path, hashes_to_ignore_path)
+
+        args = ['-w', f'{self.lower_bound}..{commit_hash}^']
+        if hashes_to_ignore_path is not None and self.repo.git.version_info >= (2, 23):
+            args += ['--ignore-revs-file', hashes_to_ignore_path]
+
+        return self.repo.git.blame(*args, '--', path).split('\n')
+
+
+def read_blob(blob: Blob, size: int = -1) -> Union[str, None]:
+    """
+    Read the content of a blob.
+
+    Parameters
+    ----------
+    blob : git.Blob
+        The blob to read.
+
+    size : int
+        The number of bytes to read. Default -1 (i.e., the whole blob).
+
+    Returns
+    -------
+    str
+        The decoded content, or None if the blob does not exist (e.g., the file was deleted) or cannot be read.
+
+    """
+    if blob is None:
+        return None
+
+    try:
+        return blob.data_stream.read(size).decode('utf-8', 'ignore')
+    except (UnicodeDecodeError, AttributeError, ValueError):
+        return None
+
+
+class LazyModification(Modification):
+    """
+    This class extends pydriller's Modification to read the source code of the file only when accessed.
+
+    pydriller reads the source code of every modified file before and after the commit, although most of them are
+    discarded by the miners' filters. This class also exposes the id of the blob after the commit and the ability
+    to read only its first bytes, to identify the file type without loading it.
+    """
+
+    def __init__(self, old_path: str, new_path: str, change_type, diff: Diff, decoded_diff: str):
+        super().__init__(old_path, new_path, change_type, {'diff': decoded_diff,
+                                                           'source_code': None,
+                                                           'source_code_before': None})
+        self._a_blob = diff.a_blob
+        self._b_blob = diff.b_blob
+        self._source_code = self._source_code_before = _UNREAD
+
+    @property
+    def blob_id(self) -> Union[str, None]:
+        """ The id of the blob after the commit, if any. """
+        return self._b_blob.hexsha if self._b_blob is not None else None
+
+    def read(self, size: int = -1) -> Union[str, None]:
+        """
+        Read the first ``size`` bytes of the file after the commit.
+
+        Parameters
+        ----------
+        size : int
+            The number of bytes to read. Default -1 (i.e., the whole file).
+
+        Returns
+        -------
+        str
+            The decoded content, or None if the file does not exist after the commit.
+
+        """
+        if self._source_code is not _UNREAD:
+            return self._source_code if size < 0 or self._source_code is None else self._source_code[:size]
+
+        return read_blob(self._b_blob, size)
+
+    @property
+    def source_code(self) -> Union[str, None]:
+        if self._source_code is _UNREAD:
+            self._source_code = read_blob(self._b_blob)
+        return self._source_code
+
+    @source_code.setter
+    def source_code(self, value):
+        self._source_code = value
+
+    @property
+    def source_code_before(self) -> Union[str, None]:
+        if self._source_code_before is _UNREAD:
+            self._source_code_before = read_blob(self._a_blob)
+        return self._source_code_before
+
+    @source_code_before.setter
+    def source_code_before(self, value):
+        self._source_code_before = value
+
+
+class PathFilteredCommit(Commit):
+    """
+    This class extends pydriller's Commit to diff only the files matching the traversal's pathspecs.
+    Source code of the modified files is read lazily (see ``LazyModification``).
+    """
+
+    def _get_modifications(self):
+        pathspecs = self._conf.get('pathspecs')
+
+        options = {}
+        if self._conf.get('histogram'):
+            options['histogram'] = True
+
+        if self._conf.get('skip_whitespaces'):
+            options['w'] = True
+
+        if len(self.parents) == 1:
+            diff_index = self._c_object.parents[0].diff(self._c_object, pathspecs, create_patch=True, **options)
+        elif len(self.parents) > 1:
+            # As in pydriller, modifications of merge commits are not analyzed
+            diff_index = []
+        else:
+            diff_index = self._c_object.diff(NULL_TREE, pathspecs, create_patch=True, **options)
+
+        return self._parse_diff(diff_index)
+
+    def _parse_diff(self, diff_index) -> List[Modification]:
+        return [LazyModification(diff.a_path, diff.b_path, self._from_change_to_modification_type(diff), diff,
+                                 self._get_decoded_str(diff.diff))
+                for diff in diff_index]
+
+
+class PathFilteredRepositoryMining(RepositoryMining):
+    """
+    This class extends pydriller's RepositoryMining to push path filters down to git.
+
+    Pathspecs are passed to ``git rev-list``, so that commits that do not touch any matching file are never
+    loaded, and to ``git diff``, so that non-matching files are never diffed.
+    """
+
+    def __init__(self, path_to_repo: str, pathspecs: Union[List[str], None] = None, only_matching_commits: bool = True,
+                 **kwargs):
+        """
+        The class constructor.
+
+        Parameters
+        ----------
+        path_to_repo : str
+            The path to the repository.
+
+        pathspecs : List[str]
+            Git pathspecs (e.g., ``*tasks/*.yml``, ``:(exclude)*test*``). If empty, all the commits and files are
+            traversed, as in pydriller.
+
+        only_matching_commits : bool
+            Whether to skip commits that do not modify any matching file. When False, all the commits are traversed
+            but only matching files are diffed. Default True.
+
+        kwargs
+            Any other RepositoryMining filter (e.g., ``from_commit``, ``only_in_branch``, ``order``). Unlike pydriller,
+            ``to`` can be combined with ``to_commit`` (e.g., to stop at a date on a branch other than HEAD).
+
+        """
+        # pydriller rejects an upper date along with an upper commit, although git accepts both: pass it to git
+        to = kwargs.pop('to', None) if kwargs.get('to_commit') else None
+
+        super().__init__(path_to_repo, **kwargs)
+        self._conf.set_value('pathspecs', pathspecs)
+        self._conf.set_value('only_matching_commits', only_matching_commits)
+        self._to = Conf._replace_timezone(to) if to else None
+
+    def traverse_commits(self) -> Generator[Commit, None, None]:
+        pathspecs = self._conf.get('pathspecs')
+
+        for path_repo in self._conf.get('path_to_repos'):
+            with self._prep_repo(path_repo=path_repo) as git_repo:
+
+                # As in pydriller
+                if self._conf.get('filepath') is not None:
+                    self._conf.set_value('filepath_commits', git_repo.get_commits_modified_file(self._conf.get('filepath')))
+
+                if self._conf.get('only_releases'):
+                    self._conf.set_value('tagged_commits', git_repo.get_tagged_commits())
+
+                rev, kwargs = self._conf.build_args()
+                kwargs.setdefault('reverse', True)
+                if self._to is not None:
+                    kwargs['until'] = self._to
+
+                # --full-history prevents git from pruning commits whose changes are also reachable through a merge
+                paths = pathspecs if pathspecs and self._conf.get('only_matching_commits') else ''
+                for commit in git_repo.repo.iter_commits(rev=rev, paths=paths, full_history=bool(paths), **kwargs):
+                    commit = PathFilteredCommit(commit, self._conf)
+
+                    if self._conf.is_commit_filtered(commit):
+                        continue
+
+                    yield commit
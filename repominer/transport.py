@@ -0,0 +1,791 @@
+import base64
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from collections import defaultdict, deque
+from typing import Dict, List, Tuple, Union
+
+import github
+import requests
+
+from gitlab import Gitlab
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.models import PreparedRequest, Response
+from requests.structures import CaseInsensitiveDict
+
+# Seconds a cached response is served without revalidation
+DEFAULT_CACHE_TTL = 3600
+
+# Remaining requests below which requests are spread evenly until the rate limit resets
+DEFAULT_RATE_LIMIT_RESERVE = 100
+
+# Connections kept alive per host by the shared adapters
+DEFAULT_POOL_SIZE = 16
+
+# Times a request failing for a transient reason is sent again, and the fraction of requests that may be retries
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_RETRY_BUDGET = 0.2
+
+# Seconds of the first backoff, doubled at every retry up to the maximum
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 60.0
+
+# Status codes of transient server errors
+TRANSIENT_STATUS_CODES = (500, 502, 503, 504)
+
+# Headers describing the wire encoding of a body, which do not apply to the decoded body stored in the cache
+_WIRE_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+# Seconds each thread has spent waiting for the quota or before retries (see pause)
+_paused = threading.local()
+
+
+def pause(seconds: float) -> None:
+    """
+    Sleep, and account the time to the current thread, so that it is not recorded as the latency of a request
+    (see CassetteAdapter)
+    :param seconds: the seconds to sleep
+    """
+    time.sleep(seconds)
+    _paused.seconds = paused() + seconds
+
+
+def paused() -> float:
+    """
+    Return the seconds the current thread has spent in pause
+    """
+    return getattr(_paused, 'seconds', 0.0)
+
+
+def dump_response(response: Response) -> dict:
+    """
+    Serialize a response to a JSON-compatible dictionary
+    :param response: the response
+    :return: a dictionary with the status, reason, headers, content (base64-encoded), and encoding of the response
+    """
+    return {
+        'status': response.status_code,
+        'reason': response.reason,
+        'headers': {k.lower(): v for k, v in response.headers.items() if k.lower() not in _WIRE_HEADERS},
+        'content': base64.b64encode(response.content).decode('ascii'),
+        'encoding': response.encoding
+    }
+
+
+def build_response(adapter: BaseAdapter, request: PreparedRequest, entry: dict) -> Response:
+    """
+    Build a response from a serialized one (see dump_response)
+    :param adapter: the adapter serving the response
+    :param request: the request the response answers
+    :param entry: the serialized response
+    :return: the response
+    """
+    response = Response()
+    response.status_code = entry['status']
+    response.reason = entry.get('reason') or 'OK'
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response._content = base64.b64decode(entry['content'])
+    response.encoding = entry['encoding']
+    response.url = request.url
+    response.request = request
+    response.connection = adapter
+    return response
+
+
+class ResponseCache:
+    """
+    This class stores HTTP responses on disk, one JSON file per request.
+    """
+
+    def __init__(self, path: str):
+        """
+        The class constructor.
+
+        :param path: the directory where to store the responses. It is created if it does not exist
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(request: PreparedRequest) -> str:
+        """
+        Return the key of a request, i.e., a hash of its url and of the representation it accepts
+        :param request: a request
+        :return: the key of the request
+        """
+        return hashlib.sha1(f'{request.url} {request.headers.get("Accept", "")}'.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Union[dict, None]:
+        """
+        Return the entry stored with the given key
+        :param key: a request key
+        :return: the entry (i.e., status, headers, content, encoding, and storage time), or None if missing or corrupted
+        """
+        try:
+            with open(os.path.join(self.path, f'{key}.json'), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key: str, entry: dict) -> None:
+        """
+        Store an entry with the given key.
+        The entry is written to a temporary file first, so that concurrent runs never read a partial entry
+        :param key: a request key
+        :param entry: the entry to store
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+
+        os.replace(tmp, os.path.join(self.path, f'{key}.json'))
+
+
+class CachingAdapter(BaseAdapter):
+    """
+    This class implements a transport adapter for requests that caches GET responses on disk.
+
+    Within the time-to-live, a cached response is served without any request. Afterwards, it is revalidated with a
+    conditional request (If-None-Match / If-Modified-Since): if the resource has not changed, the server answers
+    304 Not Modified, which GitHub does not count against the rate limit, and the cached response is served again.
+    """
+
+    def __init__(self, cache_dir: str, ttl: int = DEFAULT_CACHE_TTL, adapter: BaseAdapter = None):
+        """
+        The class constructor.
+
+        :param cache_dir: the directory where to store the responses
+        :param ttl: the seconds a cached response is served without revalidation (0 to always revalidate)
+        :param adapter: the adapter that actually sends the requests. Default a new HTTPAdapter
+        """
+        super().__init__()
+        self.cache = ResponseCache(cache_dir)
+        self.ttl = ttl
+        self.adapter = adapter or HTTPAdapter()
+
+        # Number of responses served fresh from the cache, revalidated with a 304, and downloaded
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        if request.method != 'GET':
+            return self.adapter.send(request, **kwargs)
+
+        key = self.cache.key(request)
+        entry = self.cache.get(key)
+
+        if entry and time.time() - entry['stored_at'] < self.ttl:
+            self.hits += 1
+            return self.build_response(request, entry)
+
+        if entry:
+            if entry['headers'].get('etag'):
+                request.headers['If-None-Match'] = entry['headers']['etag']
+            if entry['headers'].get('last-modified'):
+                request.headers['If-Modified-Since'] = entry['headers']['last-modified']
+
+        response = self.adapter.send(request, **kwargs)
+
+        if entry and response.status_code == 304:
+            self.revalidations += 1
+            entry['stored_at'] = time.time()
+            # Keep the cached representation, but refresh the other headers (e.g., rate limits)
+            entry['headers'].update({k.lower(): v for k, v in response.headers.items() if k.lower() not in _WIRE_HEADERS})
+            response.close()
+            self.cache.set(key, entry)
+            return self.build_response(request, entry)
+
+        self.misses += 1
+
+        if response.status_code == 200:
+            self.cache.set(key, {**dump_response(response), 'stored_at': time.time()})
+
+        return response
+
+    def build_response(self, request: PreparedRequest, entry: dict) -> Response:
+        """
+        Build a response from a cache entry
+        :param request: the request the response answers
+        :param entry: a cache entry
+        :return: the response
+        """
+        return build_response(self, request, entry)
+
+    def close(self) -> None:
+        self.adapter.close()
+
+
+def get_rate_limit(response: Response) -> Tuple[Union[int, None], Union[float, None]]:
+    """
+    Read the rate limit from the headers of a response (X-RateLimit-* on GitHub, RateLimit-* on GitLab)
+    :param response: a response
+    :return: the remaining quota and the time of its reset (in seconds since the epoch), or (None, None) if unknown.
+    If the response asks to retry after some time, the remaining quota is 0 until then
+    """
+    if response.headers.get('Retry-After'):
+        return 0, time.time() + float(response.headers['Retry-After'])
+
+    remaining = response.headers.get('X-RateLimit-Remaining', response.headers.get('RateLimit-Remaining'))
+    reset = response.headers.get('X-RateLimit-Reset', response.headers.get('RateLimit-Reset'))
+
+    if remaining is None or reset is None:
+        return None, None
+
+    return int(remaining), float(reset)
+
+
+def is_rate_limited(response: Response) -> bool:
+    """
+    Check whether a response rejects the request for exceeding the rate limit
+    :param response: a response
+    :return: True if the request was rejected for exceeding the (primary or secondary) rate limit
+    """
+    exhausted = response.headers.get('X-RateLimit-Remaining', response.headers.get('RateLimit-Remaining')) == '0'
+    return response.status_code == 429 or (response.status_code == 403 and
+                                           (exhausted or 'Retry-After' in response.headers))
+
+
+def is_transient(response: Response) -> bool:
+    """
+    Check whether a response reports a transient failure, i.e., a server error or a secondary rate limit that does
+    not tell when to retry (otherwise, see is_rate_limited)
+    :param response: a response
+    :return: True if the request may succeed if sent again later
+    """
+    if response.status_code in TRANSIENT_STATUS_CODES:
+        return True
+
+    return response.status_code == 403 and 'Retry-After' not in response.headers and \
+        b'secondary rate limit' in (response.content or b'')
+
+
+class RetryingAdapter(BaseAdapter):
+    """
+    This class implements a transport adapter for requests that sends again requests failing for transient reasons.
+
+    Connection errors, timeouts, server errors (5xx) and secondary rate limits are retried after an exponential
+    backoff with full jitter, so that concurrent workers do not retry in lockstep. Retries are bounded per request,
+    and by a budget shared by all the requests: at most a fraction of the requests sent so far (plus the retries of a
+    single request) may be retries, so that a failing host is not hammered for the whole run. Once the budget is
+    spent, failures are returned (or raised) at once. The adapter is thread-safe.
+    """
+
+    def __init__(self, adapter: BaseAdapter = None, max_retries: int = DEFAULT_MAX_RETRIES,
+                 budget: float = DEFAULT_RETRY_BUDGET, backoff: float = DEFAULT_BACKOFF,
+                 max_backoff: float = DEFAULT_MAX_BACKOFF):
+        """
+        The class constructor.
+
+        :param adapter: the adapter that actually sends the requests. Default a new HTTPAdapter
+        :param max_retries: the number of times a request is sent again
+        :param budget: the fraction of the requests that may be retries
+        :param backoff: the seconds of the first backoff
+        :param max_backoff: the maximum seconds of a backoff
+        """
+        super().__init__()
+        self.adapter = adapter or HTTPAdapter()
+        self.max_retries = max_retries
+        self.budget = budget
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+
+        # Number of requests received, and of retries sent
+        self.requests = 0
+        self.retries = 0
+
+    def delay(self, attempt: int) -> float:
+        """
+        Return the seconds to wait before a retry, drawn uniformly up to the exponential backoff
+        :param attempt: the number of the retry, starting from 0
+        :return: the delay
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def spend(self) -> bool:
+        """
+        Spend a retry from the budget
+        :return: True if the budget allows one more retry. False, otherwise
+        """
+        with self.lock:
+            if self.retries >= self.max_retries + self.budget * self.requests:
+                return False
+
+            self.retries += 1
+            return True
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        with self.lock:
+            self.requests += 1
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.adapter.send(request, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.max_retries or not self.spend():
+                    raise
+            else:
+                if attempt == self.max_retries or not is_transient(response) or not self.spend():
+                    return response
+
+                response.close()
+
+            pause(self.delay(attempt))
+
+    def close(self) -> None:
+        self.adapter.close()
+
+
+class ThrottlingAdapter(BaseAdapter):
+    """
+    This class implements a transport adapter for requests that paces requests according to the rate limit.
+
+    The remaining quota and its reset time are read from the headers of every response (X-RateLimit-* on GitHub,
+    RateLimit-* on GitLab). As long as the remaining quota is above a reserve, requests are sent at full speed.
+    Below the reserve, they are spread evenly until the reset: every request reserves the next free time slot, shared
+    by all the threads, so that concurrent workers take turns rather than exhaust the quota. Responses rejected for
+    exceeding the rate limit are sent again after the reset.
+    The adapter is thread-safe.
+    """
+
+    def __init__(self, adapter: BaseAdapter = None, reserve: int = DEFAULT_RATE_LIMIT_RESERVE, max_retries: int = 3):
+        """
+        The class constructor.
+
+        :param adapter: the adapter that actually sends the requests. Default a new HTTPAdapter
+        :param reserve: the remaining requests below which requests are spread until the reset
+        :param max_retries: the number of times a request rejected for exceeding the rate limit is sent again
+        """
+        super().__init__()
+        self.adapter = adapter or HTTPAdapter()
+        self.reserve = reserve
+        self.max_retries = max_retries
+
+        self.remaining = None
+        self.reset = None
+        self.next_slot = 0.0  # The earliest time the next request can be sent at, when throttled
+        self.lock = threading.Lock()
+
+        # Number of seconds spent waiting for the quota
+        self.waited = 0.0
+
+    def delay(self) -> float:
+        """
+        Return the seconds between two requests, so that the remaining quota lasts until the reset
+        :return: 0 if the remaining quota is unknown or above the reserve
+        """
+        with self.lock:
+            return self._delay(time.time())
+
+    def _delay(self, now: float) -> float:
+        if self.remaining is None or self.reset is None or self.remaining > self.reserve:
+            return 0
+
+        until_reset = max(0.0, self.reset - now)
+        return until_reset if self.remaining <= 0 else until_reset / self.remaining
+
+    def schedule(self) -> float:
+        """
+        Reserve the time slot of the next request. Slots are spaced by delay across all the threads, and are all
+        after the reset if the quota is exhausted
+        :return: the time the request can be sent at
+        """
+        with self.lock:
+            now = time.time()
+            delay = self._delay(now)
+            if delay <= 0:
+                return now
+
+            if self.remaining <= 0:
+                slot = max(now, self.next_slot, self.reset)
+                self.next_slot = slot
+            else:
+                slot = max(now, self.next_slot)
+                self.next_slot = slot + delay
+
+            return slot
+
+    def update(self, response: Response) -> None:
+        """
+        Update the remaining quota from the headers of a response
+        :param response: a response
+        """
+        remaining, reset = get_rate_limit(response)
+
+        if remaining is not None:
+            with self.lock:
+                self.remaining, self.reset = remaining, reset
+
+    def wait(self) -> None:
+        """ Wait for the time slot of the next request (see schedule) """
+        delay = self.schedule() - time.time()
+        if delay > 0:
+            pause(delay)
+            with self.lock:
+                self.waited += delay
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        for attempt in range(self.max_retries + 1):
+            self.wait()
+            response = self.adapter.send(request, **kwargs)
+            self.update(response)
+
+            if attempt == self.max_retries or not is_rate_limited(response):
+                return response
+
+            response.close()
+
+    def close(self) -> None:
+        self.adapter.close()
+
+
+class TokenPoolAdapter(BaseAdapter):
+    """
+    This class implements a transport adapter for requests that spreads requests across a pool of access tokens.
+
+    Every request is authorized with the token with the most remaining quota, in round-robin among ties (e.g., before
+    the quota of the tokens is known). Once exhausted, a token is parked until the reset of its quota, and requests
+    rejected for exceeding the rate limit are sent again with another token. If all the tokens are parked, requests
+    wait for the earliest reset. The adapter is thread-safe.
+    """
+
+    def __init__(self, tokens: List[str], adapter: BaseAdapter = None, max_retries: int = 3):
+        """
+        The class constructor.
+
+        :param tokens: the access tokens
+        :param adapter: the adapter that actually sends the requests. Default a new HTTPAdapter
+        :param max_retries: the number of times a request rejected for exceeding the rate limit is sent again, in
+        addition to once per token
+        """
+        super().__init__()
+        if not tokens:
+            raise ValueError('At least one token is required')
+
+        self.tokens = list(tokens)
+        self.adapter = adapter or HTTPAdapter()
+        self.max_retries = max_retries
+
+        self.remaining = dict()  # type: Dict[str, int]
+        self.reset = dict()  # type: Dict[str, float]
+        self.parked_until = {token: 0.0 for token in self.tokens}
+        self.usage = {token: 0 for token in self.tokens}
+        self.lock = threading.Lock()
+        self._next = 0
+
+        # Number of seconds spent waiting for all the tokens to be reset
+        self.waited = 0.0
+
+    def acquire(self) -> str:
+        """
+        Return the token to authorize the next request with, waiting if all the tokens are parked
+        :return: a token
+        """
+        while True:
+            with self.lock:
+                now = time.time()
+                order = self.tokens[self._next:] + self.tokens[:self._next]
+                available = [token for token in order if self.parked_until[token] <= now]
+
+                if available:
+                    # Unknown quotas come first, so that every token is tried
+                    token = max(available, key=lambda t: self.remaining.get(t, float('inf')))
+                    self._next = (self.tokens.index(token) + 1) % len(self.tokens)
+                    self.usage[token] += 1
+                    if token in self.remaining:
+                        self.remaining[token] -= 1
+                    return token
+
+                delay = min(self.parked_until.values()) - now
+
+            pause(delay)
+            with self.lock:
+                self.waited += delay
+
+    def release(self, token: str, response: Response) -> None:
+        """
+        Update the quota of a token from the headers of a response, and park the token if exhausted
+        :param token: the token that authorized the request
+        :param response: the response
+        """
+        remaining, reset = get_rate_limit(response)
+
+        with self.lock:
+            if remaining is not None:
+                self.remaining[token], self.reset[token] = remaining, reset
+
+            if remaining == 0 or is_rate_limited(response):
+                self.parked_until[token] = reset or time.time() + 60
+
+    @staticmethod
+    def authorize(request: PreparedRequest, token: str) -> None:
+        """
+        Authorize a request with a token, keeping the authentication scheme of the client
+        :param request: the request
+        :param token: the token
+        """
+        if 'PRIVATE-TOKEN' in request.headers:
+            request.headers['PRIVATE-TOKEN'] = token
+        else:
+            scheme = request.headers.get('Authorization', 'token').split(' ', 1)[0]
+            request.headers['Authorization'] = f'{scheme} {token}'
+
+    def stats(self) -> List[dict]:
+        """
+        Return the usage of the tokens.
+        Tokens are masked, except for their last four characters
+        :return: for each token, the number of requests it authorized, its remaining quota, the time of its reset, and
+        whether it is parked
+        """
+        with self.lock:
+            return [{'token': f'...{token[-4:]}',
+                     'requests': self.usage[token],
+                     'remaining': self.remaining.get(token),
+                     'reset': self.reset.get(token),
+                     'parked': self.parked_until[token] > time.time()} for token in self.tokens]
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        attempts = len(self.tokens) + self.max_retries
+        for attempt in range(attempts):
+            token = self.acquire()
+            self.authorize(request, token)
+            response = self.adapter.send(request, **kwargs)
+            self.release(token, response)
+
+            if attempt == attempts - 1 or not is_rate_limited(response):
+                return response
+
+            response.close()
+
+    def close(self) -> None:
+        self.adapter.close()
+
+
+class CassetteAdapter(BaseAdapter):
+    """
+    This class implements a transport adapter for requests that records interactions to a cassette, or replays them.
+
+    In record mode, the cassette file is emptied once per process, then every request is sent and the request and
+    response are appended to it, one JSON line per interaction, along with the time the response took (excluding any
+    wait for the quota or before retries, see pause). In replay mode, requests are never sent: each one
+    is answered with the next recorded response to the same method, url and body, optionally after a simulated
+    latency. This makes host benchmarks deterministic and offline.
+    """
+
+    # Serializes the appends of all the adapters recording in the process
+    _write_lock = threading.Lock()
+
+    # Cassettes emptied by the adapters recording in the process, which then share them
+    _recording = set()
+
+    def __init__(self, path: str, mode: str = 'replay', latency: Union[float, None] = 0.0, adapter: BaseAdapter = None):
+        """
+        The class constructor.
+
+        :param path: the path to the cassette file (JSON lines)
+        :param mode: 'record' or 'replay'
+        :param latency: in replay mode, the seconds to wait before serving each response. If None, the recorded time
+        of each response is waited
+        :param adapter: in record mode, the adapter that actually sends the requests. Default a new HTTPAdapter
+        """
+        super().__init__()
+        if mode not in ('record', 'replay'):
+            raise ValueError("Parameter mode must be one among ('record', 'replay')")
+
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.adapter = adapter or HTTPAdapter()
+        self.lock = threading.Lock()
+
+        # Recorded responses to serve, by request key
+        self.interactions = defaultdict(deque)  # type: Dict[str, deque]
+
+        if mode == 'record':
+            with self._write_lock:
+                if os.path.abspath(path) not in self._recording:
+                    self._recording.add(os.path.abspath(path))
+                    open(path, 'w').close()
+
+        if mode == 'replay':
+            with open(path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        interaction = json.loads(line)
+                        self.interactions[interaction['key']].append(interaction)
+
+    @staticmethod
+    def key(request: PreparedRequest) -> str:
+        """
+        Return the key of a request, i.e., a hash of its method, url and body (credentials are ignored)
+        :param request: a request
+        :return: the key of the request
+        """
+        body = request.body if isinstance(request.body, bytes) else (request.body or '').encode('utf-8')
+        return hashlib.sha1(f'{request.method} {request.url} '.encode('utf-8') + body).hexdigest()
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        key = self.key(request)
+
+        if self.mode == 'replay':
+            with self.lock:
+                if not self.interactions[key]:
+                    raise requests.exceptions.ConnectionError(f'No recorded response to {request.method} {request.url}',
+                                                              request=request)
+                interaction = self.interactions[key].popleft()
+
+            latency = interaction['elapsed'] if self.latency is None else self.latency
+            if latency > 0:
+                time.sleep(latency)
+
+            return build_response(self, request, interaction)
+
+        start, start_paused = time.time(), paused()
+        response = self.adapter.send(request, **kwargs)
+        interaction = {'key': key, 'method': request.method, 'url': request.url, **dump_response(response),
+                       'elapsed': time.time() - start - (paused() - start_paused)}
+
+        with self._write_lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(interaction) + '\n')
+
+        return response
+
+    def close(self) -> None:
+        self.adapter.close()
+
+
+def get_tokens(variable: str) -> List[str]:
+    """
+    Return the access tokens in an environment variable, separated by commas
+    :param variable: the name of the variable (e.g., GITHUB_ACCESS_TOKEN)
+    :return: the list of tokens (empty if the variable is not set)
+    """
+    return [token.strip() for token in os.getenv(variable, '').split(',') if token.strip()]
+
+
+# Adapters shared by the hosts, by access tokens and configuration (see get_adapter)
+_shared_adapters = dict()  # type: Dict[tuple, BaseAdapter]
+_shared_adapters_lock = threading.Lock()
+
+# Environment variables configuring the adapters
+_ADAPTER_VARIABLES = ('HTTP_CACHE_DIR', 'HTTP_CACHE_TTL', 'HTTP_CASSETTE', 'HTTP_POOL_SIZE', 'HTTP_MAX_RETRIES',
+                      'HTTP_RETRY_BUDGET')
+
+
+def get_adapter(tokens: List[str] = None) -> BaseAdapter:
+    """
+    Return the adapter configured by the environment.
+
+    Requests are spread across the tokens if more than one is given (see TokenPoolAdapter), or throttled according to
+    the rate limit otherwise (see ThrottlingAdapter). Requests failing for transient reasons are sent again up to
+    HTTP_MAX_RETRIES times, as long as retries are less than a fraction HTTP_RETRY_BUDGET of the requests (see
+    RetryingAdapter). They are cached on disk if HTTP_CACHE_DIR is set (see CachingAdapter). Cached responses are
+    served for HTTP_CACHE_TTL seconds before being revalidated.
+
+    If HTTP_CASSETTE is set, the interactions are recorded to that cassette, or replayed from it without any request
+    if HTTP_CASSETTE_MODE is 'replay' (see CassetteAdapter). Replayed responses are served after HTTP_CASSETTE_LATENCY
+    seconds, or after their recorded time if set to 'recorded'.
+
+    Unless replaying, the adapter is shared by all the clients with the same tokens and configuration, so that they
+    share the quota, the retry budget, and a pool of HTTP_POOL_SIZE keep-alive connections per host.
+
+    :param tokens: the access tokens
+    :return: the adapter
+    """
+    cassette = os.getenv('HTTP_CASSETTE')
+    if cassette and os.getenv('HTTP_CASSETTE_MODE', 'record') == 'replay':
+        latency = os.getenv('HTTP_CASSETTE_LATENCY', '0')
+        return CassetteAdapter(cassette, mode='replay', latency=None if latency == 'recorded' else float(latency))
+
+    key = (tuple(tokens or ()),) + tuple(os.getenv(variable) for variable in _ADAPTER_VARIABLES)
+    with _shared_adapters_lock:
+        if key not in _shared_adapters:
+            _shared_adapters[key] = build_adapter(tokens)
+
+        return _shared_adapters[key]
+
+
+def build_adapter(tokens: List[str] = None) -> BaseAdapter:
+    """
+    Build a new adapter configured by the environment (see get_adapter)
+    :param tokens: the access tokens
+    :return: the adapter
+    """
+    pool_size = int(os.getenv('HTTP_POOL_SIZE', DEFAULT_POOL_SIZE))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+
+    adapter = TokenPoolAdapter(tokens, adapter) if tokens and len(tokens) > 1 else ThrottlingAdapter(adapter)
+    adapter = RetryingAdapter(adapter, max_retries=int(os.getenv('HTTP_MAX_RETRIES', DEFAULT_MAX_RETRIES)),
+                              budget=float(os.getenv('HTTP_RETRY_BUDGET', DEFAULT_RETRY_BUDGET)))
+
+    cache_dir = os.getenv('HTTP_CACHE_DIR')
+    if cache_dir:
+        adapter = CachingAdapter(cache_dir, ttl=int(os.getenv('HTTP_CACHE_TTL', DEFAULT_CACHE_TTL)), adapter=adapter)
+
+    cassette = os.getenv('HTTP_CASSETTE')
+    if cassette:
+        adapter = CassetteAdapter(cassette, mode='record', adapter=adapter)
+
+    return adapter
+
+
+def mount(session: requests.Session, adapter: BaseAdapter) -> requests.Session:
+    """
+    Mount an adapter on a session, for both http and https urls
+    :param session: a session
+    :param adapter: the adapter to mount
+    :return: the session
+    """
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_github_client(token: str = None, adapter: BaseAdapter = None, **kwargs) -> github.Github:
+    """
+    Return a PyGithub client sending its requests through an adapter.
+
+    PyGithub does not accept a custom session, so the connection class of the client's requester is replaced with
+    one that mounts the adapter on the session it creates. A connection is created for every request, so that the
+    client can be shared by threads: connections are cheap, as the connection pool belongs to the adapter.
+
+    :param token: an access token
+    :param adapter: the adapter. If None, requests are sent as in PyGithub
+    :param kwargs: any other PyGithub option (e.g., base_url, per_page)
+    :return: the client
+    """
+    client = github.Github(token, **kwargs)
+    if adapter is None:
+        return client
+
+    requester = client._Github__requester
+    connection_class = requester._Requester__connectionClass
+
+    class AdaptedConnection(connection_class):
+
+        def __init__(self, *args, **kw):
+            super().__init__(*args, **kw)
+            mount(self.session, adapter)
+
+    requester._Requester__connectionClass = AdaptedConnection
+    requester._Requester__persist = False
+    return client
+
+
+def get_gitlab_client(url: str, token: str = None, adapter: BaseAdapter = None) -> Gitlab:
+    """
+    Return a python-gitlab client sending its requests through an adapter
+    :param url: the url of the GitLab instance
+    :param token: a private access token
+    :param adapter: the adapter. If None, requests are sent as in python-gitlab
+    :return: the client
+    """
+    session = mount(requests.Session(), adapter) if adapter is not None else None
+    return Gitlab(url, token, session=session)
@@ -1,16 +1,120 @@
+import json
+import os
 import re
-import spacy
-from typing import List
+import sqlite3
+import string
+import threading
 
-nlp = spacy.load("en_core_web_sm")
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from typing import Generator, Iterable, List, Union
 
+# NLP backend used when none is given (see get_nlp_backend). Set NLP_BACKEND to select another one for a run
+DEFAULT_NLP_BACKEND = 'spacy'
 
-def get_head_dependents(sentence: str) -> List[str]:
+# spaCy model loaded by SpacyBackend. Only its parser is run
+SPACY_MODEL = 'en_core_web_sm'
+
+# Number of sentences parsed together by pipe_head_dependents
+NLP_BATCH_SIZE = 256
+
+# Number of sentences whose head dependents are kept in memory
+DEPENDENTS_CACHE_SIZE = 65536
+
+
+class DependentsCache:
     """
-    Compute the syntactic dependencies and return a list of tuples (head, dependents)
+    A bounded LRU cache of head dependents, by normalized sentence, optionally backed by a SQLite database on disk.
+
+    Commit messages are made of few distinct sentences (e.g., "Fix typo", merge boilerplate), so the same sentences are
+    parsed over and over within a commit, across commits, and across runs. Entries evicted from memory are still
+    found on disk, where they are stored along with the model that parsed them.
+    """
+
+    def __init__(self, maxsize: int = DEPENDENTS_CACHE_SIZE, path: str = None, model: str = ''):
+        """
+        maxsize -- the number of sentences kept in memory
+        path -- the path to the SQLite database, created if it does not exist. If None, entries are kept in memory only
+        model -- the name and version of the model parsing the sentences, so that entries on disk are not reused by others
+        """
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.model = model
+
+        # Number of lookups served from memory, from disk, and missed
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self.db.execute('PRAGMA synchronous = OFF')
+            self.db.execute('CREATE TABLE IF NOT EXISTS dependents '
+                            '(model TEXT, sentence TEXT, dependents TEXT, PRIMARY KEY (model, sentence))')
+
+    def get(self, sentence: str) -> Union[List[str], None]:
+        """
+        Return the head dependents of a normalized sentence, or None if not cached
+        """
+        with self.lock:
+            if sentence in self.entries:
+                self.entries.move_to_end(sentence)
+                self.hits += 1
+                return self.entries[sentence]
+
+            row = None
+            if self.db is not None:
+                row = self.db.execute('SELECT dependents FROM dependents WHERE model = ? AND sentence = ?',
+                                      (self.model, sentence)).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.disk_hits += 1
+            dependents = json.loads(row[0])
+            self._remember(sentence, dependents)
+            return dependents
+
+    def set(self, sentence: str, dependents: List[str]) -> None:
+        """
+        Cache the head dependents of a normalized sentence
+        """
+        with self.lock:
+            self._remember(sentence, dependents)
+
+            if self.db is not None:
+                self.db.execute('INSERT OR REPLACE INTO dependents VALUES (?, ?, ?)',
+                                (self.model, sentence, json.dumps(dependents)))
+
+    def _remember(self, sentence: str, dependents: List[str]) -> None:
+        self.entries[sentence] = dependents
+        self.entries.move_to_end(sentence)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Empty the in-memory cache (entries on disk are kept)
+        """
+        with self.lock:
+            self.entries.clear()
+
+
+def normalize_sentence(sentence: str) -> str:
+    """
+    Collapse the whitespaces of a sentence, as parsed by get_head_dependents
+    """
+    return re.sub(r'\s+', ' ', sentence).strip()
+
+
+def head_dependents(doc) -> List[str]:
+    """
+    Return the heads and direct objects of a parsed sentence, including their compounds
+    doc -- a spaCy Doc
     """
-    sentence = re.sub(r'\s+', ' ', sentence)
-    doc = nlp(sentence)
     dep = [token.dep_ for token in doc]
 
     compounds = [token for token in doc if token.dep_ == 'compound']  # Get list of compounds in doc
@@ -23,6 +127,264 @@ def get_head_dependents(sentence: str) -> List[str]:
     return [token.text for token in doc if dep[token.i] in ('ROOT', 'dobj')]
 
 
+class NLPBackend(metaclass=ABCMeta):
+    """
+    The base class of the NLP backends, which split commit messages into sentences of words and compute the head
+    dependents of the sentences.
+
+    Head dependents are memoized by normalized sentence, for the last NLP_CACHE_SIZE sentences (see DependentsCache).
+    Set NLP_CACHE_PATH to the path of a SQLite database to reuse them across runs.
+    """
+
+    # The name of the backend, as passed to get_nlp_backend
+    name = None
+
+    def __init__(self, model: str):
+        """
+        model -- the name and version of the model computing the head dependents
+        """
+        self.cache = DependentsCache(maxsize=int(os.getenv('NLP_CACHE_SIZE', DEPENDENTS_CACHE_SIZE)),
+                                     path=os.getenv('NLP_CACHE_PATH'),
+                                     model=model)
+
+    @abstractmethod
+    def tokenize(self, text: str) -> List[List[str]]:
+        """
+        Split a text into sentences, and each sentence into tokens
+        text -- the text (e.g., a commit message)
+        """
+        pass
+
+    @abstractmethod
+    def parse(self, sentences: List[str], batch_size: int = NLP_BATCH_SIZE, n_process: int = 1) -> Iterable[List[str]]:
+        """
+        Compute the head dependents of normalized sentences, regardless of the cache
+        sentences -- the sentences
+        batch_size -- the number of sentences parsed together
+        n_process -- the number of processes parsing batches in parallel
+        """
+        pass
+
+    def split_sentences(self, text: str) -> List[List[str]]:
+        """
+        Split a text into sentences, and each sentence into its alphabetic words
+        text -- the text (e.g., a commit message)
+        """
+        return [[token for token in tokens if token.isalpha()] for tokens in self.tokenize(text)]
+
+    def get_head_dependents(self, sentence: str) -> List[str]:
+        """
+        Return the head dependents of a sentence, i.e., its words separated by whitespaces (see split_sentences)
+        """
+        return next(self.pipe_head_dependents([sentence]))
+
+    def pipe_head_dependents(self, sentences: Iterable[str], batch_size: int = NLP_BATCH_SIZE,
+                             n_process: int = 1) -> Generator[List[str], None, None]:
+        """
+        Return the head dependents of many sentences (see get_head_dependents). Only the sentences missing from the
+        cache are parsed, in batch
+        sentences -- the sentences
+        batch_size -- the number of sentences parsed together
+        n_process -- the number of processes parsing batches in parallel
+        """
+        sentences = [normalize_sentence(sentence) for sentence in sentences]
+        cached = [self.cache.get(sentence) for sentence in sentences]
+
+        parsed = dict.fromkeys(sentence for sentence, dependents in zip(sentences, cached) if dependents is None)
+        for sentence, dependents in zip(list(parsed), self.parse(list(parsed), batch_size, n_process)):
+            parsed[sentence] = dependents
+            self.cache.set(sentence, dependents)
+
+        for sentence, dependents in zip(sentences, cached):
+            yield list(dependents if dependents is not None else parsed[sentence])
+
+
+class _WordsTokenizer:
+    """
+    A spaCy tokenizer for sentences already split into words (see SpacyBackend)
+    """
+
+    def __init__(self, vocab):
+        from spacy.tokens import Doc
+
+        self.vocab = vocab
+        self.make_doc = Doc
+
+    def __call__(self, text: str):
+        return self.make_doc(self.vocab, words=text.split())
+
+
+class SpacyBackend(NLPBackend):
+    """
+    This backend parses sentences with the dependency parser of a spaCy model.
+
+    Texts are tokenized and split into sentences once, with spaCy's tokenizer and rule-based sentencizer, rather than
+    by a statistical component. Their words are then fed to the parser as they are, and the other components of the
+    model (e.g., tagger, ner) are not even loaded.
+    """
+
+    name = 'spacy'
+
+    def __init__(self, model: str = SPACY_MODEL):
+        """
+        model -- the name of (or the path to) the spaCy model
+        """
+        import spacy
+        from spacy.pipeline import Sentencizer
+
+        self.nlp = spacy.load(model, disable=['tagger', 'ner', 'textcat'])
+        self.tokenizer = self.nlp.tokenizer
+        self.sentencizer = Sentencizer()
+        self.nlp.tokenizer = _WordsTokenizer(self.nlp.vocab)
+
+        meta = self.nlp.meta
+        super().__init__(f'{meta.get("lang")}_{meta.get("name")}-{meta.get("version")}')
+
+    def tokenize(self, text: str) -> List[List[str]]:
+        if not text.strip():
+            return []
+
+        doc = self.sentencizer(self.tokenizer(text))
+        return [[token.text for token in sentence] for sentence in doc.sents]
+
+    def parse(self, sentences: List[str], batch_size: int = NLP_BATCH_SIZE, n_process: int = 1) -> Iterable[List[str]]:
+        for doc in self.nlp.pipe(sentences, batch_size=batch_size, n_process=n_process):
+            yield head_dependents(doc)
+
+
+class HeuristicBackend(NLPBackend):
+    """
+    This backend approximates the head dependents of a sentence with rules, without any dependency.
+
+    Commit messages are mostly imperative (e.g., "Fix wrong condition when checking the status"). Thus, the first
+    word of a sentence is taken as its root, and the words following the first word of each clause (i.e., its verb) up
+    to a preposition as direct objects, skipping function words. It is orders of magnitude faster than parsing, but
+    less precise: modifiers of the objects (e.g., "wrong") are kept, and objects of non-imperative sentences are missed.
+    """
+
+    name = 'heuristic'
+
+    # Words starting a new clause
+    CLAUSE_WORDS = frozenset(('after', 'and', 'as', 'because', 'before', 'but', 'if', 'or', 'since', 'so', 'that',
+                              'then', 'to', 'unless', 'until', 'when', 'whenever', 'where', 'which', 'while', 'who'))
+
+    # Words ending the object of a clause
+    PREPOSITIONS = frozenset(('about', 'against', 'at', 'between', 'by', 'during', 'for', 'from', 'in', 'into', 'like',
+                              'of', 'on', 'onto', 'over', 'per', 'than', 'through', 'under', 'via', 'with', 'within',
+                              'without'))
+
+    # Words that are neither roots nor objects
+    FUNCTION_WORDS = frozenset(('a', 'all', 'also', 'an', 'any', 'are', 'be', 'been', 'being', 'both', 'can', 'could',
+                                'did', 'do', 'does', 'each', 'every', 'had', 'has', 'have', 'her', 'his', 'is', 'it',
+                                'its', 'just', 'may', 'might', 'more', 'most', 'must', 'my', 'no', 'not', 'only',
+                                'our', 'should', 'some', 'the', 'their', 'these', 'this', 'those', 'very', 'was',
+                                'were', 'will', 'would', 'your'))
+
+    def __init__(self):
+        super().__init__('heuristic-1')
+
+    def tokenize(self, text: str) -> List[List[str]]:
+        return [[word.strip(string.punctuation) for word in sentence.split()]
+                for sentence in re.split(r'(?<=[.!?])\s+', text) if sentence.strip()]
+
+    def parse(self, sentences: List[str], batch_size: int = NLP_BATCH_SIZE, n_process: int = 1) -> Iterable[List[str]]:
+        return [self.head_dependents(sentence.split()) for sentence in sentences]
+
+    def head_dependents(self, words: List[str]) -> List[str]:
+        """
+        Return the approximate heads and direct objects of a sentence
+        words -- the words of the sentence
+        """
+        dependents = []
+        has_root = False
+        expects_verb = True  # Whether the next content word is the verb of a clause
+        in_object = False  # Whether the next content words are the object of a clause
+
+        for word in words:
+            lower = word.lower()
+            if lower in self.CLAUSE_WORDS:
+                expects_verb, in_object = True, False
+            elif lower in self.PREPOSITIONS:
+                expects_verb, in_object = False, False
+            elif lower in self.FUNCTION_WORDS:
+                continue
+            elif expects_verb:
+                if not has_root:
+                    dependents.append(word)
+                    has_root = True
+                expects_verb, in_object = False, True
+            elif in_object:
+                dependents.append(word)
+
+        return dependents
+
+
+# Available NLP backends, by name
+NLP_BACKENDS = {backend.name: backend for backend in (SpacyBackend, HeuristicBackend)}
+
+# Backends instantiated so far, shared by all the classifiers of the process
+_nlp_backends = dict()
+_nlp_backends_lock = threading.Lock()
+
+
+def get_nlp_backend(name: str = None) -> NLPBackend:
+    """
+    Return the NLP backend with the given name, instantiated once per process
+    name -- the name of the backend ('spacy' or 'heuristic'). If None, the NLP_BACKEND variable, or 'spacy'
+    """
+    name = name or os.getenv('NLP_BACKEND') or DEFAULT_NLP_BACKEND
+    if name not in NLP_BACKENDS:
+        raise ValueError(f'NLP backend {name} is not available. Expected one among {tuple(NLP_BACKENDS)}')
+
+    with _nlp_backends_lock:
+        if name not in _nlp_backends:
+            _nlp_backends[name] = NLP_BACKENDS[name]()
+
+        return _nlp_backends[name]
+
+
+def reset_nlp_backends():
+    """
+    Forget the NLP backends instantiated so far, so that get_nlp_backend creates them afresh.
+    To be called in a forked process, not to share the SQLite connection of their caches with the parent
+    """
+    global _nlp_backends_lock
+    _nlp_backends_lock = threading.Lock()
+    _nlp_backends.clear()
+
+
+def split_sentences(text: str, backend: str = None) -> List[List[str]]:
+    """
+    Split a text into sentences, and each sentence into its alphabetic words
+    text -- the text (e.g., a commit message)
+    backend -- the name of the NLP backend (see get_nlp_backend)
+    """
+    return get_nlp_backend(backend).split_sentences(text)
+
+
+def get_head_dependents(sentence: str, backend: str = None) -> List[str]:
+    """
+    Compute the syntactic dependencies and return a list of tuples (head, dependents).
+    Results are memoized by normalized sentence (see DependentsCache)
+    sentence -- the words of a sentence, separated by whitespaces
+    backend -- the name of the NLP backend (see get_nlp_backend)
+    """
+    return get_nlp_backend(backend).get_head_dependents(sentence)
+
+
+def pipe_head_dependents(sentences: Iterable[str], batch_size: int = NLP_BATCH_SIZE, n_process: int = 1,
+                         backend: str = None) -> Generator[List[str], None, None]:
+    """
+    Compute the head dependents of many sentences in batch (see get_head_dependents), e.g. with spaCy's nlp.pipe.
+    Only the sentences missing from the cache are parsed
+    sentences -- the sentences
+    batch_size -- the number of sentences parsed together
+    n_process -- the number of processes parsing batches in parallel
+    backend -- the name of the NLP backend (see get_nlp_backend)
+    """
+    return get_nlp_backend(backend).pipe_head_dependents(sentences, batch_size, n_process)
+
+
 def key_value_list(d):
     """
     This function iterates over all the key-value pairs of a dictionary and returns a list of tuple (key, value).
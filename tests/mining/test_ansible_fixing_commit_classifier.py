@@ -1,7 +1,14 @@
 import os
 import unittest
 
+from types import SimpleNamespace
+from unittest import mock
+
+from pydriller.domain.commit import ModificationType
+
+from repominer.mining import ansible
 from repominer.mining.ansible import AnsibleFixingCommitClassifier
+from repominer.mining.base import DEFECT_CATEGORIES
 from pydriller.repository_mining import RepositoryMining
 
 
@@ -102,3 +109,56 @@ class AnsibleFixingCommitClassifierTestSuite(unittest.TestCase):
         fcc = AnsibleFixingCommitClassifier(commit)
         assert fcc.fixes_syntax()
 
+    @staticmethod
+    def test_classify_commits():
+        commits = list(RepositoryMining(path_to_repo=os.path.join(os.getcwd(), 'test_data', 'repositories', 'COLARepo'),
+                                        only_commits=['c95685de3a5832b6beb109e283aab9db02eef620',
+                                                      '7bf9b3acf9f3440a79b087e4433f6bd38b61a633']).traverse_commits())
+        commits[0]._c_object.message = 'modification command line dataavenue & update incorrect comments blank topology '
+        commits[1]._c_object.message = 'Fix Ansible Linter issues. Fix task idempotency.'
+
+        results = AnsibleFixingCommitClassifier.classify_commits(commits, batch_size=2)
+
+        assert len(results) == 2
+        assert results[0]['documentation']
+        assert results[1]['idempotency']
+
+        for commit, result in zip(commits, results):
+            classifier = AnsibleFixingCommitClassifier(commit)
+            assert result == {category: getattr(classifier, f'fixes_{category}')() for category in DEFECT_CATEGORIES}
+
+    @staticmethod
+    def test_classify():
+        commit = list(RepositoryMining(path_to_repo=os.path.join(os.getcwd(), 'test_data', 'repositories', 'COLARepo'),
+                                       only_commits=['c95685de3a5832b6beb109e283aab9db02eef620']).traverse_commits())[0]
+
+        for message in ('Fix typo in comment', 'Update readme', 'Fix task idempotency. Fix include_tasks'):
+            commit._c_object.message = message
+            classifier = AnsibleFixingCommitClassifier(commit)
+            expected = {category: getattr(classifier, f'fixes_{category}')() for category in DEFECT_CATEGORIES}
+            assert AnsibleFixingCommitClassifier(commit).classify() == expected
+
+        # Without a defect pattern, no sentence is parsed
+        commit._c_object.message = 'Update readme'
+        classifier = AnsibleFixingCommitClassifier(commit)
+        assert not any(classifier.classify().values())
+        assert not classifier.dependents
+
+    @staticmethod
+    def test_diff_checks_parse_once():
+        modification = SimpleNamespace(change_type=ModificationType.MODIFY, new_path='roles/db/tasks/main.yml',
+                                       source_code_before='- service: {name: mysql}\n- include_tasks: a.yml\n',
+                                       source_code='- service: {name: mysql}\n- include_tasks: b.yml\n'
+                                                   '- mysql_db: {name: test}\n')
+        invalid = SimpleNamespace(change_type=ModificationType.MODIFY, new_path='roles/db/tasks/invalid.yml',
+                                  source_code_before='key: [', source_code='key: [')
+        commit = SimpleNamespace(msg='Fix include', modifications=[invalid, modification])
+
+        with mock.patch('repominer.mining.ansible.yaml.load', wraps=ansible.yaml.load) as load:
+            classifier = AnsibleFixingCommitClassifier(commit)
+            assert classifier.include_changed()
+            assert classifier.data_changed()
+            assert not classifier.service_changed()
+
+            # The invalid file is parsed once before failing, the valid one once per version
+            assert load.call_count == 3
@@ -108,3 +108,17 @@ class RulesTestCase(unittest.TestCase):
     @staticmethod
     def test_has_syntax_pattern_false():
         assert not rules.has_syntax_pattern('refactored code')
+
+    @staticmethod
+    def test_match_patterns():
+        assert rules.match_patterns('Fix lint issue') == {'defect', 'syntax'}
+        assert rules.match_patterns('refactored code') == frozenset()
+
+    @staticmethod
+    def test_match_patterns_overlapping_keywords():
+        # 'password' is both a user configuration and a security keyword, 'usernam' extends 'user'
+        assert rules.match_patterns('PASSWORD') == {'user_configuration', 'security'}
+        assert rules.match_patterns('usernames') == {'user_configuration'}
+        # Keywords are matched anywhere, including within words and right after another keyword
+        assert rules.match_patterns('description') == {'network_configuration'}
+        assert rules.match_patterns('serverdb') == {'service', 'storage_configuration'}
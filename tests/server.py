@@ -0,0 +1,152 @@
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple, Union
+
+Route = Union[Tuple[int, dict, object], Callable[[BaseHTTPRequestHandler], Tuple[int, dict, object]]]
+
+
+class StubServer:
+    """
+    A local stand-in for the GitHub and GitLab APIs, to test hosts and transports offline.
+
+    Routes map a method and a path, with or without the query string, to a response, i.e., a tuple (status, headers,
+    body), or to a function of the request handler returning one. Bodies other than str and bytes are serialized as JSON.
+    Responses with an ETag header are answered with 304 Not Modified when revalidated.
+    """
+
+    def __init__(self, routes: Dict[str, Route] = None):
+        self.routes = routes or dict()
+        self.requests = list()  # type: List[Tuple[str, str, dict]]
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self.respond('GET')
+
+            def do_POST(self):
+                self.respond('POST')
+
+            def respond(self, method: str):
+                server.requests.append((method, self.path, dict(self.headers)))
+
+                route = server.routes.get(f'{method} {self.path}', server.routes.get(f'{method} {self.path.split("?")[0]}'))
+                if route is None:
+                    status, headers, body = 404, {}, {'message': 'Not Found'}
+                else:
+                    status, headers, body = route(self) if callable(route) else route
+
+                if headers.get('ETag') and self.headers.get('If-None-Match') == headers['ETag']:
+                    status, body = 304, b''
+
+                if not isinstance(body, (str, bytes)):
+                    body = json.dumps(body)
+                    headers = {'Content-Type': 'application/json', **headers}
+                if isinstance(body, str):
+                    body = body.encode('utf-8')
+
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def count(self, path: str) -> int:
+        """ Return the number of requests received for a path """
+        return len([r for r in self.requests if r[1] == path])
+
+
+class GithubGraphQLStub(StubServer):
+    """
+    A local stand-in for the GitHub GraphQL API, serving a single repository.
+
+    Issues and pull requests are dictionaries with keys 'number', 'labels', 'state' (e.g., 'CLOSED', 'MERGED'),
+    'commit' (the sha of the closing or merge commit), and optionally 'updated_at'. Commits are tuples (sha, message),
+    newest first, on the default branch or on the other branches by name. Connections are paginated as in GitHub, filtered by state and labels (any of), and sorted by update
+    time if requested.
+    """
+
+    def __init__(self, labels: List[str] = None, issues: List[dict] = None, pulls: List[dict] = None,
+                 commits: List[Tuple[str, str]] = None, branches: Dict[str, List[Tuple[str, str]]] = None):
+        super().__init__({'POST /graphql': self.respond})
+        self.labels = labels or []
+        self.issues = issues or []
+        self.pulls = pulls or []
+        self.commits = commits or []
+        self.branches = branches or {}
+
+    @staticmethod
+    def page(nodes: list, variables: dict, size: int) -> dict:
+        start = int(variables.get('cursor') or 0)
+        return {'pageInfo': {'hasNextPage': start + size < len(nodes), 'endCursor': str(start + size)},
+                'nodes': nodes[start:start + size]}
+
+    def respond(self, handler: BaseHTTPRequestHandler):
+        body = json.loads(handler.rfile.read(int(handler.headers['Content-Length'])))
+        query, variables = body['query'], body['variables']
+        size = int(query.split('first: ', 1)[1].split(',')[0].split(')')[0])
+
+        if 'issueOrPullRequest(' in query:
+            items = [item for item in self.issues + self.pulls if item['number'] == variables['number']]
+            data = {'issueOrPullRequest': self.node(items[0], items[0] in self.pulls) if items else None}
+        elif 'history(' in query:
+            if 'ref(' in query:
+                commits = self.branches.get(variables['branch'])
+                ref = 'ref'
+            else:
+                commits = self.commits
+                ref = 'defaultBranchRef'
+
+            nodes = [{'oid': sha, 'message': message} for sha, message in commits or []]
+            data = {ref: {'target': {'history': self.page(nodes, variables, size)}} if commits is not None else None}
+        elif 'issues(' not in query and 'pullRequests(' not in query:
+            data = {'labels': self.page([{'name': name} for name in self.labels], variables, size)}
+        else:
+            connection = 'issues' if 'issues(' in query else 'pullRequests'
+            items = self.issues if connection == 'issues' else self.pulls
+            if 'UPDATED_AT' in query:
+                items = sorted(items, key=lambda item: item.get('updated_at', ''), reverse=True)
+
+            nodes = []
+            for item in items:
+                if item['state'] not in variables['states']:
+                    continue
+                if variables.get('labels') and not set(item['labels']).intersection(variables['labels']):
+                    continue
+
+                nodes.append(self.node(item, connection == 'pullRequests'))
+
+            data = {connection: self.page(nodes, variables, size)}
+
+        return 200, {}, {'data': {'repository': data}}
+
+    @staticmethod
+    def node(item: dict, pull: bool) -> dict:
+        node = {'number': item['number'], 'state': item['state'], 'updatedAt': item.get('updated_at'),
+                'labels': {'nodes': [{'name': name} for name in item['labels']]}}
+        if pull:
+            node['mergeCommit'] = {'oid': item['commit']} if item.get('commit') else None
+        else:
+            closer = {'oid': item['commit']} if item.get('commit') else None
+            node['timelineItems'] = {'nodes': [{'closer': closer}]}
+
+        return node
@@ -1,12 +1,20 @@
 # !/usr/bin/python
 # coding=utf-8
 
+import json
 import os
 import shutil
+import tempfile
 import unittest
 
+from datetime import datetime
+from unittest import mock
+
+from git import Actor, Repo
+
 from repominer.files import FixedFile
 from repominer.mining.ansible import AnsibleMiner
+from repominer.mining.traversal import BoundedGitRepository
 
 
 class AnsibleMinerTestCase(unittest.TestCase):
@@ -37,6 +45,82 @@ class AnsibleMinerTestCase(unittest.TestCase):
         hashes = self.repo_miner.get_fixing_commits_from_closed_issues(labels={'bug'})
         assert not hashes
 
+    def test_get_fixing_commits_from_closed_issues_deduplicated(self):
+        path_to_dump = tempfile.mkdtemp()
+        with open(os.path.join(path_to_dump, 'labels.json'), 'w') as f:
+            json.dump([{'name': 'bug'}, {'name': 'type: bug'}], f)
+        with open(os.path.join(path_to_dump, 'issues.json'), 'w') as f:
+            json.dump([{'number': 3, 'state': 'closed', 'labels': ['bug', 'type: bug']}], f)
+        with open(os.path.join(path_to_dump, 'events.json'), 'w') as f:
+            json.dump([{'issue': 3, 'event': 'closed', 'commit_id': 'f9ac8bbc68dedb742e5825c5cf47bca8e6f71703'}], f)
+
+        try:
+            self.repo_miner.host_options = {'backend': 'dump', 'path_to_dump': path_to_dump}
+            hashes = self.repo_miner.get_fixing_commits_from_closed_issues(labels={'bug', 'type: bug'})
+
+            assert hashes == ['f9ac8bbc68dedb742e5825c5cf47bca8e6f71703']
+            assert self.repo_miner.closing_commits == {3: 'f9ac8bbc68dedb742e5825c5cf47bca8e6f71703'}
+
+            # The host is reused across calls, and built again only if the options change
+            host = self.repo_miner.get_svc_host()
+            assert self.repo_miner.get_svc_host() is host
+            self.repo_miner.host_options = {'backend': 'dump', 'path_to_dump': path_to_dump + os.sep}
+            assert self.repo_miner.get_svc_host() is not host
+        finally:
+            self.repo_miner.host_options = dict()
+            self.repo_miner.closing_commits = dict()
+            shutil.rmtree(path_to_dump)
+
+    def test_get_fixing_commits_from_closed_issues_pipelined(self):
+        path_to_dump = tempfile.mkdtemp()
+        with open(os.path.join(path_to_dump, 'labels.json'), 'w') as f:
+            json.dump([{'name': 'bug'}], f)
+        with open(os.path.join(path_to_dump, 'issues.json'), 'w') as f:
+            json.dump([{'number': n, 'state': 'closed', 'labels': ['bug']} for n in (3, 5, 6)], f)
+        with open(os.path.join(path_to_dump, 'events.json'), 'w') as f:
+            json.dump([{'issue': 3, 'event': 'closed', 'commit_id': 'f9ac8bbc68dedb742e5825c5cf47bca8e6f71703'},
+                       {'issue': 5, 'event': 'closed', 'commit_id': '9cf96c3670b65b825d3ebc2575b0aa300f3e7bf8'},
+                       {'issue': 6, 'event': 'closed', 'commit_id': 'be34c67e75c2788742f3e87313a0b646af1006db'}], f)
+
+        try:
+            self.repo_miner.host_options = {'backend': 'dump', 'path_to_dump': path_to_dump}
+            with mock.patch.object(self.repo_miner, 'discard_undesired_fixing_commits',
+                                   wraps=self.repo_miner.discard_undesired_fixing_commits) as discard:
+                hashes = self.repo_miner.get_fixing_commits_from_closed_issues(labels={'bug'}, pipelined=True,
+                                                                               queue_size=1)
+
+            assert hashes == ['be34c67e75c2788742f3e87313a0b646af1006db', 'f9ac8bbc68dedb742e5825c5cf47bca8e6f71703']
+            assert self.repo_miner.fixing_commits == hashes
+            assert len(self.repo_miner.closing_commits) == 3
+
+            # The local history is traversed once, whatever the number of batches
+            assert discard.call_count == 1
+
+            # Same result as checking the closing commits once all of them are resolved
+            self.repo_miner.fixing_commits = list()
+            self.repo_miner.closing_commits = dict()
+            assert self.repo_miner.get_fixing_commits_from_closed_issues(labels={'bug'}) == hashes
+            assert self.repo_miner.fixing_commits == hashes
+        finally:
+            self.repo_miner.host_options = dict()
+            self.repo_miner.closing_commits = dict()
+            shutil.rmtree(path_to_dump)
+
+    def test_filter_closing_commits(self):
+        fork_commit = '0123456789abcdef0123456789abcdef01234567'
+        try:
+            commits = self.repo_miner.filter_closing_commits(['f9ac8bbc68dedb742e5825c5cf47bca8e6f71703', fork_commit,
+                                                              None, fork_commit])
+            assert commits == ['f9ac8bbc68dedb742e5825c5cf47bca8e6f71703']
+            assert self.repo_miner.dropped_closing_commits == {'off_branch': 1, 'out_of_window': 0}
+
+            # Commits are counted once for the lifetime of the miner
+            self.repo_miner.filter_closing_commits([fork_commit])
+            assert self.repo_miner.dropped_closing_commits == {'off_branch': 1, 'out_of_window': 0}
+        finally:
+            self.repo_miner.dropped_closing_commits = {'off_branch': 0, 'out_of_window': 0}
+            self.repo_miner._dropped_commits = set()
+
     def test_get_fixing_commits_from_commit_messages(self):
         hashes = self.repo_miner.get_fixing_commits_from_commit_messages(regex=r'(bug|fix|error|crash|problem|fail'
                                                                                r'|defect|patch)')
@@ -131,6 +215,42 @@ class AnsibleMinerTestCase(unittest.TestCase):
         assert fixed_files[1].fic == '72377bb59a484ac7c6c6954ce6bf796eb6143f86'  # Aug 15, 2015
         assert fixed_files[1].bic == '033cd106f8c3f552d98438bf06cb38e7b8f4fbfd'  # Aug 13, 2015
 
+    def test_get_fixed_files_since(self):
+        # The local fixture, rather than a clone
+        with mock.patch.dict(os.environ, {'TMP_REPOSITORIES_DIR': os.path.join(os.getcwd(), 'test_data', 'repositories')}):
+            repo_miner = AnsibleMiner(url_to_repo='https://github.com/adriagalin/ansible.motd.git',
+                                      branch='master',
+                                      since=datetime(2016, 8, 27))
+        repo_miner.exclude_commits = self.repo_miner.exclude_commits
+
+        repo_miner.get_fixing_commits_from_commit_messages(regex=r'(bug|fix|error|crash|problem|fail|defect|patch)')
+        assert repo_miner.fixing_commits == ['be34c67e75c2788742f3e87313a0b646af1006db',
+                                             'f9ac8bbc68dedb742e5825c5cf47bca8e6f71703']
+
+        fixed_files = repo_miner.get_fixed_files()
+        assert len(fixed_files) == 2
+
+        # Bugs introduced before the mining window are assigned to its first commit
+        assert fixed_files[0].filepath == os.path.join('meta', 'main.yml')
+        assert fixed_files[0].fic == 'f9ac8bbc68dedb742e5825c5cf47bca8e6f71703'  # Jun 27, 2019
+        assert fixed_files[0].bic == '9cf96c3670b65b825d3ebc2575b0aa300f3e7bf8'  # Aug 29, 2016
+
+        assert fixed_files[1].filepath == os.path.join('tasks', 'main.yml')
+        assert fixed_files[1].fic == 'be34c67e75c2788742f3e87313a0b646af1006db'  # Jun 20, 2019
+        assert fixed_files[1].bic == '9cf96c3670b65b825d3ebc2575b0aa300f3e7bf8'  # Aug 29, 2016
+
+    def test_get_fixed_files_empty_window(self):
+        with mock.patch.dict(os.environ, {'TMP_REPOSITORIES_DIR': os.path.join(os.getcwd(), 'test_data', 'repositories')}):
+            repo_miner = AnsibleMiner(url_to_repo='https://github.com/adriagalin/ansible.motd.git',
+                                      branch='master',
+                                      since=datetime(2100, 1, 1))
+
+        # Fixing-commits outside the mining window are dropped
+        repo_miner.fixing_commits = ['f9ac8bbc68dedb742e5825c5cf47bca8e6f71703']
+        assert repo_miner.get_fixed_files() == []
+        assert not repo_miner.fixing_commits
+        assert not list(repo_miner.label())
+
     def test_mining_pipeline(self):
         self.repo_miner.fixing_commits = list()  # reset list of fixing-commits
         self.repo_miner.get_fixing_commits_from_commit_messages(
@@ -226,5 +346,57 @@ class AnsibleMinerTestCase(unittest.TestCase):
         assert failure_prone_files[36].fixing_commit == 'be34c67e75c2788742f3e87313a0b646af1006db'
 
 
+class AnsibleMinerWindowTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.path_to_tmp_dir = tempfile.mkdtemp()
+        self.path_to_repo = os.path.join(self.path_to_tmp_dir, 'scratch')
+        repo = Repo.init(self.path_to_repo)
+        actor = Actor('test', 'test@example.com')
+
+        # master: 3 commits on tasks/main.yml. dev: 1 more commit, checked out
+        self.shas = []
+        for day, (branch, content) in enumerate([('master', '- a\n- b\n'), ('master', '- a\n- c\n'),
+                                                 ('master', '- a\n- d\n'), ('dev', '- a\n- e\n')], start=1):
+            if branch == 'dev' and repo.active_branch.name != 'dev':
+                repo.create_head('dev').checkout()
+            os.makedirs(os.path.join(self.path_to_repo, 'tasks'), exist_ok=True)
+            with open(os.path.join(self.path_to_repo, 'tasks', 'main.yml'), 'w') as f:
+                f.write(content)
+            repo.index.add([os.path.join('tasks', 'main.yml')])
+            date = f'2020-01-0{day}T00:00:00'
+            repo.index.commit(f'Commit {day}', author=actor, committer=actor, author_date=date, commit_date=date)
+            self.shas.append(repo.head.commit.hexsha)
+
+            if day == 1 and repo.active_branch.name != 'master':
+                repo.active_branch.rename('master')
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.path_to_tmp_dir)
+
+    def get_miner(self, since, until=None) -> AnsibleMiner:
+        with mock.patch.dict(os.environ, {'TMP_REPOSITORIES_DIR': self.path_to_tmp_dir}):
+            return AnsibleMiner(url_to_repo='https://github.com/owner/scratch.git', branch='master', since=since,
+                                until=until)
+
+    def test_window_since_commit_until_date(self):
+        # The commit on dev (HEAD) is before the upper date, but not on the branch
+        repo_miner = self.get_miner(since=self.shas[1], until=datetime(2020, 1, 10))
+        assert repo_miner.commit_hashes == self.shas[1:3]
+
+    def test_get_fixed_files_first_commit_of_window(self):
+        repo_miner = self.get_miner(since=self.shas[2])
+        assert repo_miner.commit_hashes == [self.shas[2]]
+
+        # No line can be blamed inside the window: the bug is assigned to its first commit
+        blame = BoundedGitRepository(self.path_to_repo, lower_bound=self.shas[2])._get_blame(
+            self.shas[2], os.path.join('tasks', 'main.yml'))
+        assert all(line.startswith('^') for line in blame if line)
+
+        repo_miner.fixing_commits = [self.shas[2]]
+        assert repo_miner.get_fixed_files() == [FixedFile(filepath=os.path.join('tasks', 'main.yml'),
+                                                          bic=self.shas[2], fic=self.shas[2])]
+
+
 if __name__ == '__main__':
     unittest.main()
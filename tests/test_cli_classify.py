@@ -0,0 +1,62 @@
+# !/usr/bin/python
+# coding=utf-8
+
+import json
+import os
+import shutil
+import unittest
+
+from git import Repo
+
+
+class CLIClassifyTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.path_to_repo = os.path.join(os.getcwd(), 'test_data', 'repositories', 'COLARepo')
+        cls.path_to_tmp_dir = os.path.join(os.getcwd(), 'test_data', 'tmp')
+        os.mkdir(cls.path_to_tmp_dir)
+
+        cls.commits = [commit.hexsha for commit in Repo(cls.path_to_repo).iter_commits(max_count=20)]
+        cls.src = os.path.join(cls.path_to_tmp_dir, 'fixing-commits.json')
+        with open(cls.src, 'w') as f:
+            json.dump(cls.commits, f)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.path_to_tmp_dir)
+
+    def classify(self, *options) -> int:
+        return os.system('repo-miner classify {0} {1} ansible {2} {3}'.format(self.path_to_repo, self.src,
+                                                                             self.path_to_tmp_dir, ' '.join(options)))
+
+    def test_classify_jsonl(self):
+        assert self.classify('--workers 2', '--batch-size 4') == 0
+
+        with open(os.path.join(self.path_to_tmp_dir, 'fixing-commits-categories.jsonl'), 'r') as f:
+            rows = [json.loads(line) for line in f]
+
+        assert sorted(row['commit'] for row in rows) == sorted(self.commits)
+        assert set(rows[0]) == {'commit', 'conditional', 'configuration_data', 'dependency', 'documentation',
+                                'idempotency', 'security', 'service', 'syntax'}
+
+    def test_classify_invalid_sizes(self):
+        assert self.classify('--batch-size 0') != 0
+        assert self.classify('--workers -1') != 0
+        assert not os.path.exists(os.path.join(self.path_to_tmp_dir, 'fixing-commits-categories.jsonl'))
+
+    def test_classify_resume(self):
+        path = os.path.join(self.path_to_tmp_dir, 'fixing-commits-categories.csv')
+        assert self.classify('--format csv', '--workers 1') == 0
+
+        # Simulate an interrupted run: keep the header, 5 rows, and half of the sixth
+        with open(path, 'r') as f:
+            lines = f.readlines()
+        with open(path, 'w') as f:
+            f.writelines(lines[:6])
+            f.write(lines[6][:10])
+
+        assert self.classify('--format csv', '--workers 1') == 0
+
+        with open(path, 'r') as f:
+            assert sorted(f.readlines()[1:]) == sorted(lines[1:])
@@ -52,6 +52,26 @@ class CLIMineFixingCommitsTestCase(unittest.TestCase):
             fixing_commits = json.load(f)
             assert set(fixing_commits) == {'72377bb59a484ac7c6c6954ce6bf796eb6143f86'}
 
+    def test_mine_fixing_commits_graphql_gitlab(self):
+        result = os.system(
+            'repo-miner mine fixing-commits gitlab ansible owner/name {} --backend graphql'.format(self.path_to_tmp_dir))
+        assert result != 0
+
+    def test_mine_fixing_commits_dump_dir(self):
+        result = os.system(
+            'repo-miner mine fixing-commits github ansible owner/name {} --backend dump'.format(self.path_to_tmp_dir))
+        assert result != 0
+
+        result = os.system('repo-miner mine fixing-commits github ansible owner/name {0} --dump-dir {0}'.format(
+            self.path_to_tmp_dir))
+        assert result != 0
+
+    def test_mine_fixing_commits_events_stream(self):
+        for options in ('gitlab ansible owner/name {} --events-stream',
+                        'github ansible owner/name {} --events-stream --backend graphql'):
+            result = os.system('repo-miner mine fixing-commits ' + options.format(self.path_to_tmp_dir))
+            assert result != 0
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -48,6 +48,9 @@ class ExtractMetricsTestCase(unittest.TestCase):
         assert 'failure_prone' in self.ansible_extractor.dataset.columns
         assert self.ansible_extractor.dataset.shape[1] == 66
 
+        # Ansible files are recognized by path: the tree is not listed at each release
+        assert not self.ansible_extractor.blobs
+
     def test_tosca_extract(self):
         self.tosca_extractor.extract(self.tosca_labeled_files, product=True, process=True, delta=False)
 
@@ -56,6 +59,7 @@ class ExtractMetricsTestCase(unittest.TestCase):
         assert 'committed_at' in self.tosca_extractor.dataset.columns
         assert 'failure_prone' in self.tosca_extractor.dataset.columns
         assert self.tosca_extractor.dataset.shape[1] == 61
+        assert self.tosca_extractor.blobs
 
     def test_remote_ansible_extract(self):
         self.remote_ansible_extractor.extract(labeled_files=self.ansible_labeled_files, product=True, process=True,
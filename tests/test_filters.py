@@ -0,0 +1,151 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from repominer import filters
+
+
+class FiltersTestCase(unittest.TestCase):
+
+    @staticmethod
+    def test_is_ansible_file_true():
+        assert filters.is_ansible_file('roles/motd/tasks/main.yml')
+
+    @staticmethod
+    def test_is_ansible_file_false():
+        assert not filters.is_ansible_file('tests/tasks/main.yml')
+        assert not filters.is_ansible_file('tasks/main.yaml')
+        assert not filters.is_ansible_file('README.md')
+
+    @staticmethod
+    def test_is_tosca_file_true():
+        assert filters.is_tosca_file('templates/service.tosca')
+        assert filters.is_tosca_file('templates/service.yaml', 'tosca_definitions_version: tosca_simple_yaml_1_0')
+
+    @staticmethod
+    def test_is_tosca_file_false():
+        assert not filters.is_tosca_file('templates/service.yaml')
+        assert not filters.is_tosca_file('templates/service.yaml', 'key: value')
+
+    @staticmethod
+    def test_sniff_tosca_file_by_path():
+        assert filters.sniff_tosca_file('templates/service.tosca')
+        assert not filters.sniff_tosca_file('README.md', read=lambda size: 'tosca_definitions_version')
+        assert not filters.sniff_tosca_file('templates/service.yaml')
+
+    @staticmethod
+    def test_sniff_tosca_file_by_head():
+        assert filters.sniff_tosca_file('templates/service.yaml',
+                                        read=lambda size: 'tosca_definitions_version: tosca_simple_yaml_1_0')
+        assert not filters.sniff_tosca_file('templates/service.yaml', read=lambda size: 'key: value')
+
+    @staticmethod
+    def test_sniff_tosca_file_reads_head_only():
+        sizes = []
+
+        def read(size):
+            sizes.append(size)
+            return 'tosca_definitions_version: tosca_simple_yaml_1_0'
+
+        assert filters.sniff_tosca_file('templates/service.yaml', read=read, size=1024)
+        assert sizes == [1024]
+
+    @staticmethod
+    def test_sniff_tosca_file_memoized_by_blob():
+        reads = []
+
+        def read(size):
+            reads.append(size)
+            return 'tosca_definitions_version: tosca_simple_yaml_1_0'
+
+        blob_id = 'e69de29bb2d1d6434b8b29ae775ad8c2e48c5391'
+        assert filters.sniff_tosca_file('templates/service.yaml', blob_id, read)
+        assert filters.sniff_tosca_file('templates/renamed.yaml', blob_id, read)
+        assert len(reads) == 1
+
+    @staticmethod
+    def test_sniff_tosca_file_memo_bounded():
+        reads = []
+
+        def read(size):
+            reads.append(size)
+            return 'key: value'
+
+        with mock.patch.object(filters, 'TOSCA_BLOBS_CACHE_SIZE', 2):
+            filters._tosca_blobs.clear()
+            for blob_id in ('a', 'b', 'a', 'c', 'b'):
+                assert not filters.sniff_tosca_file('templates/service.yaml', blob_id, read)
+
+            # 'b' was evicted by 'c', as 'a' had been used more recently
+            assert len(reads) == 4
+            assert list(filters._tosca_blobs) == ['c', 'b']
+
+    @staticmethod
+    def test_sniff_tosca_file_memo_concurrent():
+        def sniff(blob_id):
+            return filters.sniff_tosca_file('templates/service.yaml', str(blob_id),
+                                            lambda size: 'tosca_definitions_version: 1.3' if blob_id % 2 else 'a: b')
+
+        with mock.patch.object(filters, 'TOSCA_BLOBS_CACHE_SIZE', 8):
+            filters._tosca_blobs.clear()
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                verdicts = list(executor.map(sniff, [i % 32 for i in range(4096)]))
+
+            assert verdicts == [bool(i % 32 % 2) for i in range(4096)]
+            assert len(filters._tosca_blobs) == 8
+
+    @staticmethod
+    def test_ansible_pathspecs():
+        pathspecs = filters.ansible_pathspecs()
+        assert '*tasks/*.yml' in pathspecs
+        assert ':(exclude)*test*' in pathspecs
+
+    @staticmethod
+    def test_tosca_pathspecs():
+        assert set(filters.tosca_pathspecs()) == {'*.tosca', '*.tosca.yaml', '*.tosca.yml', '*.yaml', '*.yml'}
+
+    @staticmethod
+    def test_path_classifier():
+        classifier = filters.PathClassifier(keywords=['tasks/'], extensions=['.yml'], excluded=['test'])
+        assert classifier('roles/motd/tasks/main.yml')
+        assert not classifier('roles/motd/tests/tasks/main.yml')
+        assert not classifier('roles/motd/tasks/main.yaml')
+        assert not classifier('roles/motd/vars/main.yml')
+        assert not classifier(None)
+
+    @staticmethod
+    def test_path_classifier_cache():
+        classifier = filters.PathClassifier(extensions=['.yml'], cache_size=2)
+        for _ in range(3):
+            assert classifier('tasks/main.yml')
+
+        assert classifier.match.cache_info().hits == 2
+        assert classifier.match.cache_info().maxsize == 2
+
+    @staticmethod
+    def test_path_classifier_prune():
+        assert filters.ANSIBLE_CLASSIFIER.prune(os.path.join('roles', 'motd', 'tests'))
+        assert not filters.ANSIBLE_CLASSIFIER.prune(os.path.join('roles', 'motd'))
+        assert not filters.PathClassifier().prune('tests')
+
+    @staticmethod
+    def test_path_classifier_walk():
+        root = tempfile.mkdtemp()
+        try:
+            for directory in ('.git', 'tasks', 'tests'):
+                os.mkdir(os.path.join(root, directory))
+                open(os.path.join(root, directory, 'main.yml'), 'w').close()
+
+            assert set(filters.ANSIBLE_CLASSIFIER.walk(root)) == {os.path.join('tasks', 'main.yml')}
+            assert set(filters.PathClassifier().walk(root)) == {os.path.join('tasks', 'main.yml'),
+                                                                os.path.join('tests', 'main.yml')}
+        finally:
+            shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    unittest.main()
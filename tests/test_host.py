@@ -1,8 +1,20 @@
+import json
 import unittest
 import os
+import random
+import shutil
+import tempfile
+import time
 
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
-from repominer.hosts import GithubHost, GitlabHost
+from git import Repo
+
+from repominer import transport
+from repominer.hosts import SVCHost, DumpHost, GithubHost, GitlabHost, GithubGraphQLHost, IncrementalHost, get_host, get_local_commit_messages, \
+    index_closing_commits, index_closing_events, RESOLUTION_ATTEMPTS
+from tests.server import GithubGraphQLStub, StubServer
 
 
 class HostTestCase(unittest.TestCase):
@@ -54,5 +66,455 @@ class HostTestCase(unittest.TestCase):
         assert commits == ['6aa96ed603f827f0bef9f9553b39c3234d1c119f']
     """
 
+
+class LocalClosingReferencesTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.path_to_repo = tempfile.mkdtemp()
+        repo = Repo.init(self.path_to_repo)
+        with repo.config_writer() as config:
+            config.set_value('user', 'name', 'test')
+            config.set_value('user', 'email', 'test@example.com')
+
+        self.shas = []
+        for message in ('Fix #1', 'Update README', 'Closes #2\n\nAlso fixes #3'):
+            repo.index.commit(message)
+            self.shas.append(repo.head.commit.hexsha)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.path_to_repo)
+
+    def test_get_local_commit_messages(self):
+        messages = list(get_local_commit_messages(self.path_to_repo))
+        assert [sha for sha, _ in messages] == self.shas[::-1]
+        assert messages[0][1].strip() == 'Closes #2\n\nAlso fixes #3'
+
+    def test_index_closing_commits(self):
+        index = index_closing_commits(get_local_commit_messages(self.path_to_repo))
+        assert index == {1: self.shas[0], 2: self.shas[2], 3: self.shas[2]}
+
+    def test_index_closing_commits_in_title(self):
+        messages = ((sha, message.split('\n', 1)[0]) for sha, message in get_local_commit_messages(self.path_to_repo))
+        assert index_closing_commits(messages) == {1: self.shas[0], 2: self.shas[2]}
+
+
+class SlowHost(SVCHost):
+
+    def get_remote_commit_messages(self):
+        return []
+
+    def get_labels(self):
+        return set()
+
+    def get_closed_issues(self, label):
+        return []
+
+    def get_commit_closing_issue(self, issue):
+        time.sleep(random.random() / 100)
+        return f'sha-{issue}' if issue % 2 else None
+
+    def get_commits_closing_labeled_issues(self, labels):
+        return []
+
+    def get_issue(self, number):
+        return number
+
+    def get_updated_issues(self, since):
+        return []
+
+    def get_issue_summary(self, issue):
+        return issue, 'closed', [], ''
+
+
+class ConcurrentResolutionTestCase(unittest.TestCase):
+
+    def test_get_commits_closing_issues_preserves_order(self):
+        host = SlowHost()
+        expected = [host.get_commit_closing_issue(issue) for issue in range(50)]
+
+        assert host.get_commits_closing_issues(range(50), workers=8) == expected
+        assert host.get_commits_closing_issues(range(50), workers=1) == expected
+
+    def test_iter_commits_closing_issues(self):
+        host = SlowHost()
+        expected = {issue: host.get_commit_closing_issue(issue) for issue in range(50)}
+
+        assert dict(host.iter_commits_closing_issues(range(50), workers=8)) == expected
+        assert list(host.iter_commits_closing_issues(range(50), workers=1)) == list(expected.items())
+
+
+class ClosingEventsTestCase(unittest.TestCase):
+
+    @staticmethod
+    def test_index_closing_events():
+        events = [
+            (1, 'closed', 'sha-2', datetime(2020, 2, 1)),
+            (1, 'closed', 'sha-1', datetime(2020, 1, 1)),
+            (2, 'labeled', None, datetime(2020, 1, 1)),
+            (2, 'closed', None, datetime(2020, 1, 2)),
+            (3, 'reopened', None, datetime(2020, 1, 1)),
+            (3, 'Merged', 'sha-3', datetime(2020, 1, 3))
+        ]
+
+        assert index_closing_events(events) == {1: 'sha-1', 3: 'sha-3'}
+
+
+class GithubGraphQLHostTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        issues = [{'number': n, 'labels': ['bug'] if n % 2 else ['bug', 'type: bug'], 'state': 'CLOSED',
+                   'commit': f'sha-{n}' if n % 3 else None} for n in range(250, 0, -1)]
+        issues.append({'number': 251, 'labels': ['bug'], 'state': 'OPEN', 'commit': None})
+        issues.append({'number': 252, 'labels': ['enhancement'], 'state': 'CLOSED', 'commit': 'sha-252'})
+        pulls = [{'number': 300, 'labels': ['bug'], 'state': 'MERGED', 'commit': 'sha-300'}]
+        commits = [('sha-2', 'Fix #2'), ('sha-1', 'Closes #1'), ('sha-252', 'Fix #252')]
+
+        self.server = GithubGraphQLStub(labels=['bug', 'type: bug', 'enhancement'], issues=issues, pulls=pulls,
+                                        commits=commits, branches={'develop': [('sha-4', 'Fix #4')]}).__enter__()
+        self.host = GithubGraphQLHost('owner/name', adapter=transport.ThrottlingAdapter(), base_url=self.server.url)
+
+    def tearDown(self) -> None:
+        self.server.__exit__()
+
+    def test_get_labels(self):
+        assert self.host.get_labels() == {'bug', 'type: bug', 'enhancement'}
+
+    def test_get_closed_issues(self):
+        issues = self.host.get_closed_issues('bug')
+
+        assert [issue.number for issue in issues] == list(range(250, 0, -1)) + [300]
+        assert self.host.get_commit_closing_issue(issues[0]) == 'sha-250'
+        assert self.host.get_commit_closing_issue(issues[-1]) == 'sha-300'
+        assert self.host.get_commits_closing_issues(issues)[:3] == ['sha-250', None, 'sha-248']
+
+        # 3 pages of issues and 1 of pull requests
+        assert self.host.requests == 4
+
+    def test_get_commits_closing_labeled_issues(self):
+        assert sorted(self.host.get_commits_closing_labeled_issues(['type: bug'])) == ['sha-2']
+
+    def test_get_remote_commit_messages_branch(self):
+        assert list(self.host.get_remote_commit_messages())[0] == ('sha-2', 'Fix #2')
+
+        host = GithubGraphQLHost('owner/name', adapter=transport.ThrottlingAdapter(), branch='develop',
+                                 base_url=self.server.url)
+        assert list(host.get_remote_commit_messages()) == [('sha-4', 'Fix #4')]
+        assert host.commit_closing_issues == {4: 'sha-4'}
+
+    def test_get_closed_labeled_issues(self):
+        issues = self.host.get_closed_labeled_issues(['bug', 'type: bug'])
+        assert [issue.number for issue in issues] == list(range(250, 0, -1)) + [300]
+        assert self.host.requests == 4
+
+    def test_get_updated_issues(self):
+        for n, item in enumerate(self.server.issues):
+            item['updated_at'] = f'2020-01-01T00:00:{n % 60:02d}Z'
+        self.server.issues[-1]['updated_at'] = '2020-02-01T00:00:00Z'
+        self.server.pulls[0]['updated_at'] = '2020-02-02T00:00:00Z'
+
+        issues = self.host.get_updated_issues('2020-02-01T00:00:00Z')
+        assert [self.host.get_issue_summary(issue) for issue in issues] == [
+            (252, 'closed', ['enhancement'], '2020-02-01T00:00:00Z'),
+            (300, 'closed', ['bug'], '2020-02-02T00:00:00Z')]
+
+        # A page of issues older than since, and a page of pull requests
+        assert self.host.requests == 2
+
+    def test_get_issue(self):
+        assert self.host.get_issue(250).commit == 'sha-250'
+        assert self.host.get_issue_summary(self.host.get_issue(251))[1] == 'open'
+        assert self.host.get_issue(300).commit == 'sha-300'
+        assert self.host.get_issue(1000) is None
+
+    def test_replay(self):
+        cassette = os.path.join(tempfile.mkdtemp(), 'cassette.jsonl')
+        try:
+            host = GithubGraphQLHost('owner/name', adapter=transport.CassetteAdapter(cassette, mode='record'),
+                                     base_url=self.server.url)
+            recorded = host.get_commits_closing_issues(host.get_closed_issues('bug'))
+
+            sent = len(self.server.requests)
+            host = GithubGraphQLHost('owner/name', adapter=transport.CassetteAdapter(cassette, mode='replay'),
+                                     base_url=self.server.url)
+            assert host.get_commits_closing_issues(host.get_closed_issues('bug')) == recorded
+            assert len(self.server.requests) == sent
+        finally:
+            shutil.rmtree(os.path.dirname(cassette))
+
+    def test_get_host(self):
+        host = get_host('github', 'owner/name', backend='graphql', base_url=self.server.url)
+        assert isinstance(host, GithubGraphQLHost)
+
+        with self.assertRaises(ValueError):
+            get_host('gitlab', 'owner/name', backend='graphql')
+
+        with self.assertRaises(ValueError):
+            get_host('bitbucket', 'owner/name')
+
+
+class DumpHostTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.path_to_dump = tempfile.mkdtemp()
+
+        records = {
+            'labels': [{'name': 'bug'}, {'name': 'type: bug'}, {'name': 'enhancement'}],
+            'issues': [{'number': 1, 'state': 'closed', 'labels': [{'name': 'bug'}], 'created_at': '2020-01-01'},
+                       {'number': 2, 'state': 'closed', 'labels': ['bug', 'type: bug'], 'created_at': '2020-01-02'},
+                       {'number': 3, 'state': 'closed', 'labels': ['type: bug'], 'created_at': '2020-01-03'},
+                       {'number': 4, 'state': 'open', 'labels': ['bug'], 'created_at': '2020-01-04'}],
+            'events': [{'issue': {'number': 1}, 'event': 'closed', 'commit_id': 'sha-1b', 'created_at': '2020-02-02'},
+                       {'issue': {'number': 1}, 'event': 'closed', 'commit_id': 'sha-1a', 'created_at': '2020-02-01'},
+                       {'issue_number': 2, 'event': 'closed', 'commit_id': None, 'created_at': '2020-02-01'}],
+            'notes': [{'noteable_iid': 2, 'body': 'closed via merge request !7', 'created_at': '2020-02-01'},
+                      {'noteable_iid': 3, 'body': 'closed via commit 6aa96ed6', 'created_at': '2020-02-01'}],
+            'merge_requests': [{'iid': 7, 'merge_commit_sha': 'sha-2'}],
+            'commits': [{'sha': 'sha-3', 'message': 'Fix #3'}, {'sha': 'sha-1a', 'message': 'Closes #1'}]
+        }
+
+        for kind, items in records.items():
+            if kind == 'labels':
+                with open(os.path.join(self.path_to_dump, f'{kind}.json'), 'w') as f:
+                    json.dump(items, f)
+            else:
+                with open(os.path.join(self.path_to_dump, f'{kind}.jsonl'), 'w') as f:
+                    f.write('\n'.join(json.dumps(item) for item in items))
+
+        self.host = DumpHost(path_to_dump=self.path_to_dump)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.path_to_dump)
+
+    def test_get_labels(self):
+        assert self.host.get_labels() == {'bug', 'type: bug', 'enhancement'}
+
+    def test_get_closed_issues(self):
+        assert [issue.number for issue in self.host.get_closed_issues('bug')] == [2, 1]
+        assert [issue.number for issue in self.host.get_closed_issues('type: bug')] == [3, 2]
+        assert self.host.get_closed_issues('enhancement') == []
+
+    def test_get_commit_closing_issue(self):
+        issues = self.host.get_closed_issues('bug') + self.host.get_closed_issues('type: bug')
+        assert self.host.get_commits_closing_issues(issues) == ['sha-2', 'sha-1a', '6aa96ed6', 'sha-2']
+
+    def test_get_commits_closing_labeled_issues(self):
+        assert self.host.get_commits_closing_labeled_issues(['bug']) == ['sha-1a']
+
+    def test_get_closed_labeled_issues(self):
+        assert [issue.number for issue in self.host.get_closed_labeled_issues({'type: bug', 'bug'})] == [2, 1, 3]
+
+    def test_get_updated_issues(self):
+        assert self.host.get_issue(1).commit == 'sha-1a'
+        assert [self.host.get_issue_summary(issue) for issue in self.host.get_updated_issues('2020-01-03')] == [
+            (4, 'open', ['bug'], '2020-01-04'), (3, 'closed', ['type: bug'], '2020-01-03')]
+
+    def test_get_host(self):
+        assert isinstance(get_host('gitlab', 'owner/name', backend='dump', path_to_dump=self.path_to_dump), DumpHost)
+
+        with self.assertRaises(ValueError):
+            DumpHost(path_to_dump=os.path.join(self.path_to_dump, 'missing'))
+
+
+class TrackerHost(SVCHost):
+    """ An in-memory issue tracker, with issues as dictionaries (number, state, labels, updated_at) """
+
+    def __init__(self, issues):
+        super().__init__()
+        self.issues = issues
+        self.resolved = []
+        self.unresolved = set()  # Issues whose closing commit is not found
+
+    def get_remote_commit_messages(self):
+        return []
+
+    def get_labels(self):
+        return {label for issue in self.issues for label in issue['labels']}
+
+    def get_closed_issues(self, label):
+        return [i for i in self.issues if i['state'] == 'closed' and label in i['labels']]
+
+    def get_issue(self, number):
+        return next((i for i in self.issues if i['number'] == number), None)
+
+    def get_updated_issues(self, since):
+        return [i for i in self.issues if i['updated_at'] >= since]
+
+    def get_issue_summary(self, issue):
+        return issue['number'], issue['state'], issue['labels'], issue['updated_at']
+
+    def get_commit_closing_issue(self, issue):
+        self.resolved.append(issue['number'])
+        return f'sha-{issue["number"]}' if issue['number'] not in self.unresolved else None
+
+    def get_commits_closing_labeled_issues(self, labels):
+        return []
+
+
+class IncrementalHostTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.path_to_store = os.path.join(tempfile.mkdtemp(), 'store.json')
+
+    def tearDown(self) -> None:
+        shutil.rmtree(os.path.dirname(self.path_to_store))
+
+    def test_sync(self):
+        tracker = TrackerHost([
+            {'number': 1, 'state': 'closed', 'labels': ['bug'], 'updated_at': '2020-01-01T00:00:00Z'},
+            {'number': 2, 'state': 'closed', 'labels': ['bug'], 'updated_at': '2020-01-02T00:00:00Z'},
+            {'number': 3, 'state': 'open', 'labels': ['bug'], 'updated_at': '2020-01-03T00:00:00Z'}
+        ])
+
+        host = IncrementalHost(tracker, self.path_to_store)
+        assert host.get_commits_closing_issues(host.get_closed_issues('bug')) == ['sha-2', 'sha-1']
+        assert host.watermarks == {'bug': '2020-01-02T00:00:00Z'}
+
+        # Issue 3 is closed, issue 2 is reopened, issue 1 is commented
+        tracker.issues[0]['updated_at'] = '2020-02-01T00:00:00Z'
+        tracker.issues[1].update({'state': 'open', 'updated_at': '2020-02-02T00:00:00Z'})
+        tracker.issues[2].update({'state': 'closed', 'updated_at': '2020-02-03T00:00:00Z'})
+        tracker.resolved.clear()
+
+        # A new run reads the store from disk
+        host = IncrementalHost(tracker, self.path_to_store)
+        assert host.get_commits_closing_issues(host.get_closed_issues('bug')) == ['sha-3', 'sha-1']
+        assert tracker.resolved == [3]
+        assert host.watermarks == {'bug': '2020-02-03T00:00:00Z'}
+
+    def test_sync_label_lost(self):
+        tracker = TrackerHost([
+            {'number': 1, 'state': 'closed', 'labels': ['bug'], 'updated_at': '2020-01-01T00:00:00Z'},
+            {'number': 2, 'state': 'closed', 'labels': ['bug'], 'updated_at': '2020-01-02T00:00:00Z'}
+        ])
+
+        host = IncrementalHost(tracker, self.path_to_store)
+        assert [issue.number for issue in host.get_closed_issues('bug')] == [2, 1]
+
+        # Issue 2 is relabeled
+        tracker.issues[1].update({'labels': ['enhancement'], 'updated_at': '2020-02-01T00:00:00Z'})
+
+        host = IncrementalHost(tracker, self.path_to_store)
+        assert [issue.number for issue in host.get_closed_issues('bug')] == [1]
+        assert host.issues[2]['labels'] == ['enhancement']
+
+    def test_sync_retries_unresolved(self):
+        tracker = TrackerHost([
+            {'number': 1, 'state': 'closed', 'labels': ['bug'], 'updated_at': '2020-01-01T00:00:00Z'},
+            {'number': 2, 'state': 'closed', 'labels': ['bug'], 'updated_at': '2020-01-02T00:00:00Z'}
+        ])
+        tracker.unresolved = {1, 2}
+
+        host = IncrementalHost(tracker, self.path_to_store)
+        assert host.get_commits_closing_issues(host.get_closed_issues('bug')) == [None, None]
+
+        # The commit closing issue 1 is found, although the issue has not been updated since
+        tracker.unresolved = {2}
+        tracker.resolved.clear()
+
+        host = IncrementalHost(tracker, self.path_to_store)
+        assert host.get_commits_closing_issues(host.get_closed_issues('bug')) == [None, 'sha-1']
+        assert sorted(tracker.resolved) == [1, 2]
+
+        # Issue 2 is looked up RESOLUTION_ATTEMPTS times at most
+        for _ in range(RESOLUTION_ATTEMPTS):
+            host.get_closed_issues('bug')
+        assert tracker.resolved.count(2) == RESOLUTION_ATTEMPTS - 1
+        assert tracker.resolved.count(1) == 1
+
+    def test_abstract_host(self):
+        class LegacyHost(SlowHost):
+            get_updated_issues = SVCHost.get_updated_issues
+
+        with self.assertRaises(TypeError):
+            LegacyHost()
+
+    def test_get_host(self):
+        path_to_dump = tempfile.mkdtemp()
+        try:
+            host = get_host('github', 'owner/name', backend='dump', path_to_dump=path_to_dump,
+                            store_dir=os.path.dirname(self.path_to_store))
+            assert isinstance(host, DumpHost)
+        finally:
+            shutil.rmtree(path_to_dump)
+
+
+class GitlabHostTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        issues = [{'id': 100 + iid, 'iid': iid, 'project_id': 1, 'state': 'closed', 'labels': ['bug']}
+                  for iid in (5, 4, 3, 2, 1)]
+        merge_requests = [{'id': 10, 'iid': 10, 'project_id': 1, 'title': 'Fix login', 'description': 'Closes #2',
+                           'sha': 'sha-mr-10'},
+                          {'id': 11, 'iid': 11, 'project_id': 1, 'title': 'Resolve #2 again', 'description': None,
+                           'sha': 'sha-mr-11'},
+                          {'id': 12, 'iid': 12, 'project_id': 1, 'title': 'Refactoring', 'description': '',
+                           'sha': 'sha-mr-12'},
+                          {'id': 13, 'iid': 13, 'project_id': 1, 'title': 'Fix logout', 'description': 'Fixes #5',
+                           'sha': 'sha-mr-13'}]
+        notes = [{'id': 1, 'body': 'closed via merge request !12'}, {'id': 2, 'body': 'changed the description'}]
+
+        self.server = StubServer({
+            'GET /api/v4/projects/owner%2Fname': (200, {}, {'id': 1, 'path_with_namespace': 'owner/name'}),
+            'GET /api/v4/projects/1/repository/commits': (200, {}, [{'id': 'sha-1', 'title': 'Fix #1'}]),
+            'GET /api/v4/projects/1/issues': (200, {}, issues),
+            'GET /api/v4/projects/1/merge_requests': (200, {}, merge_requests),
+            'GET /api/v4/projects/1/merge_requests/12': (200, {}, merge_requests[2]),
+            'GET /api/v4/projects/1/issues/2/notes': (200, {}, [{'id': 3, 'body': 'closed via commit c1a55ed2'}]),
+            'GET /api/v4/projects/1/issues/3/notes': (200, {}, notes),
+            'GET /api/v4/projects/1/issues/4/notes': (200, {}, []),
+            'GET /api/v4/projects/1/issues/5/notes': (200, {}, [])
+        }).__enter__()
+        self.host = GitlabHost('owner/name', adapter=transport.ThrottlingAdapter(), url=self.server.url)
+
+    def tearDown(self) -> None:
+        self.server.__exit__()
+
+    def test_get_commits_closing_issues(self):
+        issues = self.host.get_closed_issues('bug')
+        assert self.host.get_commits_closing_issues(issues) == ['sha-mr-13', None, 'sha-mr-12', 'c1a55ed2', 'sha-1']
+
+        # Merge requests are listed once, and fetched one by one only if referenced by the notes
+        assert len([r for r in self.server.requests if r[1].startswith('/api/v4/projects/1/merge_requests?')]) == 1
+        assert self.server.count('/api/v4/projects/1/merge_requests/12') == 1
+        assert self.server.count('/api/v4/projects/1/merge_requests/10') == 0
+
+        # Notes are read for all the issues not closed by a commit, before the merge request descriptions
+        notes = [r[1] for r in self.server.requests if r[1].endswith('/notes') or '/notes?' in r[1]]
+        assert sorted(n.split('?')[0] for n in notes) == ['/api/v4/projects/1/issues/2/notes',
+                                                          '/api/v4/projects/1/issues/3/notes',
+                                                          '/api/v4/projects/1/issues/4/notes',
+                                                          '/api/v4/projects/1/issues/5/notes']
+
+    def test_iter_commits_closing_issues(self):
+        resolved = [(issue.iid, sha) for issue, sha in self.host.iter_commits_closing_issues(
+            self.host.get_closed_issues('bug'))]
+
+        # Issues resolved by a commit come first
+        assert resolved[0] == (1, 'sha-1')
+        assert dict(resolved) == {5: 'sha-mr-13', 4: None, 3: 'sha-mr-12', 2: 'c1a55ed2', 1: 'sha-1'}
+
+    def test_closing_notes_before_merge_requests(self):
+        issue = self.host.get_closed_issues('bug')[3]
+
+        # Merge request !10 mentions the issue in its description, but the notes tell the commit that closed it
+        assert self.host.get_commit_closing_issue(issue) == 'c1a55ed2'
+        assert not [r for r in self.server.requests if r[1].startswith('/api/v4/projects/1/merge_requests')]
+
+    def test_get_merge_request_sha_concurrent(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            shas = list(executor.map(self.host.get_merge_request_sha, ['12'] * 16))
+
+        assert shas == ['sha-mr-12'] * 16
+        assert self.server.count('/api/v4/projects/1/merge_requests/12') == 1
+
+    def test_get_commit_closing_issue(self):
+        issue = self.host.get_closed_issues('bug')[2]
+        assert self.host.get_commit_closing_issue(issue) == 'sha-mr-12'
+        assert self.host.get_commit_closing_issue(issue) == 'sha-mr-12'
+
+        # The sha of a merge request is fetched once
+        assert self.server.count('/api/v4/projects/1/merge_requests/12') == 1
+
+
 if __name__ == '__main__':
     unittest.main()
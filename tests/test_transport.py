@@ -0,0 +1,334 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import requests
+
+from repominer import transport
+from tests.server import StubServer
+
+
+class CachingAdapterTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.cache_dir)
+
+    def test_ttl(self):
+        with StubServer({'GET /labels': (200, {}, [{'name': 'bug'}])}) as server:
+            adapter = transport.CachingAdapter(self.cache_dir, ttl=60)
+            session = transport.mount(requests.Session(), adapter)
+
+            for _ in range(3):
+                assert session.get(f'{server.url}/labels').json() == [{'name': 'bug'}]
+
+            assert server.count('/labels') == 1
+            assert (adapter.misses, adapter.hits) == (1, 2)
+
+    def test_revalidation(self):
+        with StubServer({'GET /labels': (200, {'ETag': '"v1"'}, [{'name': 'bug'}])}) as server:
+            adapter = transport.CachingAdapter(self.cache_dir, ttl=0)
+            session = transport.mount(requests.Session(), adapter)
+
+            for _ in range(2):
+                response = session.get(f'{server.url}/labels')
+                assert response.status_code == 200
+                assert response.json() == [{'name': 'bug'}]
+
+            assert server.requests[1][2].get('If-None-Match') == '"v1"'
+            assert (adapter.misses, adapter.revalidations) == (1, 1)
+
+    def test_persistence(self):
+        with StubServer({'GET /labels': (200, {}, [{'name': 'bug'}])}) as server:
+            for _ in range(2):
+                session = transport.mount(requests.Session(), transport.CachingAdapter(self.cache_dir))
+                session.get(f'{server.url}/labels')
+
+            assert server.count('/labels') == 1
+
+    def test_errors_not_cached(self):
+        with StubServer() as server:
+            session = transport.mount(requests.Session(), transport.CachingAdapter(self.cache_dir))
+            for _ in range(2):
+                assert session.get(f'{server.url}/missing').status_code == 404
+
+            assert server.count('/missing') == 2
+
+    def test_github_client(self):
+        with StubServer({'GET /repos/owner/name': (200, {'ETag': '"v1"'}, {'full_name': 'owner/name'})}) as server:
+            adapter = transport.CachingAdapter(self.cache_dir, ttl=0)
+
+            for _ in range(2):
+                client = transport.get_github_client(adapter=adapter, base_url=server.url)
+                assert client.get_repo('owner/name').full_name == 'owner/name'
+
+            assert adapter.revalidations == 1
+
+    def test_gitlab_client(self):
+        route = {'GET /api/v4/projects/owner%2Fname': (200, {'ETag': '"v1"'}, {'id': 1, 'path_with_namespace': 'owner/name'})}
+        with StubServer(route) as server:
+            adapter = transport.CachingAdapter(self.cache_dir, ttl=0)
+
+            for _ in range(2):
+                client = transport.get_gitlab_client(server.url, adapter=adapter)
+                assert client.projects.get('owner/name').id == 1
+
+            assert adapter.revalidations == 1
+
+
+class ThrottlingAdapterTestCase(unittest.TestCase):
+
+    def test_delay(self):
+        adapter = transport.ThrottlingAdapter(reserve=10)
+        assert adapter.delay() == 0
+
+        adapter.remaining, adapter.reset = 100, time.time() + 60
+        assert adapter.delay() == 0
+
+        adapter.remaining = 6
+        assert 9 < adapter.delay() <= 10
+
+        adapter.remaining = 0
+        assert 59 < adapter.delay() <= 60
+
+    def test_wait_spaces_threads(self):
+        adapter = transport.ThrottlingAdapter(reserve=10)
+        adapter.remaining, adapter.reset = 5, time.time() + 1
+
+        times = []
+        threads = [threading.Thread(target=lambda: (adapter.wait(), times.append(time.time()))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Requests are spaced by 1/5 s across the threads, rather than all sent after 1/5 s
+        times.sort()
+        assert all(later - earlier > 0.15 for earlier, later in zip(times, times[1:]))
+
+    def test_update(self):
+        reset = int(time.time()) + 60
+        with StubServer({'GET /user': (200, {'X-RateLimit-Remaining': '42', 'X-RateLimit-Reset': str(reset)}, {})}) as server:
+            adapter = transport.ThrottlingAdapter()
+            transport.mount(requests.Session(), adapter).get(f'{server.url}/user')
+            assert (adapter.remaining, adapter.reset) == (42, reset)
+
+    def test_retry_after_rate_limit(self):
+        responses = [(429, {'Retry-After': '0.1'}, {}), (200, {}, {'login': 'user'})]
+
+        with StubServer({'GET /user': lambda handler: responses.pop(0)}) as server:
+            adapter = transport.ThrottlingAdapter()
+            response = transport.mount(requests.Session(), adapter).get(f'{server.url}/user')
+
+            assert response.json() == {'login': 'user'}
+            assert server.count('/user') == 2
+            assert adapter.waited > 0
+
+
+class TokenPoolAdapterTestCase(unittest.TestCase):
+
+    def test_round_robin(self):
+        with StubServer({'GET /user': (200, {}, {})}) as server:
+            adapter = transport.TokenPoolAdapter(['token-a', 'token-b', 'token-c'])
+            session = transport.mount(requests.Session(), adapter)
+            session.headers['Authorization'] = 'bearer token-a'
+
+            for _ in range(6):
+                session.get(f'{server.url}/user')
+
+            assert [headers['Authorization'] for _, _, headers in server.requests] == \
+                   ['bearer token-a', 'bearer token-b', 'bearer token-c'] * 2
+            assert [stats['requests'] for stats in adapter.stats()] == [2, 2, 2]
+
+    def test_quota_aware(self):
+        reset = str(int(time.time()) + 3600)
+
+        def respond(handler):
+            remaining = '10' if handler.headers['Authorization'] == 'token token-a' else '500'
+            return 200, {'X-RateLimit-Remaining': remaining, 'X-RateLimit-Reset': reset}, {}
+
+        with StubServer({'GET /user': respond}) as server:
+            adapter = transport.TokenPoolAdapter(['token-a', 'token-b'])
+            session = transport.mount(requests.Session(), adapter)
+
+            for _ in range(5):
+                session.get(f'{server.url}/user')
+
+            assert [stats['requests'] for stats in adapter.stats()] == [1, 4]
+
+    def test_park_exhausted_token(self):
+        reset = str(int(time.time()) + 3600)
+
+        def respond(handler):
+            if handler.headers['PRIVATE-TOKEN'] == 'token-a':
+                return 429, {'RateLimit-Remaining': '0', 'RateLimit-Reset': reset}, {}
+            return 200, {}, {'ok': True}
+
+        with StubServer({'GET /user': respond}) as server:
+            adapter = transport.TokenPoolAdapter(['token-a', 'token-b'])
+            session = transport.mount(requests.Session(), adapter)
+            session.headers['PRIVATE-TOKEN'] = 'token-a'
+
+            for _ in range(3):
+                assert session.get(f'{server.url}/user').json() == {'ok': True}
+
+            stats = adapter.stats()
+            assert stats[0]['parked'] and not stats[1]['parked']
+            assert stats[0]['token'] == '...en-a'
+            assert [s['requests'] for s in stats] == [1, 3]
+
+    def test_get_tokens(self):
+        os.environ['TEST_ACCESS_TOKEN'] = 'token-a, token-b,'
+        try:
+            assert transport.get_tokens('TEST_ACCESS_TOKEN') == ['token-a', 'token-b']
+            assert isinstance(transport.get_adapter(['token-a', 'token-b']).adapter, transport.TokenPoolAdapter)
+            assert isinstance(transport.get_adapter(['token-a']).adapter, transport.ThrottlingAdapter)
+        finally:
+            del os.environ['TEST_ACCESS_TOKEN']
+
+        assert transport.get_tokens('TEST_ACCESS_TOKEN') == []
+
+
+class RetryingAdapterTestCase(unittest.TestCase):
+
+    @staticmethod
+    def flaky(failures: int, status: int = 503, body: object = None):
+        responses = [(status, {}, body or {'message': 'Service Unavailable'})] * failures + [(200, {}, {'ok': True})]
+        return lambda handler: responses.pop(0) if len(responses) > 1 else responses[0]
+
+    def test_retry_transient_errors(self):
+        with StubServer({'GET /user': self.flaky(2)}) as server:
+            adapter = transport.RetryingAdapter(backoff=0.01)
+            session = transport.mount(requests.Session(), adapter)
+
+            assert session.get(f'{server.url}/user').json() == {'ok': True}
+            assert server.count('/user') == 3
+            assert (adapter.requests, adapter.retries) == (1, 2)
+
+    def test_retry_secondary_rate_limit(self):
+        body = {'message': 'You have exceeded a secondary rate limit. Please wait a few minutes before you try again.'}
+        with StubServer({'GET /user': self.flaky(1, 403, body), 'GET /private': (403, {}, {'message': 'Forbidden'})}) \
+                as server:
+            session = transport.mount(requests.Session(), transport.RetryingAdapter(backoff=0.01))
+
+            assert session.get(f'{server.url}/user').status_code == 200
+            assert session.get(f'{server.url}/private').status_code == 403
+            assert (server.count('/user'), server.count('/private')) == (2, 1)
+
+    def test_max_retries(self):
+        with StubServer({'GET /user': (502, {}, {'message': 'Bad Gateway'})}) as server:
+            session = transport.mount(requests.Session(), transport.RetryingAdapter(max_retries=2, backoff=0.01))
+
+            assert session.get(f'{server.url}/user').status_code == 502
+            assert server.count('/user') == 3
+
+    def test_retry_budget(self):
+        with StubServer({'GET /user': (500, {}, {'message': 'Internal Server Error'})}) as server:
+            adapter = transport.RetryingAdapter(max_retries=2, budget=0.0, backoff=0.01)
+            session = transport.mount(requests.Session(), adapter)
+
+            for _ in range(3):
+                assert session.get(f'{server.url}/user').status_code == 500
+
+            # Once the budget is spent, failures are not retried anymore
+            assert server.count('/user') == 5
+            assert adapter.retries == 2
+
+    def test_connection_errors(self):
+        with StubServer() as server:
+            url = server.url
+
+        adapter = transport.RetryingAdapter(max_retries=1, backoff=0.01)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            transport.mount(requests.Session(), adapter).get(f'{url}/user')
+
+        assert adapter.retries == 1
+
+    @staticmethod
+    def test_delay():
+        adapter = transport.RetryingAdapter(backoff=1, max_backoff=5)
+        assert all(0 <= adapter.delay(0) <= 1 for _ in range(10))
+        assert all(0 <= adapter.delay(10) <= 5 for _ in range(10))
+
+    @staticmethod
+    def test_shared_adapter():
+        adapter = transport.get_adapter(['token-a'])
+        assert transport.get_adapter(['token-a']) is adapter
+        assert transport.get_adapter(['token-b']) is not adapter
+        assert isinstance(adapter, transport.RetryingAdapter)
+
+
+class CassetteAdapterTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.cassette = os.path.join(tempfile.mkdtemp(), 'cassette.jsonl')
+
+    def tearDown(self) -> None:
+        shutil.rmtree(os.path.dirname(self.cassette))
+
+    def test_record_and_replay(self):
+        labels = iter([[{'name': 'bug'}], [{'name': 'bug'}, {'name': 'wontfix'}]])
+
+        with StubServer({'GET /labels': lambda handler: (200, {'ETag': '"v1"'}, next(labels)),
+                         'POST /graphql': lambda handler: (404, {}, {'message': 'Not Found'})}) as server:
+            session = transport.mount(requests.Session(), transport.CassetteAdapter(self.cassette, mode='record'))
+            recorded = [session.get(f'{server.url}/labels').json(),
+                        session.get(f'{server.url}/labels').json(),
+                        session.post(f'{server.url}/graphql', json={'query': '{}'}).status_code]
+            url = server.url
+
+        # The server is down
+        adapter = transport.CassetteAdapter(self.cassette, mode='replay', latency=0.05)
+        session = transport.mount(requests.Session(), adapter)
+
+        start = time.time()
+        replayed = [session.get(f'{url}/labels').json(),
+                    session.get(f'{url}/labels').json(),
+                    session.post(f'{url}/graphql', json={'query': '{}'}).status_code]
+
+        assert replayed == recorded == [[{'name': 'bug'}], [{'name': 'bug'}, {'name': 'wontfix'}], 404]
+        assert time.time() - start >= 0.15
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            session.get(f'{url}/labels')
+
+    def test_record_over_cassette(self):
+        labels = iter([[{'name': 'bug'}], [{'name': 'wontfix'}]])
+
+        with StubServer({'GET /labels': lambda handler: (200, {}, next(labels))}) as server:
+            for _ in range(2):
+                transport.CassetteAdapter._recording.clear()  # A new run
+                session = transport.mount(requests.Session(), transport.CassetteAdapter(self.cassette, mode='record'))
+                session.get(f'{server.url}/labels')
+
+            url = server.url
+
+        session = transport.mount(requests.Session(), transport.CassetteAdapter(self.cassette, mode='replay'))
+        assert session.get(f'{url}/labels').json() == [{'name': 'wontfix'}]
+
+    def test_record_elapsed_excludes_waits(self):
+        with StubServer({'GET /user': (200, {}, {})}) as server:
+            throttling = transport.ThrottlingAdapter(reserve=10)
+            throttling.remaining, throttling.reset = 0, time.time() + 0.3
+
+            session = transport.mount(requests.Session(),
+                                      transport.CassetteAdapter(self.cassette, mode='record', adapter=throttling))
+            session.get(f'{server.url}/user')
+
+        assert throttling.waited > 0.2
+        with open(self.cassette, 'r') as f:
+            assert json.loads(f.readline())['elapsed'] < 0.2
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            transport.CassetteAdapter(self.cassette, mode='rewind')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,8 @@
+import os
+import shutil
+import tempfile
 import unittest
+import unittest.mock
 
 from repominer import utils
 
@@ -11,6 +15,88 @@ class UtilsTestSuite(unittest.TestCase):
                    'of success and failur of mysqladmin ping command '
         assert utils.get_head_dependents(sentence) == ['fix', 'condit', 'statu', 'output']
 
+    @staticmethod
+    def test_pipe_head_dependents():
+        sentences = ['fix wrong condit when check the statu of mysqladmin', '', 'Fix  Ansible\tLinter issues']
+        assert list(utils.pipe_head_dependents(sentences, batch_size=2)) == [utils.get_head_dependents(sentence)
+                                                                            for sentence in sentences]
+
+    @staticmethod
+    def test_get_dependents_memoized():
+        cache = utils.get_nlp_backend().cache
+        cache.clear()
+        hits = cache.hits
+
+        assert utils.get_head_dependents('Fix  typo') == utils.get_head_dependents('Fix typo')
+        assert cache.hits == hits + 1
+
+    @staticmethod
+    def test_dependents_cache_lru():
+        cache = utils.DependentsCache(maxsize=2)
+        cache.set('a', ['a'])
+        cache.set('b', ['b'])
+        assert cache.get('a') == ['a']
+
+        cache.set('c', ['c'])
+        assert cache.get('b') is None
+        assert cache.get('a') == ['a'] and cache.get('c') == ['c']
+        assert (cache.hits, cache.misses) == (3, 1)
+
+    @staticmethod
+    def test_dependents_cache_persistence():
+        path = tempfile.mkdtemp()
+        try:
+            utils.DependentsCache(path=os.path.join(path, 'dependents.db')).set('Fix typo', ['Fix', 'typo'])
+
+            cache = utils.DependentsCache(path=os.path.join(path, 'dependents.db'))
+            assert cache.get('Fix typo') == ['Fix', 'typo']
+            assert cache.get('Fix typo') == ['Fix', 'typo']
+            assert (cache.disk_hits, cache.hits) == (1, 1)
+        finally:
+            shutil.rmtree(path)
+
     @staticmethod
     def test_get_dependents_empty():
         assert not utils.get_head_dependents('')
+
+    def test_get_nlp_backend(self):
+        assert utils.get_nlp_backend('heuristic') is utils.get_nlp_backend('heuristic')
+        assert utils.get_nlp_backend('heuristic').cache is not utils.get_nlp_backend('spacy').cache
+
+        with unittest.mock.patch.dict(os.environ, {'NLP_BACKEND': 'heuristic'}):
+            assert utils.get_nlp_backend().name == 'heuristic'
+
+        with self.assertRaises(ValueError):
+            utils.get_nlp_backend('nltk')
+
+    def test_reset_nlp_backends(self):
+        backend = utils.get_nlp_backend('heuristic')
+        utils.reset_nlp_backends()
+        assert utils.get_nlp_backend('heuristic') is not backend
+        assert utils.get_nlp_backend('heuristic').cache is not backend.cache
+
+    def test_nlp_backend_abstract(self):
+        class TokenizerOnly(utils.NLPBackend):
+            def tokenize(self, text):
+                return [text.split()]
+
+        with self.assertRaises(TypeError):
+            TokenizerOnly('tokenizer')
+
+    @staticmethod
+    def test_split_sentences():
+        message = 'Fix typo in README.md. Don\'t restart the service!\n\nCloses #3'
+        for backend in utils.NLP_BACKENDS:
+            sentences = utils.split_sentences(message, backend=backend)
+            assert sentences[0] == ['Fix', 'typo', 'in']
+            assert sentences[1][-3:] == ['restart', 'the', 'service']
+
+        assert utils.split_sentences('', backend='heuristic') == []
+
+    @staticmethod
+    def test_heuristic_head_dependents():
+        sentence = 'fix wrong condit when check the statu of mysqladmin that caus the output to be both in the case ' \
+                   'of success and failur of mysqladmin ping command '
+        assert utils.get_head_dependents(sentence, backend='heuristic') == ['fix', 'wrong', 'condit', 'statu', 'output']
+        assert utils.get_head_dependents('Typo in the README', backend='heuristic') == ['Typo']
+        assert not utils.get_head_dependents('', backend='heuristic')